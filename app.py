@@ -6,10 +6,9 @@ Configuration management web interface
 
 import os
 import sys
+import hmac
 from pathlib import Path
-from flask import Flask
-from config_manager.routes import config_bp
-from config_manager.auth import AdminAuth, generate_secret_key
+from flask import Flask, Response, request, abort
 
 # Add parent directory to path to import from main module
 sys.path.insert(0, str(Path(__file__).parent))
@@ -17,6 +16,17 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 def create_app():
     """Create and configure Flask application"""
+    # Imported here so importing app.py stays cheap and free of side effects
+    from config_manager.routes import config_bp, get_admin_auth
+    from config_manager.webhooks import webhook_bp
+    from config_manager.auth import generate_secret_key
+    from config_manager.sessions import init_session_backend
+    from config_manager.assets import compressed, init_assets
+    from config_manager.notify import ConfigNotifier
+    from fbmanager.profiling import PROFILER
+    from dotenv import dotenv_values
+    from fbmanager.metrics import REGISTRY, CONTENT_TYPE
+    
     app = Flask(__name__, 
                 template_folder='config_manager/templates',
                 static_folder='config_manager/static')
@@ -28,12 +38,22 @@ def create_app():
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutes
+    app.config['ENV_PATH'] = os.getenv('ENV_PATH', '.env')
+    app.config['ADMIN_CREDENTIALS_PATH'] = os.getenv('ADMIN_CREDENTIALS_PATH', '.admin_credentials')
+    app.config['SESSION_BACKEND'] = os.getenv('ADMIN_SESSION_BACKEND', 'cookie')
+    app.config['SESSION_DB_PATH'] = os.getenv('ADMIN_SESSION_DB', '.admin_sessions.db')
+    app.config['WEBHOOK_QUEUE_DB'] = os.getenv('WEBHOOK_QUEUE_DB', 'webhook_events.db')
+    app.config['PUBLISH_QUEUE_DB'] = os.getenv('PUBLISH_QUEUE_DB', 'publish_queue.db')
+    init_session_backend(app)
     
     # Register blueprints
     app.register_blueprint(config_bp)
+    app.register_blueprint(webhook_bp)
+    init_assets(app)
     
     # Initialize admin credentials if not exists
-    admin_auth = AdminAuth()
+    with app.app_context():
+        admin_auth = get_admin_auth()
     if not admin_auth.credentials_exist():
         password = admin_auth.initialize_default_credentials()
         if password:
@@ -46,12 +66,46 @@ def create_app():
             print("PLEASE SAVE THIS PASSWORD - IT WILL NOT BE SHOWN AGAIN!")
             print("=" * 60)
     
+    # Config change notifications for workers; with several gunicorn
+    # workers the first one to bind the port serves them and the others
+    # keep retrying the bind, so one takes over if that worker exits
+    notifier = ConfigNotifier.from_env(app.config['ENV_PATH'])
+    if notifier:
+        notifier.start()
+        app.extensions['config_notifier'] = notifier
+    
+    # Profiling settings are applied when the app starts and, in workers
+    # subscribed to config notifications, whenever they change
+    PROFILER.configure_from_env({**dotenv_values(app.config['ENV_PATH']), **os.environ})
+    
+    def on_config_change(keys):
+        if any(key.startswith('PROFILE_') for key in keys):
+            PROFILER.configure_from_env()
+    
+    # Only loaded (with requests) when workers subscribe to notifications
+    if os.getenv('CONFIG_NOTIFY_URL'):
+        from fbmanager.config_watch import ConfigWatcher
+        watcher = ConfigWatcher.from_env(on_config_change)
+        watcher.start()
+        app.extensions['config_watcher'] = watcher
+    
     # Root redirect
     @app.route('/')
     def index():
         from flask import redirect, url_for
         return redirect(url_for('config.login'))
     
+    # Prometheus metrics, protected by METRICS_TOKEN when set
+    @app.route('/metrics')
+    @compressed
+    def metrics():
+        token = os.getenv('METRICS_TOKEN', '')
+        if token:
+            provided = request.headers.get('Authorization', '').removeprefix('Bearer ')
+            if not hmac.compare_digest(provided.encode(), token.encode()):
+                abort(401)
+        return Response(REGISTRY.render(), mimetype=CONTENT_TYPE)
+    
     return app
 
 
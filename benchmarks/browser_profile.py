@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Browser Profile Benchmark
+Compares page load time and bytes transferred with and without the
+lightweight BrowserProfile, using generated fixture pages served locally
+
+Usage:
+    python benchmarks/browser_profile.py [--pages 5] [--runs 3] [--latency 0.02]
+
+Requires selenium and a local Chrome/chromedriver.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fbmanager.browser import BrowserPool, BrowserProfile
+
+
+def build_fixtures(root: Path, pages: int):
+    """Write fixture pages that resemble a media-heavy feed"""
+    assets = root / 'assets'
+    assets.mkdir()
+    (root / 'tracker').mkdir()
+
+    for i in range(20):
+        (assets / f'photo{i}.jpg').write_bytes(os.urandom(150 * 1024))
+    (assets / 'clip.mp4').write_bytes(os.urandom(2 * 1024 * 1024))
+    (assets / 'font.woff2').write_bytes(os.urandom(80 * 1024))
+    (assets / 'style.css').write_text(
+        "@font-face { font-family: F; src: url('font.woff2'); } body { font-family: F; }")
+    (root / 'tracker' / 'pixel.js').write_text('var t = new Image(); t.src = "/tracker/p.gif";')
+
+    for page in range(pages):
+        posts = '\n'.join(
+            f'<article><p>Post {page}-{i}</p><img src="/assets/photo{i}.jpg"></article>'
+            for i in range(20))
+        (root / f'page{page}.html').write_text(f"""<!DOCTYPE html>
+<html><head><link rel="stylesheet" href="/assets/style.css">
+<script src="/tracker/pixel.js"></script></head>
+<body>{posts}<video src="/assets/clip.mp4" autoplay muted></video></body></html>""")
+
+
+def start_server(root: Path, latency: float):
+    """Serve fixtures with per-request latency, counting bytes sent"""
+    counter = {'bytes': 0}
+    lock = threading.Lock()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(root), **kwargs)
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_head(self):
+            time.sleep(latency)
+            return super().send_head()
+
+        def copyfile(self, source, outputfile):
+            data = source.read()
+            with lock:
+                counter['bytes'] += len(data)
+            outputfile.write(data)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counter
+
+
+def run(profile, base_url: str, pages: int, runs: int, counter: dict):
+    """Load every fixture page runs times; return load times and bytes per page"""
+    pool = BrowserPool(headless=True, timeout=60, profile=profile)
+    times = []
+    try:
+        with pool.driver() as driver:
+            for _ in range(runs):
+                for page in range(pages):
+                    # Fresh cache each load so bytes reflect a cold visit
+                    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+                    start = time.perf_counter()
+                    driver.get(f'{base_url}/page{page}.html')
+                    times.append(time.perf_counter() - start)
+            # Let in-flight requests (eager strategy) finish before reading the counter
+            time.sleep(1)
+    finally:
+        pool.close()
+
+    return times, counter['bytes'] / (pages * runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='Simulated per-request latency in seconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        build_fixtures(root, args.pages)
+        server, counter = start_server(root, args.latency)
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        results = {}
+        for name, profile in (('default', None),
+                              ('lightweight', BrowserProfile(block_urls=['*/tracker/*']))):
+            counter['bytes'] = 0
+            results[name] = run(profile, base_url, args.pages, args.runs, counter)
+
+        server.shutdown()
+
+    print(f"{'profile':<12} {'median load':>12} {'p95 load':>10} {'KB/page':>10}")
+    for name, (times, per_page) in results.items():
+        p95 = sorted(times)[max(0, int(len(times) * 0.95) - 1)]
+        print(f"{name:<12} {statistics.median(times) * 1000:>10.0f}ms {p95 * 1000:>8.0f}ms "
+              f"{per_page / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
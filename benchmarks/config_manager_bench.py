@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Config Manager Benchmarks
+Micro-benchmarks for config_manager hot paths with JSON baselines
+
+Usage:
+    python benchmarks/config_manager_bench.py run [--output FILE] [--quick]
+    python benchmarks/config_manager_bench.py run --save-baseline
+    python benchmarks/config_manager_bench.py compare [BASELINE] [CURRENT] [--threshold 0.25] [--floor-us 5]
+    python benchmarks/config_manager_bench.py check [--threshold 0.25] [--floor-us 5]
+
+'check' runs the suite and compares it against the saved baseline in one
+step. Benchmarks are compared on their fastest sample (best of N), which
+is far less sensitive to scheduler noise than the median, and a slowdown
+only counts when it exceeds both the threshold and an absolute floor, so
+benchmarks that take a few microseconds cannot fail on jitter. 'check'
+re-runs the suite up to --attempts times while anything looks slower,
+keeping each benchmark's best sample, so one noisy run does not fail it. 'compare'
+and 'check' exit with status 1 when any benchmark regressed, and with
+status 2 when there is no baseline or it was recorded in the other mode
+(--quick against a full run).
+
+Baselines are machine-specific and are not committed: record one with
+'run --save-baseline' on the machine that runs the checks.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baselines' / 'config_manager.json'
+
+
+def measure(func: Callable, repeat: int, number: int) -> Dict[str, float]:
+    """
+    Time func, returning per-call statistics in microseconds
+
+    Args:
+        func: Callable to benchmark
+        repeat: Number of timing samples
+        number: Calls per sample
+    """
+    func()  # warm up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+
+    return {
+        'median_us': statistics.median(samples),
+        'min_us': min(samples),
+        'max_us': max(samples),
+        'samples': repeat,
+    }
+
+
+def make_env(path: Path, variables: int):
+    """Write a synthetic .env file with comments and the given number of variables"""
+    lines = ['# FB Manager Configuration', '', 'FB_EMAIL=bench@example.com', 'FB_PASSWORD=secret']
+    for i in range(variables):
+        if i % 10 == 0:
+            lines.append(f'# Section {i // 10}')
+        lines.append(f'SETTING_{i}="value with spaces {i}"' if i % 3 == 0 else f'SETTING_{i}=value{i}')
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def bench_env_handler(workdir: Path, quick: bool) -> Dict[str, Dict]:
+    from config_manager.env_handler import EnvHandler
+
+    results = {}
+    repeat = 5 if quick else 20
+
+    for size in (10, 100, 1000):
+        env_dir = workdir / f'env_{size}'
+        env_dir.mkdir()
+        env_path = env_dir / '.env'
+        make_env(env_path, size)
+        handler = EnvHandler(str(env_path))
+        env_vars = handler.read_env()
+        number = max(1, 2000 // size)
+
+        results[f'read_env[{size}]'] = measure(handler.read_env, repeat, number)
+        results[f'_read_template[{size}]'] = measure(handler._read_template, repeat, number)
+        results[f'write_env[{size}]'] = measure(
+            lambda: handler.write_env(env_vars, create_backup=False), repeat, number)
+        results[f'validate_env[{size}]'] = measure(
+            lambda: handler.validate_env(env_vars), repeat, number * 10)
+        results[f'create_backup[{size}]'] = measure(handler.create_backup, repeat, number)
+
+    for count in (10, 1000, 10000):
+        if quick and count > 1000:
+            continue
+        env_dir = workdir / f'backups_{count}'
+        env_dir.mkdir()
+        make_env(env_dir / '.env', 10)
+        handler = EnvHandler(str(env_dir / '.env'))
+        handler.backup_dir.mkdir()
+        for i in range(count):
+            (handler.backup_dir / f'.env.backup.{i:08d}_000000').write_text('X=1\n')
+        results[f'list_backups[{count}]'] = measure(
+            handler.list_backups, repeat, max(1, 1000 // count))
+
+    return results
+
+
+def bench_auth(workdir: Path, quick: bool) -> Dict[str, Dict]:
+    from config_manager.auth import AdminAuth
+
+    auth = AdminAuth(str(workdir / '.admin_credentials'))
+    auth.create_credentials('admin', 'benchmark-password')
+    repeat = 3 if quick else 10
+
+    return {
+        'verify_credentials[valid]': measure(
+            lambda: auth.verify_credentials('admin', 'benchmark-password'), repeat, 1),
+        'verify_credentials[bad_user]': measure(
+            lambda: auth.verify_credentials('nobody', 'x'), repeat, 100),
+    }
+
+
+def bench_login_required(workdir: Path, quick: bool) -> Dict[str, Dict]:
+    # Handlers resolve .env and credential paths relative to the working directory
+    os.chdir(workdir)
+    from flask import Flask
+    from config_manager.routes import config_bp, login_required
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.register_blueprint(config_bp)
+    app.add_url_rule('/bench/protected', 'protected', login_required(lambda: 'ok'))
+    client = app.test_client()
+
+    with client.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['username'] = 'admin'
+        sess['last_activity'] = time.time()
+
+    anonymous = app.test_client()
+    repeat = 5 if quick else 20
+
+    def protected():
+        response = client.get('/bench/protected')
+        assert response.status_code == 200
+
+    def redirected():
+        response = anonymous.get('/bench/protected')
+        assert response.status_code == 302
+
+    return {
+        'login_required[logged_in]': measure(protected, repeat, 200),
+        'login_required[anonymous]': measure(redirected, repeat, 200),
+    }
+
+
+def run_suite(quick: bool) -> Dict:
+    logging.disable(logging.CRITICAL)
+    cwd = os.getcwd()
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for name, bench in (('env', bench_env_handler), ('auth', bench_auth),
+                            ('routes', bench_login_required)):
+            (workdir / name).mkdir()
+            results.update(bench(workdir / name, quick))
+        os.chdir(cwd)
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'quick': quick,
+        'results': results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, floor_us: float) -> bool:
+    """
+    Print a comparison table of best-of-N timings
+
+    Args:
+        baseline: Baseline results
+        current: Results to check
+        threshold: Allowed slowdown as a fraction of the baseline
+        floor_us: Slowdowns smaller than this many microseconds are noise
+
+    Returns:
+        True if no benchmark regressed beyond both threshold and floor_us
+    """
+    slow = regressions(baseline, current, threshold, floor_us)
+    print(f"{'benchmark (min)':<34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, base in sorted(baseline['results'].items()):
+        cur = current['results'].get(name)
+        if cur is None:
+            print(f"{name:<34} {base['min_us']:>10.1f}us {'missing':>12}")
+            continue
+        change = cur['min_us'] / base['min_us'] - 1
+        flag = '  REGRESSION' if name in slow else ''
+        print(f"{name:<34} {base['min_us']:>10.1f}us {cur['min_us']:>10.1f}us "
+              f"{change:>+7.0%}{flag}")
+    return not slow
+
+
+def regressions(baseline: Dict, current: Dict, threshold: float, floor_us: float) -> List[str]:
+    """Names of benchmarks slower than the baseline by more than threshold and floor_us"""
+    slow = []
+    for name, base in baseline['results'].items():
+        cur = current['results'].get(name)
+        if cur is None:
+            continue
+        delta = cur['min_us'] - base['min_us']
+        if delta > floor_us and delta / base['min_us'] > threshold:
+            slow.append(name)
+    return slow
+
+
+def merge_best(data: Dict, rerun: Dict) -> Dict:
+    """Keep the faster result of two runs for each benchmark"""
+    merged = dict(data, results=dict(data['results']))
+    for name, stats in rerun['results'].items():
+        if name not in merged['results'] or stats['min_us'] < merged['results'][name]['min_us']:
+            merged['results'][name] = stats
+    return merged
+
+
+def require_same_mode(baseline: Dict, quick: bool):
+    """Exit with status 2 when a quick run would be compared with a full baseline, or vice versa"""
+    if bool(baseline.get('quick')) != quick:
+        def mode(q):
+            return 'quick' if q else 'full'
+        print(f"Baseline is a {mode(baseline.get('quick'))} run but the current results are a "
+              f"{mode(quick)} run; they cover different samples and sizes. Re-run "
+              f"{'with' if baseline.get('quick') else 'without'} --quick, or record a matching baseline.")
+        sys.exit(2)
+
+
+def print_results(data: Dict):
+    print(f"{'benchmark':<34} {'median':>12} {'min':>12}")
+    for name, stats in sorted(data['results'].items()):
+        print(f"{name:<34} {stats['median_us']:>10.1f}us {stats['min_us']:>10.1f}us")
+
+
+def load(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_baseline(path: str) -> Dict:
+    """Load a baseline, exiting with status 2 and instructions when it is missing"""
+    if not Path(path).exists():
+        print(f"No baseline at {path}. Record one on this machine first:\n"
+              f"    python benchmarks/config_manager_bench.py run --save-baseline")
+        sys.exit(2)
+    baseline = load(path)
+    if (baseline.get('python'), baseline.get('machine')) != (platform.python_version(), platform.machine()):
+        print(f"Note: baseline was recorded with Python {baseline.get('python')} on {baseline.get('machine')}; "
+              f"timings may not be comparable")
+    return baseline
+
+
+def save(data: Dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    print(f"Saved results to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Config manager micro-benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='Run the suite')
+    run_parser.add_argument('--output', help='Write results to this JSON file')
+    run_parser.add_argument('--save-baseline', action='store_true',
+                            help=f'Write results to {BASELINE_PATH.relative_to(ROOT)}')
+    run_parser.add_argument('--quick', action='store_true', help='Fewer samples and sizes')
+
+    compare_parser = sub.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline', nargs='?', default=str(BASELINE_PATH))
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.25,
+                                help='Allowed slowdown as a fraction (default 0.25)')
+    compare_parser.add_argument('--floor-us', type=float, default=5.0,
+                                help='Ignore slowdowns smaller than this many microseconds (default 5)')
+
+    check_parser = sub.add_parser('check', help='Run the suite and compare with the baseline')
+    check_parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    check_parser.add_argument('--threshold', type=float, default=0.25)
+    check_parser.add_argument('--floor-us', type=float, default=5.0)
+    check_parser.add_argument('--attempts', type=int, default=3,
+                              help='Runs to try before reporting a regression (default 3)')
+    check_parser.add_argument('--quick', action='store_true')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        data = run_suite(args.quick)
+        print_results(data)
+        if args.output:
+            save(data, Path(args.output))
+        if args.save_baseline:
+            save(data, BASELINE_PATH)
+
+    elif args.command == 'compare':
+        baseline, current = load_baseline(args.baseline), load(args.current)
+        require_same_mode(baseline, bool(current.get('quick')))
+        if not compare(baseline, current, args.threshold, args.floor_us):
+            sys.exit(1)
+
+    elif args.command == 'check':
+        baseline = load_baseline(args.baseline)
+        require_same_mode(baseline, args.quick)
+        current = run_suite(args.quick)
+        for _ in range(args.attempts - 1):
+            if not regressions(baseline, current, args.threshold, args.floor_us):
+                break
+            current = merge_best(current, run_suite(args.quick))
+        if not compare(baseline, current, args.threshold, args.floor_us):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Runs FB Manager with N accounts against the mock Facebook server while
+virtual admins use the admin app, and reports throughput, latency
+percentiles, CPU and memory over time
+
+Each account logs in (restoring its saved session when possible), then
+loops over a cycle: session check, page HTML, batched Graph API reads of
+the page and its posts' comments, and sometimes a publish. Admins log in
+and browse /admin/setup and /admin/backups, with occasional new logins.
+The mock server and the admin app run as separate processes so their
+CPU and memory are reported apart from FB Manager's.
+
+Usage:
+    python benchmarks/load_test.py [--accounts 20] [--admins 5] [--duration 60]
+        [--latency-ms 50] [--error-rate 0.01] [--throttle-rps 0] [--session-ttl 0] [--publish-ratio 0.1]
+        [--mock-url URL] [--admin-url URL --admin-password PASSWORD] [--browser] [--json report.json]
+
+Without --browser, logins the saved session cannot cover are plain HTTP
+form posts to the mock instead of Selenium sessions.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+from urllib.parse import urljoin
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Settings that would start background components unrelated to the test
+DISABLED_PREFIXES = ('PROXY_', 'CONFIG_NOTIFY_', 'WEBHOOK_', 'PUBLISH_', 'METRICS_', 'TRACE_', 'PROFILE_')
+
+# Weights of admin actions after logging in
+ADMIN_MIX = [('GET /admin/setup', 0.6), ('GET /admin/backups', 0.3), ('login', 0.1)]
+
+CSRF_PATTERN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+class Recorder:
+    """Latency samples per operation plus a running count for the timeline"""
+
+    def __init__(self):
+        from fbmanager.tracing import StageStats
+        self._stage_stats = StageStats
+        self.ops: Dict[str, Any] = {}
+        self.total = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def time(self, op: str):
+        start = time.perf_counter()
+        error = True
+        try:
+            yield
+            error = False
+        finally:
+            self.record(op, time.perf_counter() - start, error)
+
+    def record(self, op: str, duration: float, error: bool = False):
+        with self.lock:
+            stats = self.ops.get(op)
+            if stats is None:
+                stats = self.ops[op] = self._stage_stats(100000)
+            stats.add(duration, error)
+            self.total += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {op: stats.summary() for op, stats in sorted(self.ops.items())}
+
+
+class ResourceSampler:
+    """Samples CPU and resident memory of processes from /proc at an interval"""
+
+    def __init__(self, processes: Dict[str, int], recorder: Recorder, interval: float):
+        self.processes = processes
+        self.recorder = recorder
+        self.interval = interval
+        self.timeline: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+        self._ticks = os.sysconf('SC_CLK_TCK')
+        self._page_size = os.sysconf('SC_PAGE_SIZE')
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _read(self, pid: int):
+        """(cpu seconds, rss bytes) of a process, or None once it has exited"""
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{pid}/statm') as f:
+                rss_pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            return None
+        # utime and stime are fields 14 and 15; the split starts at field 3
+        return (int(fields[11]) + int(fields[12])) / self._ticks, rss_pages * self._page_size
+
+    def _run(self):
+        start = time.monotonic()
+        last = {name: self._read(pid) for name, pid in self.processes.items()}
+        last_ops, last_time = self.recorder.total, start
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            elapsed = now - last_time
+            ops = self.recorder.total
+            row = {'t': round(now - start, 1), 'ops_per_s': round((ops - last_ops) / elapsed, 1)}
+            for name, pid in self.processes.items():
+                current = self._read(pid)
+                if current and last.get(name):
+                    row[f'{name}_cpu_pct'] = round((current[0] - last[name][0]) / elapsed * 100, 1)
+                    row[f'{name}_rss_mb'] = round(current[1] / 2 ** 20, 1)
+                last[name] = current
+            self.timeline.append(row)
+            print('  '.join(f'{key}={value}' for key, value in row.items()), flush=True)
+            last_ops, last_time = ops, now
+
+
+def start_mock(args) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, str(ROOT / 'benchmarks' / 'mock_facebook.py'), '--port', '0',
+         '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+         '--error-rate', str(args.error_rate), '--throttle-rps', str(args.throttle_rps),
+         '--session-ttl', str(args.session_ttl)],
+        stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('Mock Facebook on '):
+        raise RuntimeError(f'Mock server did not start: {line}')
+    process.url = line.split()[-1]
+    return process
+
+
+def start_admin(workdir: Path, password: str) -> subprocess.Popen:
+    """Run app.py as deployed, with throwaway .env and credentials"""
+    import socket
+    import requests
+    from config_manager.auth import AdminAuth
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    env_path = workdir / '.env'
+    env_path.write_text((ROOT / '.env.example').read_text())
+    AdminAuth(str(workdir / '.admin_credentials')).create_credentials('admin', password)
+    env = {key: value for key, value in os.environ.items() if not key.startswith(DISABLED_PREFIXES)}
+    env.update(ENV_PATH=str(env_path), ADMIN_CREDENTIALS_PATH=str(workdir / '.admin_credentials'),
+               FLASK_SECRET_KEY='load-test', FLASK_HOST='127.0.0.1', FLASK_PORT=str(port), DEBUG='False')
+    process = subprocess.Popen([sys.executable, str(ROOT / 'app.py')], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    process.url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{process.url}/admin/login', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('Admin app did not start')
+
+
+def form_login(manager) -> bool:
+    """Stand-in for the browser login: post the mock's login form"""
+    from fbmanager.session_store import SessionData
+
+    manager.http.cookies.clear()
+    manager.http.post(manager.login_url, data={'email': manager.fb_email, 'pass': manager.fb_password, 'login': ''},
+                      allow_redirects=False, timeout=30)
+    cookies = [{'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expiry': c.expires}
+               for c in manager.http.cookies]
+    if not any(cookie['name'] == 'c_user' for cookie in cookies):
+        return False
+    data = SessionData(manager.fb_email, cookies)
+    manager.session_store.save(data)
+    manager.session_data = data
+    return True
+
+
+def account_worker(index: int, args, graph_url: str, recorder: Recorder, stop: threading.Event):
+    from main import FBManager
+    from fbmanager.graph_api import GraphAPIClient
+
+    manager = FBManager()
+    manager.fb_email = f'loadtest{index}@example.com'
+    manager.fb_password = 'load-test'
+    if not args.browser:
+        manager._full_login = lambda: form_login(manager)
+    client = GraphAPIClient(f'token-{index}', base_url=graph_url, max_workers=2)
+    page = f'page{index % args.pages}'
+    rng = random.Random(index)
+
+    def cycle():
+        with recorder.time('session_check'):
+            live = manager._session_is_live()
+        if not live:
+            with recorder.time('login'):
+                if not manager.run_task('login', manager.login):
+                    raise RuntimeError('Login failed')
+
+        with recorder.time('page_html'):
+            response = manager.http.get(urljoin(manager.facebook_url, page), timeout=30)
+            response.raise_for_status()
+            if '<article' not in response.text:
+                raise RuntimeError('Page HTML has no posts')
+
+        with recorder.time('graph_read'):
+            _, posts = client.get_many([page, f'{page}/posts'], {'limit': 10})
+        with recorder.time('graph_comments'):
+            client.get_many([f'{post["id"]}/comments' for post in posts['data'][:5]])
+
+        if rng.random() < args.publish_ratio:
+            with recorder.time('graph_publish'):
+                client.call('POST', f'{page}/feed', {'message': f'Load test {index} {time.time()}'})
+
+    try:
+        with recorder.time('login'):
+            manager.run_task('login', manager.login)
+        while not stop.is_set():
+            try:
+                with recorder.time('cycle'):
+                    manager.run_task('cycle', cycle)
+            except Exception:
+                # Counted as an error by the recorder; keep the account going
+                stop.wait(0.1)
+            if args.think_ms:
+                stop.wait(args.think_ms / 1000)
+    finally:
+        client.close()
+        manager.browser_pool.close()
+
+
+def admin_login(session, admin_url: str, password: str) -> bool:
+    session.cookies.clear()
+    page = session.get(f'{admin_url}/admin/login', timeout=30)
+    match = CSRF_PATTERN.search(page.text)
+    response = session.post(f'{admin_url}/admin/login', timeout=30, allow_redirects=False, data={
+        'csrf_token': match.group(1) if match else '', 'username': 'admin', 'password': password})
+    return response.status_code == 302 and '/admin/setup' in response.headers.get('Location', '')
+
+
+def admin_worker(index: int, admin_url: str, password: str, recorder: Recorder, stop: threading.Event):
+    import requests
+
+    session = requests.Session()
+    rng = random.Random(1000 + index)
+    actions, weights = zip(*ADMIN_MIX)
+    logged_in = False
+    while not stop.is_set():
+        action = 'login' if not logged_in else rng.choices(actions, weights)[0]
+        try:
+            with recorder.time(f'admin {action}'):
+                if action == 'login':
+                    logged_in = admin_login(session, admin_url, password)
+                    if not logged_in:
+                        raise RuntimeError('Admin login failed')
+                else:
+                    response = session.get(admin_url + action.split()[1], timeout=30, allow_redirects=False)
+                    if response.status_code != 200:
+                        logged_in = False
+                        raise RuntimeError(f'{action} returned {response.status_code}')
+        except Exception:
+            stop.wait(0.1)
+
+
+def format_ops(summary: Dict[str, Dict[str, float]], duration: float) -> str:
+    lines = [f"{'operation':<24} {'count':>8} {'rate/s':>8} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+    for op, s in summary.items():
+        lines.append(f"{op:<24} {s['count']:>8} {s['count'] / duration:>8.1f} {s['errors']:>7} "
+                     f"{s['p50_ms']:>7.1f}ms {s['p95_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {s['max_ms']:>7.1f}ms")
+    return '\n'.join(lines)
+
+
+def format_resources(timeline: List[Dict[str, Any]], names: List[str]) -> str:
+    lines = [f"{'process':<10} {'avg cpu':>9} {'max cpu':>9} {'max rss':>10}"]
+    for name in names:
+        cpu = [row[f'{name}_cpu_pct'] for row in timeline if f'{name}_cpu_pct' in row]
+        rss = [row[f'{name}_rss_mb'] for row in timeline if f'{name}_rss_mb' in row]
+        if cpu:
+            lines.append(f"{name:<10} {sum(cpu) / len(cpu):>8.1f}% {max(cpu):>8.1f}% {max(rss):>8.1f}MB")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test against a mock Facebook server')
+    parser.add_argument('--accounts', type=int, default=20, help='Concurrent FB Manager accounts')
+    parser.add_argument('--pages', type=int, default=50, help='Distinct pages the accounts visit')
+    parser.add_argument('--admins', type=int, default=5, help='Concurrent admin app users (0 to skip)')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+    parser.add_argument('--think-ms', type=float, default=0, help='Pause between account cycles')
+    parser.add_argument('--publish-ratio', type=float, default=0.1, help='Share of cycles that publish')
+    parser.add_argument('--latency-ms', type=float, default=50, help='Mock server latency')
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.01, help='Share of mock requests failing')
+    parser.add_argument('--throttle-rps', type=float, default=0, help='Mock Graph calls/s per token')
+    parser.add_argument('--session-ttl', type=float, default=0, help='Seconds before mock logins expire')
+    parser.add_argument('--mock-url', help='Use a running mock server instead of starting one')
+    parser.add_argument('--admin-url', help='Load a running admin app instead of starting one')
+    parser.add_argument('--admin-password', help='Admin password for --admin-url')
+    parser.add_argument('--browser', action='store_true', help='Log in through Selenium like production')
+    parser.add_argument('--interval', type=float, default=5, help='Seconds between resource samples')
+    parser.add_argument('--json', help='Write the full report, including the timeline, to this file')
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    json_path = Path(args.json).resolve() if args.json else None
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        os.chdir(workdir)
+        for key in [key for key in os.environ if key.startswith(DISABLED_PREFIXES)]:
+            del os.environ[key]
+
+        children = []
+        processes = {'fbmanager': os.getpid()}
+        try:
+            if args.mock_url:
+                mock_url = args.mock_url.rstrip('/')
+            else:
+                mock = start_mock(args)
+                children.append(mock)
+                processes['mock'] = mock.pid
+                mock_url = mock.url
+
+            admin_url, admin_password = args.admin_url, args.admin_password
+            if args.admins and not admin_url:
+                admin_password = 'load-test-password'
+                (workdir / 'admin').mkdir()
+                admin = start_admin(workdir / 'admin', admin_password)
+                children.append(admin)
+                processes['admin'] = admin.pid
+                admin_url = admin.url
+
+            from cryptography.fernet import Fernet
+            os.environ.update(FACEBOOK_URL=mock_url + '/', FACEBOOK_MOBILE_URL=mock_url + '/',
+                              SESSION_DIR=str(workdir / 'sessions'),
+                              SESSION_STORE_KEY=Fernet.generate_key().decode())
+
+            print(f"Load test: {args.accounts} accounts, {args.admins} admins, {args.duration:.0f}s "
+                  f"against {mock_url}" + (f", admin app {admin_url}" if args.admins else ''))
+            recorder = Recorder()
+            sampler = ResourceSampler(processes, recorder, args.interval)
+            stop = threading.Event()
+            threads = [threading.Thread(target=account_worker, args=(i, args, mock_url, recorder, stop), daemon=True)
+                       for i in range(args.accounts)]
+            if args.admins:
+                threads += [threading.Thread(target=admin_worker, args=(i, admin_url, admin_password, recorder, stop),
+                                             daemon=True) for i in range(args.admins)]
+
+            start = time.monotonic()
+            sampler.start()
+            for thread in threads:
+                thread.start()
+            try:
+                stop.wait(args.duration)
+            except KeyboardInterrupt:
+                pass
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=30)
+            duration = time.monotonic() - start
+            sampler.stop()
+        finally:
+            for child in children:
+                child.send_signal(signal.SIGINT)
+            for child in children:
+                try:
+                    child.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    child.kill()
+
+        summary = recorder.summary()
+        cycles = summary.get('cycle', {}).get('count', 0)
+        print()
+        print(f"Ran {duration:.1f}s: {cycles} account cycles ({cycles / duration:.1f}/s)")
+        print(format_ops(summary, duration))
+        print()
+        print(format_resources(sampler.timeline, list(processes)))
+
+        if json_path:
+            report = {'args': vars(args), 'duration': duration, 'operations': summary,
+                      'timeline': sampler.timeline}
+            with open(json_path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
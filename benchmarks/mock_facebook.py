@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Mock Facebook Server
+Local stand-in for the Graph API, the login flow and page HTML, with
+configurable latency, errors and throttling, for load tests
+
+Point FB Manager at it with FACEBOOK_URL, FACEBOOK_MOBILE_URL and
+FACEBOOK_GRAPH_URL set to the printed URL.
+
+Usage:
+    python benchmarks/mock_facebook.py [--port 8800] [--latency-ms 50] [--jitter-ms 20]
+        [--error-rate 0.01] [--throttle-rps 0] [--posts-per-page 25] [--session-ttl 0]
+
+Served paths:
+    GET  /login/                 login form (email, pass, login)
+    POST /login/                 sets the c_user and xs cookies
+    GET  /home.php               200 with a live session, 302 to /login/ otherwise
+    GET  /<page>                 page HTML with posts as <article> elements
+    GET  /<version>/<id>[/<edge>] Graph API objects and edges (posts, feed, comments)
+    POST /<version>/             Graph API batch requests
+    POST /<version>/<id>/<edge>  Graph API publishing (feed, photos, comments)
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, parse_qsl, urlsplit
+
+GRAPH_PATH = re.compile(r'^/v\d+\.\d+/(?P<path>.*)$')
+
+
+class MockFacebook:
+    """Threaded HTTP server imitating the parts of Facebook FB Manager uses"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.05, jitter: float = 0.02,
+                 error_rate: float = 0.0, throttle_rps: float = 0.0, posts_per_page: int = 25,
+                 session_ttl: float = 0.0):
+        """
+        Initialize MockFacebook
+
+        Args:
+            host: Interface to listen on
+            port: Port (0 picks a free one)
+            latency: Mean added response time in seconds
+            jitter: Uniform +/- variation of the latency in seconds
+            error_rate: Share of requests answered with a 500 error
+            throttle_rps: Graph API calls per second allowed per access token
+                (0 disables); excess calls get error code 4
+            posts_per_page: Posts in page HTML and edge listings
+            session_ttl: Seconds a login session stays valid (0 for forever)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.posts_per_page = posts_per_page
+        self.session_ttl = session_ttl
+
+        self.sessions: Dict[str, float] = {}
+        self.calls: Dict[str, deque] = {}
+        self.counts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 1024
+        self.url = f'http://{host}:{self.server.server_address[1]}'
+
+    def start(self) -> 'MockFacebook':
+        threading.Thread(target=self.server.serve_forever, name='mock-facebook', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def count(self, kind: str):
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def throttled(self, token: str) -> bool:
+        """Sliding one-second window of Graph API calls per token"""
+        if not self.throttle_rps:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            window = self.calls.setdefault(token, deque())
+            while window and window[0] <= now - 1:
+                window.popleft()
+            if len(window) >= self.throttle_rps:
+                return True
+            window.append(now)
+            return False
+
+    def session_live(self, cookie_header: str) -> bool:
+        cookies = dict(part.strip().split('=', 1) for part in cookie_header.split(';') if '=' in part)
+        with self.lock:
+            created = self.sessions.get(cookies.get('xs', ''))
+        if created is None:
+            return False
+        return not self.session_ttl or time.time() - created < self.session_ttl
+
+    def graph_object(self, path: str, params: Dict[str, str]) -> Tuple[int, Any]:
+        """Answer one Graph API read"""
+        parts = [p for p in path.strip('/').split('/') if p]
+        if not parts:
+            return 400, _graph_error('Unsupported get request', 100)
+        if len(parts) == 1:
+            return 200, {'id': parts[0], 'name': f'Page {parts[0]}', 'fan_count': _number(parts[0], 100000)}
+        node, edge = parts[0], parts[1]
+        limit = min(int(params.get('limit', self.posts_per_page)), 100)
+        if edge in ('posts', 'feed'):
+            data = [{'id': f'{node}_{i}', 'message': f'Post {i} on {node}',
+                     'created_time': '2024-01-01T00:00:00+0000'} for i in range(limit)]
+        elif edge == 'comments':
+            data = [{'id': f'{node}_c{i}', 'message': f'Comment {i}', 'from': {'id': str(_number(node, 10 ** 9) + i)}}
+                    for i in range(_number(node, limit))]
+        else:
+            return 400, _graph_error(f'Unknown edge {edge}', 100)
+        return 200, {'data': data, 'paging': {'cursors': {'before': 'MA', 'after': 'MQ'}}}
+
+    def page_html(self, page: str) -> str:
+        articles = ''.join(f'<article data-id="{page}_{i}"><p>Post {i} on {page}</p>'
+                           f'<span class="likes">{_number(f"{page}{i}", 1000)}</span></article>'
+                           for i in range(self.posts_per_page))
+        return f'<!DOCTYPE html><html><head><title>{page}</title></head><body>{articles}</body></html>'
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+                self._send(status, json.dumps(payload).encode(), 'application/json', headers)
+
+            def _html(self, status: int, html: str, headers: Optional[Dict[str, str]] = None):
+                self._send(status, html.encode(), 'text/html; charset=utf-8', headers)
+
+            def _form(self) -> Dict[str, str]:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                return dict(parse_qsl(body))
+
+            def _delay_and_fail(self) -> bool:
+                """Apply latency; True when this request should fail"""
+                delay = mock.latency + random.uniform(-mock.jitter, mock.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if mock.error_rate and random.random() < mock.error_rate:
+                    mock.count('error')
+                    self._json(500, _graph_error('An unexpected error has occurred', 2))
+                    return True
+                return False
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if self._delay_and_fail():
+                    return
+
+                match = GRAPH_PATH.match(url.path)
+                if match:
+                    if mock.throttled(params.get('access_token', '')):
+                        mock.count('throttled')
+                        return self._json(400, _graph_error('Application request limit reached', 4))
+                    mock.count('graph_read')
+                    status, body = mock.graph_object(match.group('path'), params)
+                    return self._json(status, body)
+
+                if url.path == '/login/':
+                    mock.count('login_form')
+                    return self._html(200, LOGIN_FORM)
+                if url.path == '/home.php':
+                    mock.count('session_check')
+                    if mock.session_live(self.headers.get('Cookie', '')):
+                        return self._html(200, '<html><body>News Feed</body></html>')
+                    return self._send(302, b'', 'text/plain', {'Location': '/login/'})
+                if url.path.strip('/'):
+                    mock.count('page_html')
+                    return self._html(200, mock.page_html(url.path.strip('/')))
+                return self._html(200, '<html><body>Facebook</body></html>')
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                form = self._form()
+                if self._delay_and_fail():
+                    return
+
+                if url.path == '/login/':
+                    mock.count('login')
+                    if not form.get('email') or not form.get('pass'):
+                        return self._html(200, LOGIN_FORM)
+                    token = hashlib.sha256(f'{form["email"]}{time.time()}{random.random()}'.encode()).hexdigest()
+                    with mock.lock:
+                        mock.sessions[token] = time.time()
+                    user_id = _number(form['email'], 10 ** 12)
+                    self.send_response(302)
+                    self.send_header('Location', '/')
+                    self.send_header('Set-Cookie', f'c_user={user_id}; Path=/; Max-Age=31536000')
+                    self.send_header('Set-Cookie', f'xs={token}; Path=/; Max-Age=31536000; HttpOnly')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                match = GRAPH_PATH.match(url.path)
+                if not match:
+                    return self._json(404, _graph_error('Not found', 803))
+                if mock.throttled(form.get('access_token', '')):
+                    mock.count('throttled')
+                    return self._json(400, _graph_error('Application request limit reached', 4))
+
+                path = match.group('path').strip('/')
+                if not path and 'batch' in form:
+                    mock.count('graph_batch')
+                    results = []
+                    for operation in json.loads(form['batch']):
+                        relative = urlsplit(operation.get('relative_url', ''))
+                        status, body = mock.graph_object(relative.path,
+                                                         {k: v[0] for k, v in parse_qs(relative.query).items()})
+                        results.append({'code': status, 'body': json.dumps(body)})
+                    return self._json(200, results)
+
+                parts = path.split('/')
+                if len(parts) == 2 and parts[1] in ('feed', 'photos', 'comments'):
+                    mock.count('graph_publish')
+                    object_id = f'{parts[0]}_{random.getrandbits(40)}'
+                    if parts[1] == 'photos':
+                        return self._json(200, {'id': str(random.getrandbits(40)), 'post_id': object_id})
+                    return self._json(200, {'id': object_id})
+                return self._json(400, _graph_error('Unsupported post request', 100))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+LOGIN_FORM = ('<!DOCTYPE html><html><body><form method="post" action="/login/">'
+              '<input name="email"><input name="pass" type="password">'
+              '<button name="login" type="submit">Log in</button></form></body></html>')
+
+
+def _graph_error(message: str, code: int) -> Dict[str, Any]:
+    return {'error': {'message': message, 'type': 'OAuthException', 'code': code}}
+
+
+def _number(seed: str, modulo: int) -> int:
+    """Stable pseudo-random number for generated content"""
+    return int(hashlib.md5(seed.encode()).hexdigest()[:12], 16) % modulo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Facebook server for load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rps', type=float, default=0, help='Graph calls per second per token')
+    parser.add_argument('--posts-per-page', type=int, default=25)
+    parser.add_argument('--session-ttl', type=float, default=0, help='Seconds before logins expire')
+    args = parser.parse_args()
+
+    mock = MockFacebook(args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate,
+                        args.throttle_rps, args.posts_per_page, args.session_ttl)
+    print(f"Mock Facebook on {mock.url}", flush=True)
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(mock.counts), flush=True)
+
+
+if __name__ == '__main__':
+    main()
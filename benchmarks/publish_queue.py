@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Publish Queue Check
+Enqueues a day's worth of posts across many pages into a temporary
+queue and drains it with the Publisher against a simulated Graph API,
+with one slow page and a rate-limited page, to show throughput and that
+neither holds up the other pages
+
+Usage:
+    python benchmarks/publish_queue.py [--posts 5000] [--pages 200] [--workers 16]
+        [--latency-ms 20] [--slow-ms 500] [--error-rate 0.02]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish queue throughput check')
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=20, help='Simulated publish latency')
+    parser.add_argument('--slow-ms', type=float, default=500, help='Publish latency of the slow page')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Share of transient failures')
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.ERROR)
+    from fbmanager.graph_api import GraphAPIError
+    from fbmanager.publish_queue import PublishQueue
+    from fbmanager.publishing import Publisher
+
+    slow_page, limited_page = 'page-0', 'page-1'
+    lock = threading.Lock()
+    finished = {}
+    limited_once = []
+
+    def publish(page_id, payload):
+        if page_id == limited_page and not limited_once:
+            limited_once.append(True)
+            raise GraphAPIError('Page request limit reached', code=32, status=400)
+        time.sleep((args.slow_ms if page_id == slow_page else args.latency_ms) / 1000)
+        if random.random() < args.error_rate:
+            raise GraphAPIError('An unexpected error has occurred', code=2, status=500)
+        return f'{page_id}_{random.getrandbits(48)}'
+
+    def on_result(post, status, detail):
+        if status == 'published':
+            with lock:
+                finished[post['page_id']] = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        queue = PublishQueue(str(Path(workdir) / 'publish_queue.db'))
+        posts = [(f'page-{i % args.pages}', {'message': f'Post {i}'}, None) for i in range(args.posts)]
+
+        start = time.perf_counter()
+        results = queue.enqueue_many(posts)
+        duplicates = queue.enqueue_many(posts[:100])
+        elapsed = time.perf_counter() - start
+        print(f"Enqueued {len(results)} posts in {elapsed:.2f}s; "
+              f"re-enqueue of 100 gave {sum(not created for _, created in duplicates)} duplicates")
+
+        publisher = Publisher(queue, publish, workers=args.workers, page_interval=0, backoff=0.05,
+                              throttle_delay=1.0, poll_interval=0.01, on_result=on_result)
+        start = time.perf_counter()
+        publisher.start()
+        while True:
+            stats = queue.stats()
+            if not stats['pending'] and not stats['publishing']:
+                break
+            time.sleep(0.1)
+        publisher.stop()
+        elapsed = time.perf_counter() - start
+
+        print(f"Published {stats['published']} posts ({stats['failed']} failed) in {elapsed:.2f}s "
+              f"({stats['published'] / elapsed:.0f} posts/s, {args.workers} workers)")
+        others = [t - start for page, t in finished.items() if page not in (slow_page, limited_page)]
+        if others:
+            print(f"Other pages finished after {max(others):.2f}s; "
+                  f"slow page after {finished.get(slow_page, time.perf_counter()) - start:.2f}s, "
+                  f"rate-limited page after {finished.get(limited_page, time.perf_counter()) - start:.2f}s")
+
+        sys.exit(0 if stats['published'] + stats['failed'] == args.posts else 1)
+
+
+if __name__ == '__main__':
+    main()
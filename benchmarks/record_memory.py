@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Record Memory Benchmark
+Bytes per record for a large comment collection held as dicts, as
+__slots__ Comment objects and as a columnar CommentBatch, plus the time
+to build each and to convert the batch to pandas
+
+Usage:
+    python benchmarks/record_memory.py [--count 1000000] [--pages 1000] [--posts 50000]
+        [--authors 200000] [--message-length 40]
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def generate(count: int, pages: int, posts: int, authors: int, message_length: int, seed: int = 7):
+    """Yield comment field tuples with fresh string objects, as parsing JSON produces"""
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+             for _ in range(2000)]
+    templates = [' '.join(rng.choice(words) for _ in range(message_length // 6 + 1))[:message_length - 1]
+                 for _ in range(5000)]
+    for i in range(count):
+        post = rng.randrange(posts)
+        page = post % pages
+        # Concatenation makes a new string object per comment
+        message = templates[i % len(templates)] + str(i % 10)
+        yield (f'{100000000000 + post}_{200000000000 + i}', f'{900000000 + page}_{100000000000 + post}',
+               f'{900000000 + page}', f'{300000000000 + rng.randrange(authors)}',
+               1700000000 + rng.randrange(30000000), rng.randrange(500), rng.randrange(20), message)
+
+
+def measure(name: str, build):
+    """Build a collection and report its retained memory"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory per record: dicts vs slots vs columnar')
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--authors', type=int, default=200000)
+    parser.add_argument('--message-length', type=int, default=40)
+    args = parser.parse_args()
+
+    from fbmanager.records import Comment, CommentBatch
+
+    fields = Comment.__slots__
+    rows = lambda: generate(args.count, args.pages, args.posts, args.authors, args.message_length)
+
+    def build_dicts():
+        return [dict(zip(fields, row)) for row in rows()]
+
+    def build_slots():
+        return [Comment(*row) for row in rows()]
+
+    def build_batch():
+        batch = CommentBatch()
+        for row in rows():
+            batch.append(*row)
+        return batch
+
+    print(f"{args.count:,} comments over {args.pages:,} pages, {args.posts:,} posts, {args.authors:,} authors, "
+          f"{args.message_length}-character messages")
+    print(f"{'representation':<18} {'total':>10} {'bytes/record':>13} {'vs dict':>8} {'build':>8}")
+    baseline = None
+    batch = None
+    for name, build in (('dict', build_dicts), ('__slots__', build_slots), ('CommentBatch', build_batch)):
+        result, size, elapsed = measure(name, build)
+        baseline = baseline or size
+        print(f"{name:<18} {size / 2 ** 20:>8.1f}MB {size / args.count:>13.1f} {size / baseline:>7.0%} "
+              f"{elapsed:>7.2f}s")
+        if name == 'CommentBatch':
+            batch = result
+        del result
+
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("pandas is not installed, skipping DataFrame conversion")
+        return
+
+    for copy in (False, True):
+        frame, size, elapsed = measure('to_frame', lambda: batch.to_frame(copy=copy))
+        print(f"to_frame(copy={copy}): {elapsed * 1000:.0f}ms, {size / 2 ** 20:.1f}MB added")
+        del frame
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Startup Time Report
+Measures cold start of main.py and app.py with `python -X importtime`
+and fails when an entry point exceeds its budget
+
+Usage:
+    python benchmarks/startup_time.py [--runs 5] [--top 15] [--budget main=500 --budget app=800]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Code run for each entry point; app includes the factory since gunicorn calls it
+ENTRY_POINTS = {
+    'main': 'import main',
+    'app': 'import app; app.create_app()',
+}
+
+# Default cold-start budgets in milliseconds
+DEFAULT_BUDGETS_MS = {
+    'main': 500,
+    'app': 800,
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Parse -X importtime output
+
+    Returns:
+        List of (module, self_us, cumulative_us)
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|', 2)
+        # Drop the separator space but keep the indentation that marks nesting
+        modules.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure(code: str, runs: int, workdir: str) -> Tuple[List[float], List[Tuple[str, int, int]]]:
+    """Run code in fresh interpreters; return wall times (ms) and the last import profile"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = str(ROOT)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    env['LOG_FILE'] = os.path.join(workdir, 'app.log')
+
+    times = []
+    modules = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                cwd=workdir, env=env, capture_output=True, text=True)
+        times.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise RuntimeError(f'{code!r} failed:\n{result.stderr[-2000:]}')
+        modules = parse_importtime(result.stderr)
+
+    return times, modules
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for value in values or []:
+        name, _, limit = value.partition('=')
+        if name not in ENTRY_POINTS or not limit:
+            raise SystemExit(f'Invalid budget {value!r}; expected one of {list(ENTRY_POINTS)}=MS')
+        budgets[name] = float(limit)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entry point cold-start report')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list')
+    parser.add_argument('--budget', action='append', help='NAME=MS, e.g. main=500')
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget)
+    over_budget = []
+
+    for name, code in ENTRY_POINTS.items():
+        with tempfile.TemporaryDirectory() as workdir:
+            times, modules = measure(code, args.runs, workdir)
+
+        median = statistics.median(times)
+        status = 'OK' if median <= budgets[name] else 'OVER BUDGET'
+        if median > budgets[name]:
+            over_budget.append(name)
+
+        print('=' * 60)
+        print(f"{name}: median {median:.0f}ms, min {min(times):.0f}ms "
+              f"(budget {budgets[name]:.0f}ms) {status}")
+        print('=' * 60)
+
+        # The interpreter indents nested imports by two spaces per level;
+        # list entry points and the modules they import directly
+        shallow = [(m.strip(), s, c) for m, s, c in modules if len(m) - len(m.lstrip()) <= 2]
+        print(f"{'module':<40} {'cumulative':>12} {'self':>10}")
+        for module, self_us, cumulative_us in sorted(shallow, key=lambda m: -m[2])[:args.top]:
+            print(f"{module:<40} {cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms")
+        print()
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Upload Pipeline Check
+Runs the chunked uploader against a local mock upload server: a clean
+upload, an upload interrupted part-way and resumed, and an upload
+through injected chunk failures, verifying the stored file each time
+
+Usage:
+    python benchmarks/upload_pipeline.py [--size-mb 256] [--chunk-mb 8] [--workers 4]
+        [--fail-rate 0.05] [--latency-ms 0]
+    python benchmarks/upload_pipeline.py --serve [--port 8765]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+class MockUploadServer:
+    """In-memory implementation of the ChunkedHTTPProtocol endpoints"""
+
+    def __init__(self, storage_dir: str, port: int = 0, fail_rate: float = 0.0, latency: float = 0.0):
+        self.storage_dir = Path(storage_dir)
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.uploads = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def do_POST(self):
+                body = self._body()
+                if self.path == '/uploads':
+                    meta = json.loads(body)
+                    upload_id = hashlib.sha1(os.urandom(8)).hexdigest()
+                    with mock.lock:
+                        mock.uploads[upload_id] = dict(meta, received={})
+                    (mock.storage_dir / upload_id).write_bytes(b'')
+                    os.truncate(mock.storage_dir / upload_id, meta['size'])
+                    return self._reply(200, {'upload_id': upload_id})
+
+                match = re.fullmatch(r'/uploads/(\w+)/complete', self.path)
+                upload = match and mock.uploads.get(match.group(1))
+                if not upload:
+                    return self._reply(404, {'error': 'Unknown upload'})
+                if len(upload['received']) != upload['chunks']:
+                    return self._reply(409, {'error': 'Missing chunks'})
+                combined = hashlib.sha256()
+                for i in range(upload['chunks']):
+                    combined.update(bytes.fromhex(upload['received'][str(i)]))
+                checksum = combined.hexdigest()
+                if checksum != json.loads(body)['sha256']:
+                    return self._reply(422, {'error': 'Checksum mismatch'})
+                return self._reply(200, {'id': match.group(1), 'sha256': checksum})
+
+            def do_GET(self):
+                match = re.fullmatch(r'/uploads/(\w+)', self.path)
+                upload = match and mock.uploads.get(match.group(1))
+                if not upload:
+                    return self._reply(404, {'error': 'Unknown upload'})
+                with mock.lock:
+                    return self._reply(200, {'received': dict(upload['received'])})
+
+            def do_PUT(self):
+                with mock.lock:
+                    mock.requests += 1
+                data = self._body()
+                if mock.latency:
+                    time.sleep(mock.latency)
+                match = re.fullmatch(r'/uploads/(\w+)/chunks/(\d+)', self.path)
+                upload = match and mock.uploads.get(match.group(1))
+                if not upload:
+                    return self._reply(404, {'error': 'Unknown upload'})
+                if random.random() < mock.fail_rate:
+                    return self._reply(503, {'error': 'Injected failure'})
+                digest = hashlib.sha256(data).hexdigest()
+                if digest != self.headers.get('X-Chunk-SHA256'):
+                    return self._reply(422, {'error': 'Chunk checksum mismatch'})
+                with open(mock.storage_dir / match.group(1), 'r+b') as f:
+                    f.seek(int(self.headers['X-Chunk-Offset']))
+                    f.write(data)
+                with mock.lock:
+                    upload['received'][match.group(2)] = digest
+                return self._reply(200, {'sha256': digest})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_file(path: Path, size: int):
+    block = os.urandom(1 << 20)
+    with open(path, 'wb') as f:
+        for offset in range(0, size, len(block)):
+            f.write(block[:min(len(block), size - offset)])
+
+
+class Interrupt(Exception):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chunked upload pipeline check')
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--chunk-mb', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--fail-rate', type=float, default=0.05)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added per-chunk server latency')
+    parser.add_argument('--serve', action='store_true', help='Only run the mock server')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    from fbmanager.uploads import ChunkedHTTPProtocol, ChunkedUploader
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        (workdir / 'server').mkdir()
+
+        if args.serve:
+            server = MockUploadServer(workdir / 'server', args.port, args.fail_rate, args.latency_ms / 1000)
+            print(f"Mock upload server on {server.url}")
+            try:
+                server.server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+
+        source = workdir / 'video.bin'
+        make_file(source, args.size_mb * 1024 * 1024)
+        expected = file_sha256(source)
+        size_mb = args.size_mb
+
+        def run(name, fail_rate=0.0, interrupt_after=None):
+            server = MockUploadServer(workdir / 'server', fail_rate=fail_rate,
+                                      latency=args.latency_ms / 1000).start()
+            uploader = ChunkedUploader(chunk_size=args.chunk_mb * 1024 * 1024, max_workers=args.workers,
+                                       state_dir=str(workdir / 'state'), backoff=0.01)
+            protocol = ChunkedHTTPProtocol(server.url)
+            start = time.perf_counter()
+
+            if interrupt_after is not None:
+                def on_progress(done, total):
+                    if done >= total * interrupt_after:
+                        raise Interrupt()
+                try:
+                    uploader.upload(str(source), protocol, target='mock', on_progress=on_progress)
+                except Interrupt:
+                    pass
+                sent_before = server.requests
+                result = uploader.upload(str(source), protocol, target='mock')
+                resumed = server.requests - sent_before
+            else:
+                result = uploader.upload(str(source), protocol, target='mock')
+                resumed = None
+
+            elapsed = time.perf_counter() - start
+            stored = file_sha256(workdir / 'server' / result['id'])
+            status = 'OK' if stored == expected else 'CORRUPT'
+            extra = f", {resumed} chunk requests after resume" if resumed is not None else ''
+            print(f"{name:<24} {elapsed:6.2f}s {size_mb / elapsed:8.1f} MB/s  "
+                  f"{server.requests} chunk requests{extra}  {status}")
+            server.stop()
+            return status == 'OK'
+
+        ok = run('clean')
+        ok &= run('interrupted at 50%', interrupt_after=0.5)
+        ok &= run(f'{args.fail_rate:.0%} chunk failures', fail_rate=args.fail_rate)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
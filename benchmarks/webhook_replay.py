@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Webhook Replay
+Signs fixture payloads with the app secret and replays them against the
+webhook receiver, then optionally drains the queue with the FBManager
+consumer to measure end-to-end throughput
+
+Usage:
+    python benchmarks/webhook_replay.py [FIXTURE ...] [--count 10000] [--concurrency 8]
+        [--url http://127.0.0.1:5000/webhooks/facebook] [--secret SECRET] [--consume]
+
+Without --url the receiver runs in-process through Flask's test client
+against a temporary queue, so no server or real app secret is needed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures' / 'webhooks'
+
+
+def load_fixtures(paths: List[str]) -> List[Tuple[str, bytes]]:
+    """Read fixtures as compact JSON bodies, as Facebook sends them"""
+    files = [Path(p) for p in paths] or sorted(FIXTURES_DIR.glob('*.json'))
+    return [(f.name, json.dumps(json.loads(f.read_text()), separators=(',', ':')).encode()) for f in files]
+
+
+def replay_http(url: str, bodies: List[bytes], secret: str, concurrency: int) -> List[int]:
+    import requests
+    from config_manager.webhooks import SIGNATURE_HEADER, sign
+
+    local = threading.local()
+
+    def send(body: bytes) -> int:
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.post(url, data=body, headers={
+            'Content-Type': 'application/json', SIGNATURE_HEADER: sign(body, secret)})
+        return response.status_code
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(send, bodies))
+
+
+def replay_in_process(app, bodies: List[bytes], secret: str, concurrency: int) -> List[int]:
+    from config_manager.webhooks import SIGNATURE_HEADER, sign
+
+    local = threading.local()
+
+    def send(body: bytes) -> int:
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        return client.post('/webhooks/facebook', data=body, content_type='application/json',
+                           headers={SIGNATURE_HEADER: sign(body, secret)}).status_code
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(send, bodies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay signed webhook fixtures')
+    parser.add_argument('fixtures', nargs='*', help=f'Payload files (default: {FIXTURES_DIR.relative_to(ROOT)})')
+    parser.add_argument('--count', type=int, default=1000, help='Deliveries to send')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--url', help='Receiver URL; omit to run the app in-process')
+    parser.add_argument('--secret', default=os.getenv('FACEBOOK_APP_SECRET', 'replay-secret'))
+    parser.add_argument('--consume', action='store_true',
+                        help='Drain the queue with EventConsumer afterwards (in-process only)')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    bodies = [fixtures[i % len(fixtures)][1] for i in range(args.count)]
+    print(f"Replaying {args.count} deliveries from {', '.join(name for name, _ in fixtures)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            start = time.perf_counter()
+            statuses = replay_http(args.url, bodies, args.secret, args.concurrency)
+        else:
+            import logging
+            logging.disable(logging.WARNING)
+            os.chdir(workdir)
+            os.environ['FACEBOOK_APP_SECRET'] = args.secret
+            os.environ['WEBHOOK_QUEUE_DB'] = os.path.join(workdir, 'webhook_events.db')
+            from app import create_app
+            app = create_app()
+            start = time.perf_counter()
+            statuses = replay_in_process(app, bodies, args.secret, args.concurrency)
+
+        elapsed = time.perf_counter() - start
+        accepted = statuses.count(200)
+        print(f"Accepted {accepted}/{len(statuses)} in {elapsed:.2f}s ({len(statuses) / elapsed:.0f} deliveries/s)")
+        rejected = sorted(set(statuses) - {200})
+        if rejected:
+            print(f"Rejected with status codes: {rejected}")
+
+        if args.consume and not args.url:
+            from fbmanager.event_queue import EventConsumer, EventQueue
+            events = []
+            consumer = EventConsumer(EventQueue(os.environ['WEBHOOK_QUEUE_DB']), events.extend)
+            start = time.perf_counter()
+            while consumer.process_batch():
+                pass
+            elapsed = time.perf_counter() - start
+            print(f"Consumed {len(events)} events in {elapsed:.2f}s ({len(events) / elapsed:.0f} events/s)")
+
+        if rejected:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Assets Module
+Fingerprinted, precompressed static assets and template fragment caching
+
+Pages and API responses are not compressed on the fly: they carry CSRF
+tokens and session data next to request input, which compression would
+leak through the response length (BREACH). Views without secrets can opt
+in with @compressed.
+
+Usage:
+    python -m config_manager.assets    # build static/dist and manifest.json
+"""
+
+import gzip
+import hashlib
+import json
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+from flask import abort, make_response, request, send_file
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).parent / 'static'
+DIST_DIR = STATIC_DIR / 'dist'
+
+# File types that are fingerprinted and precompressed
+ASSET_SUFFIXES = ('.css', '.js', '.svg')
+
+# Responses below this size are not worth compressing on the fly
+MIN_COMPRESS_SIZE = 500
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def build_assets(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    """
+    Fingerprint and precompress static assets
+
+    Each asset is copied to dist/ with a content hash in its name, next to
+    .gz and (when the brotli package is installed) .br variants.
+
+    Returns:
+        Manifest mapping source paths to fingerprinted paths
+    """
+    dist_dir = static_dir / 'dist'
+    dist_dir.mkdir(exist_ok=True)
+    manifest = {}
+
+    for source in sorted(static_dir.rglob('*')):
+        if not source.is_file() or dist_dir in source.parents or source.suffix not in ASSET_SUFFIXES:
+            continue
+
+        data = source.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        relative = source.relative_to(static_dir)
+        fingerprinted = relative.with_name(f'{source.stem}.{digest}{source.suffix}')
+        target = dist_dir / fingerprinted
+
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+            target.with_name(target.name + '.gz').write_bytes(gzip.compress(data, 9, mtime=0))
+            if brotli:
+                target.with_name(target.name + '.br').write_bytes(brotli.compress(data, quality=11))
+            logger.info(f"Built asset {fingerprinted}")
+
+        manifest[relative.as_posix()] = f'dist/{fingerprinted.as_posix()}'
+
+    with open(dist_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return manifest
+
+
+def load_manifest(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    """
+    Load the asset manifest, rebuilding it when sources changed
+
+    Returns:
+        Manifest, or an empty dict if assets cannot be built
+    """
+    manifest_path = static_dir / 'dist' / 'manifest.json'
+    try:
+        if manifest_path.exists():
+            built = manifest_path.stat().st_mtime
+            sources = [p for p in static_dir.rglob('*')
+                       if p.suffix in ASSET_SUFFIXES and (static_dir / 'dist') not in p.parents]
+            if all(p.stat().st_mtime <= built for p in sources):
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        return build_assets(static_dir)
+    except OSError as e:
+        logger.warning(f"Serving unfingerprinted assets, could not build dist: {e}")
+        return {}
+
+
+def init_assets(app, blueprint_name: str = 'config'):
+    """
+    Serve fingerprinted assets from a blueprint's static folder
+
+    url_for('<blueprint>.static', filename=...) is rewritten to the
+    fingerprinted file, which is served with far-future cache headers and
+    a precompressed variant when the client accepts one.
+    """
+    manifest = load_manifest()
+    static_endpoint = f'{blueprint_name}.static'
+    app.extensions['config_manager_assets'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == static_endpoint and 'filename' in values:
+            values['filename'] = manifest.get(values['filename'], values['filename'])
+
+    blueprint = app.blueprints[blueprint_name]
+    url_path = f'{blueprint.url_prefix or ""}{blueprint.static_url_path}/dist/<path:filename>'
+    app.add_url_rule(url_path, f'{blueprint_name}.dist_asset', serve_dist_asset)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+
+def serve_dist_asset(filename: str):
+    """Serve a fingerprinted asset, preferring a precompressed variant"""
+    path = (DIST_DIR / filename).resolve()
+    if DIST_DIR.resolve() not in path.parents or not path.is_file() or filename.endswith(('.gz', '.br')):
+        abort(404)
+
+    accepted = request.headers.get('Accept-Encoding', '')
+    encoding = None
+    for name, suffix in (('br', '.br'), ('gzip', '.gz')):
+        candidate = path.with_name(path.name + suffix)
+        if name in accepted and candidate.exists():
+            encoding = name
+            send_path = candidate
+            break
+    else:
+        send_path = path
+
+    response = send_file(send_path, mimetype=_mimetype(path), conditional=True, etag=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compressed(view):
+    """
+    Gzip a view's responses for clients that accept it
+
+    Only for views whose responses hold no secrets (CSRF tokens, session
+    or config values) alongside request-controlled content.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return compress_response(make_response(view(*args, **kwargs)))
+    return wrapper
+
+
+def compress_response(response):
+    """Gzip a text response for clients that accept it"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype.startswith('text/') or response.mimetype == 'application/json')
+            or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, 6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    # The gzip bytes are a different representation than the identity body
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-gzip', weak)
+    return response
+
+
+def _mimetype(path: Path) -> Optional[str]:
+    return {'.css': 'text/css', '.js': 'text/javascript', '.svg': 'image/svg+xml'}.get(path.suffix)
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja tag that renders a template fragment once and reuses it
+
+        {% cache 'footer' %} ... {% endcache %}
+
+    Only use it for fragments that do not depend on the request.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache={})
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache', [key]), [], [], body).set_lineno(lineno)
+
+    def _cache(self, key, caller):
+        cache = self.environment.fragment_cache
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = caller()
+        return value
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    result = build_assets()
+    print(f"Built {len(result)} assets into {DIST_DIR}")
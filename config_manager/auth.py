@@ -10,8 +10,15 @@ from pathlib import Path
 from typing import Optional, Tuple
 import logging
 
+from fbmanager.metrics import Counter, Histogram
+
 logger = logging.getLogger(__name__)
 
+OPERATION_SECONDS = Histogram('fbmanager_auth_operation_seconds',
+                              'Duration of admin authentication operations', ['operation'])
+LOGIN_ATTEMPTS = Counter('fbmanager_admin_login_attempts_total',
+                         'Admin credential checks by result', ['result'])
+
 
 class AdminAuth:
     """Handles admin authentication"""
@@ -25,6 +32,7 @@ class AdminAuth:
         """
         self.credentials_path = Path(credentials_path)
     
+    @OPERATION_SECONDS.time(operation='verify_credentials')
     def verify_credentials(self, username: str, password: str) -> bool:
         """
         Verify admin credentials
@@ -46,14 +54,17 @@ class AdminAuth:
             # Check username
             if username != stored_username:
                 logger.warning(f"Invalid username attempt: {username}")
+                LOGIN_ATTEMPTS.labels(result='failure').inc()
                 return False
             
             # Verify password
             if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
                 logger.info(f"Successful login for user: {username}")
+                LOGIN_ATTEMPTS.labels(result='success').inc()
                 return True
             else:
                 logger.warning(f"Invalid password for user: {username}")
+                LOGIN_ATTEMPTS.labels(result='failure').inc()
                 return False
                 
         except Exception as e:
@@ -89,6 +100,7 @@ class AdminAuth:
             logger.error(f"Error loading credentials: {e}")
             return None, None
     
+    @OPERATION_SECONDS.time(operation='create_credentials')
     def create_credentials(self, username: str, password: str) -> bool:
         """
         Create or update admin credentials
@@ -5,14 +5,59 @@ Handles reading, writing, and backing up .env files
 
 import os
 import re
+import json
+import time
+import fcntl
 import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from functools import wraps
 from pathlib import Path
 from typing import Dict, List, Optional
 import logging
 
+from fbmanager.metrics import Histogram, Gauge
+
 logger = logging.getLogger(__name__)
 
+OPERATION_SECONDS = Histogram('fbmanager_env_operation_seconds',
+                              'Duration of .env file operations', ['operation'])
+BACKUP_COUNT = Gauge('fbmanager_env_backups', 'Number of .env backups found by the last listing')
+
+# Number of change records kept for subscribers catching up
+MAX_CHANGE_RECORDS = 100
+
+
+class VersionConflictError(Exception):
+    """Raised when the .env file changed since the version a caller read"""
+    
+    def __init__(self, expected: str, actual: str):
+        super().__init__(f'.env version is {actual}, expected {expected}')
+        self.expected = expected
+        self.actual = actual
+
+
+def _with_file_lock(method):
+    """Run an EnvHandler method while holding the .env file lock"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _records_changes(method):
+    """Record which variables an EnvHandler method changed in the change log"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        before = self._snapshot()
+        result = method(self, *args, **kwargs)
+        self._record_change(before, self._snapshot())
+        return result
+    return wrapper
+
 
 class EnvHandler:
     """Handles .env file operations with backup support"""
@@ -26,8 +71,118 @@ class EnvHandler:
         """
         self.env_path = Path(env_path)
         self.backup_dir = self.env_path.parent / 'backups'
-        self.backup_dir.mkdir(exist_ok=True)
+        self.changes_path = self.env_path.parent / f'{self.env_path.name}.changes'
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+    
+    @contextmanager
+    def lock(self):
+        """
+        Hold an exclusive lock on the .env file
+        
+        Serializes writers across threads and worker processes. The lock
+        is re-entrant within a thread.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                lock_path = self.env_path.parent / f'{self.env_path.name}.lock'
+                self._lock_file = open(lock_path, 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+    
+    def file_version(self) -> str:
+        """
+        Version of the .env file, derived from its content
+        
+        Returns:
+            Short content hash, or an empty string if the file does not exist
+        """
+        try:
+            return hashlib.sha256(self.env_path.read_bytes()).hexdigest()[:16]
+        except FileNotFoundError:
+            return ''
+    
+    def read_changes(self) -> Dict:
+        """
+        Read the change log
+        
+        Returns:
+            Dictionary with the current config 'version' (a counter that
+            increases with every change) and the most recent 'changes'
+        """
+        try:
+            with open(self.changes_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'version': 0, 'changes': []}
+    
+    def _snapshot(self) -> Dict[str, str]:
+        if not self.env_path.exists():
+            return {}
+        return self.read_env()
+    
+    def _record_change(self, before: Dict[str, str], after: Dict[str, str]):
+        """Append a change record and bump the version if any variable changed"""
+        changed = sorted(key for key in after if before.get(key) != after[key])
+        removed = sorted(set(before) - set(after))
+        if not changed and not removed:
+            return
+        
+        log = self.read_changes()
+        version = log['version'] + 1
+        log['version'] = version
+        log['changes'] = (log['changes'] + [{
+            'version': version,
+            'time': time.time(),
+            'changed': changed,
+            'removed': removed,
+        }])[-MAX_CHANGE_RECORDS:]
+        
+        # Replace atomically so readers never see a partial file
+        tmp_path = self.changes_path.with_name(self.changes_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(log, f)
+        os.replace(tmp_path, self.changes_path)
+        logger.info(f"Config version {version}: changed {changed}, removed {removed}")
     
+    @OPERATION_SECONDS.time(operation='update_env')
+    @_with_file_lock
+    def update_env(self, updates: Dict[str, str], expected_version: Optional[str] = None) -> Dict[str, List[str]]:
+        """
+        Apply a partial update if the file is still at the expected version
+        
+        Args:
+            updates: Variables to change; other variables are kept
+            expected_version: Version the caller read, or None to skip the check
+            
+        Returns:
+            Dictionary of validation errors (empty if the update was written)
+            
+        Raises:
+            VersionConflictError: If the file changed since expected_version
+        """
+        current_version = self.file_version()
+        if expected_version is not None and expected_version != current_version:
+            raise VersionConflictError(expected_version, current_version)
+        
+        env_vars = self.read_env()
+        env_vars.update(updates)
+        
+        errors = self.validate_env(env_vars)
+        if not errors:
+            self.write_env(env_vars, create_backup=True)
+        return errors
+    
+    @OPERATION_SECONDS.time(operation='read_env')
     def read_env(self) -> Dict[str, str]:
         """
         Read environment variables from .env file
@@ -65,6 +220,9 @@ class EnvHandler:
             logger.error(f"Error reading .env file: {e}")
             raise
     
+    @OPERATION_SECONDS.time(operation='write_env')
+    @_with_file_lock
+    @_records_changes
     def write_env(self, env_vars: Dict[str, str], create_backup: bool = True) -> bool:
         """
         Write environment variables to .env file
@@ -136,6 +294,7 @@ class EnvHandler:
                 self._restore_latest_backup()
             raise
     
+    @OPERATION_SECONDS.time(operation='read_template')
     def _read_template(self) -> List[str]:
         """Read template structure from existing .env or .env.example"""
         template = []
@@ -168,6 +327,7 @@ class EnvHandler:
         
         return template
     
+    @OPERATION_SECONDS.time(operation='create_backup')
     def create_backup(self) -> Optional[Path]:
         """
         Create a backup of the current .env file
@@ -184,6 +344,7 @@ class EnvHandler:
             backup_name = f'.env.backup.{timestamp}'
             backup_path = self.backup_dir / backup_name
             
+            self.backup_dir.mkdir(exist_ok=True)
             shutil.copy2(self.env_path, backup_path)
             os.chmod(backup_path, 0o600)
             
@@ -194,6 +355,7 @@ class EnvHandler:
             logger.error(f"Error creating backup: {e}")
             return None
     
+    @OPERATION_SECONDS.time(operation='list_backups')
     def list_backups(self) -> List[Dict[str, any]]:
         """
         List all available backups
@@ -217,12 +379,16 @@ class EnvHandler:
                     'timestamp': backup_file.name.replace('.env.backup.', '')
                 })
             
+            BACKUP_COUNT.set(len(backups))
             return backups
             
         except Exception as e:
             logger.error(f"Error listing backups: {e}")
             return []
     
+    @OPERATION_SECONDS.time(operation='restore_backup')
+    @_with_file_lock
+    @_records_changes
     def restore_backup(self, backup_name: str) -> bool:
         """
         Restore from a specific backup
@@ -265,6 +431,7 @@ class EnvHandler:
         latest = backups[0]
         return self.restore_backup(latest['name'])
     
+    @OPERATION_SECONDS.time(operation='validate_env')
     def validate_env(self, env_vars: Dict[str, str]) -> Dict[str, List[str]]:
         """
         Validate environment variables
@@ -296,12 +463,47 @@ class EnvHandler:
             except ValueError:
                 errors.setdefault('PROXY_PORT', []).append('Port must be a number')
         
+        # Validate proxy list entries: [scheme://][user:pass@]host:port
+        proxy_list = env_vars.get('PROXY_LIST', '').strip()
+        if proxy_list:
+            for entry in proxy_list.split(','):
+                entry = entry.strip()
+                if entry and not re.match(r'^((https?|socks5h?)://)?([^@\s]+@)?[^:@/\s]+:\d{1,5}$', entry):
+                    errors.setdefault('PROXY_LIST', []).append(f'Invalid proxy entry: {entry}')
+        
         # Validate URL format for redirect URI if provided
         redirect_uri = env_vars.get('FACEBOOK_REDIRECT_URI', '').strip()
         if redirect_uri:
             if not redirect_uri.startswith(('http://', 'https://')):
                 errors.setdefault('FACEBOOK_REDIRECT_URI', []).append('Must be a valid URL starting with http:// or https://')
         
+        # Validate browser profile settings
+        valid_resources = ['image', 'media', 'font', 'stylesheet']
+        for resource in env_vars.get('BROWSER_BLOCK_RESOURCES', '').split(','):
+            resource = resource.strip()
+            if resource and resource not in valid_resources:
+                errors.setdefault('BROWSER_BLOCK_RESOURCES', []).append(
+                    f'Must be one of: {", ".join(valid_resources)}')
+        
+        valid_strategies = ['normal', 'eager', 'none']
+        strategy = env_vars.get('BROWSER_PAGE_LOAD_STRATEGY', 'eager')
+        if strategy not in valid_strategies:
+            errors.setdefault('BROWSER_PAGE_LOAD_STRATEGY', []).append(
+                f'Must be one of: {", ".join(valid_strategies)}')
+        
+        # Validate profiling settings
+        profile_rate = env_vars.get('PROFILE_RATE', '').strip()
+        if profile_rate:
+            try:
+                if not 0 <= float(profile_rate) <= 100:
+                    errors.setdefault('PROFILE_RATE', []).append('Must be between 0 and 100')
+            except ValueError:
+                errors.setdefault('PROFILE_RATE', []).append('Must be a number')
+        
+        profile_mode = env_vars.get('PROFILE_MODE', 'cprofile')
+        if profile_mode not in ('cprofile', 'sample'):
+            errors.setdefault('PROFILE_MODE', []).append('Must be one of: cprofile, sample')
+        
         # Validate log level
         valid_log_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
         log_level = env_vars.get('LOG_LEVEL', 'INFO').upper()
@@ -4,7 +4,8 @@ WTForms for configuration and authentication
 """
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SelectField, IntegerField
+from wtforms import (StringField, PasswordField, BooleanField, SelectField, IntegerField,
+                     FloatField, TextAreaField, SelectMultipleField)
 from wtforms.validators import DataRequired, Email, Optional, URL, NumberRange, ValidationError
 
 
@@ -63,6 +64,9 @@ class ConfigForm(FlaskForm):
     proxy_pass = PasswordField('Proxy Password', 
                               validators=[Optional()],
                               render_kw={'placeholder': 'Optional'})
+    proxy_list = TextAreaField('Proxy Pool', 
+                              validators=[Optional()],
+                              render_kw={'placeholder': 'user:pass@host:port (one per line)', 'rows': 4})
     
     # Browser Settings
     headless_browser = BooleanField('Headless Browser', default=True)
@@ -70,3 +74,37 @@ class ConfigForm(FlaskForm):
                                   validators=[Optional(), NumberRange(min=1, max=300)],
                                   default=30,
                                   render_kw={'placeholder': '30'})
+    browser_lightweight = BooleanField('Lightweight Page Loading', default=True)
+    browser_block_resources = SelectMultipleField('Blocked Resource Types',
+                                                  choices=[
+                                                      ('image', 'Images'),
+                                                      ('media', 'Video / Audio'),
+                                                      ('font', 'Fonts'),
+                                                      ('stylesheet', 'Stylesheets')
+                                                  ],
+                                                  default=['image', 'media', 'font'])
+    browser_block_urls = TextAreaField('Blocked URL Patterns', 
+                                      validators=[Optional()],
+                                      render_kw={'placeholder': '*tracker.example.com* (one per line)', 'rows': 3})
+    browser_page_load_strategy = SelectField('Page Load Strategy', 
+                                            choices=[
+                                                ('eager', 'eager (DOM ready)'),
+                                                ('normal', 'normal (all resources)'),
+                                                ('none', 'none')
+                                            ],
+                                            default='eager')
+    
+    # Profiling
+    profile_rate = FloatField('Profiled Requests and Tasks (%)',
+                              validators=[Optional(), NumberRange(min=0, max=100)],
+                              default=0,
+                              render_kw={'placeholder': '0 (disabled)', 'step': 'any'})
+    profile_mode = SelectField('Profiler',
+                               choices=[
+                                   ('cprofile', 'cProfile (pstats)'),
+                                   ('sample', 'Sampling (collapsed stacks)')
+                               ],
+                               default='cprofile')
+    profile_tasks = StringField('Profiled Tasks',
+                                validators=[Optional()],
+                                render_kw={'placeholder': 'login, ... (empty for all tasks)'})
@@ -0,0 +1,305 @@
+"""
+Notify Module
+Config change notifications for running FB Manager workers
+
+A single asyncio event loop serves long-poll and Server-Sent Events
+subscribers, so idle subscribers cost a socket and a coroutine rather
+than a thread or a gunicorn worker. The loop watches the change log
+written by EnvHandler and wakes every waiting subscriber when the config
+version increases.
+
+Endpoints:
+    GET /config/changes?since=N[&timeout=30]   long-poll, returns JSON
+    GET /config/events[?since=N]                Server-Sent Events stream
+
+Usage:
+    python -m config_manager.notify [--port 5001] [--env .env]
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import threading
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+import logging
+
+from .env_handler import EnvHandler
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long a long-poll request is held open, in seconds
+MAX_POLL_TIMEOUT = 60
+
+# Interval between SSE keep-alive comments, in seconds
+KEEPALIVE_INTERVAL = 15
+
+
+def changes_since(log: Dict, since: int) -> Dict:
+    """
+    Build the delta a subscriber at version `since` needs
+
+    Returns:
+        Dictionary with the current version, the change records newer than
+        `since` and 'reset' set when older records were already discarded,
+        in which case the subscriber should reload the whole config
+    """
+    changes = [c for c in log['changes'] if c['version'] > since]
+    oldest = log['changes'][0]['version'] if log['changes'] else log['version'] + 1
+    return {
+        'version': log['version'],
+        'changes': changes,
+        'reset': since < oldest - 1 and log['version'] > since,
+    }
+
+
+class ConfigNotifier:
+    """Long-poll and SSE server for config version changes"""
+
+    def __init__(self, env_path: str = '.env', host: str = '127.0.0.1', port: int = 5001,
+                 token: str = '', watch_interval: float = 0.5, retry_interval: float = 5.0):
+        """
+        Initialize ConfigNotifier
+
+        Args:
+            env_path: Path to the .env file whose change log is watched
+            host: Address to listen on
+            port: Port to listen on
+            token: Bearer token required from subscribers (empty for none)
+            watch_interval: Seconds between checks of the change log
+            retry_interval: Seconds between attempts to bind a port that is
+                taken, when started with start() (0 to give up at once)
+        """
+        self.env_handler = EnvHandler(env_path)
+        self.host = host
+        self.port = port
+        self.token = token
+        self.watch_interval = watch_interval
+        self.retry_interval = retry_interval
+        self.log = self.env_handler.read_changes()
+        self.subscribers = 0
+        self._changed: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @classmethod
+    def from_env(cls, env_path: Optional[str] = None) -> Optional['ConfigNotifier']:
+        """Create a notifier from CONFIG_NOTIFY_PORT, or None when it is not set"""
+        port = os.getenv('CONFIG_NOTIFY_PORT', '')
+        if not port:
+            return None
+        return cls(env_path=env_path or os.getenv('ENV_PATH', '.env'),
+                   host=os.getenv('CONFIG_NOTIFY_HOST', '127.0.0.1'),
+                   port=int(port),
+                   token=os.getenv('CONFIG_API_TOKEN', ''))
+
+    async def serve(self):
+        """Run the server until cancelled"""
+        await self._bind()
+        logger.info(f"Serving config notifications on http://{self.host}:{self.port}")
+        await self._run_bound()
+
+    def start(self) -> bool:
+        """
+        Run the server on a background thread
+
+        When the port is taken (e.g. by another gunicorn worker that already
+        serves it), the thread keeps retrying the bind every retry_interval
+        seconds, so this process takes over if that worker exits.
+
+        Returns:
+            True if the server is listening, False if it is standing by
+        """
+        bound = threading.Event()
+        attempted = threading.Event()
+
+        async def bind_and_serve():
+            while True:
+                try:
+                    await self._bind()
+                    break
+                except OSError as e:
+                    if not attempted.is_set():
+                        logger.info(f"Config notifications not started on port {self.port}: {e}")
+                        attempted.set()
+                    if not self.retry_interval:
+                        return
+                    await asyncio.sleep(self.retry_interval)
+            if attempted.is_set():
+                logger.info(f"Took over config notifications on http://{self.host}:{self.port}")
+            bound.set()
+            attempted.set()
+            await self._run_bound()
+
+        def run():
+            try:
+                self._loop.run_until_complete(bind_and_serve())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=run, name='config-notify', daemon=True).start()
+        attempted.wait()
+        if not bound.is_set():
+            return False
+        logger.info(f"Serving config notifications on http://{self.host}:{self.port}")
+        return True
+
+    def stop(self):
+        """Stop a server started with start(), or stop waiting for its port"""
+        def cancel():
+            if self._server:
+                self._server.close()
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(cancel)
+
+    async def _bind(self):
+        self._changed = asyncio.Condition()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # The log may have moved on while another process held the port
+        self.log = self.env_handler.read_changes()
+
+    async def _run_bound(self):
+        async with self._server:
+            await asyncio.gather(self._server.serve_forever(), self._watch())
+
+    async def _watch(self):
+        """Reload the change log when its mtime changes and wake subscribers"""
+        path = self.env_handler.changes_path
+        last_mtime = path.stat().st_mtime_ns if path.exists() else 0
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                mtime = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            log = self.env_handler.read_changes()
+            if log['version'] != self.log['version']:
+                self.log = log
+                async with self._changed:
+                    self._changed.notify_all()
+
+    async def _wait_for_change(self, since: int, timeout: float) -> bool:
+        """Wait until the version passes `since`; return False on timeout"""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.log['version'] > since), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 10)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                await self._respond(writer, 405, {'success': False, 'error': 'Method not allowed'})
+                return
+
+            if self.token:
+                provided = headers.get('authorization', '')
+                # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+                if not hmac.compare_digest(provided.removeprefix('Bearer ').encode(), self.token.encode()):
+                    await self._respond(writer, 401, {'success': False, 'error': 'Authentication required'})
+                    return
+
+            url = urlsplit(parts[1])
+            query = parse_qs(url.query)
+            since = _int(query.get('since', [headers.get('last-event-id', '')])[0],
+                         self.log['version'])
+
+            if url.path == '/config/changes':
+                timeout = min(_int(query.get('timeout', [''])[0], 30), MAX_POLL_TIMEOUT)
+                await self._long_poll(writer, since, timeout)
+            elif url.path == '/config/events':
+                await self._stream(writer, since)
+            else:
+                await self._respond(writer, 404, {'success': False, 'error': 'Not found'})
+
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _long_poll(self, writer: asyncio.StreamWriter, since: int, timeout: float):
+        self.subscribers += 1
+        try:
+            if self.log['version'] <= since:
+                await self._wait_for_change(since, timeout)
+        finally:
+            self.subscribers -= 1
+        await self._respond(writer, 200, dict(changes_since(self.log, since), success=True))
+
+    async def _stream(self, writer: asyncio.StreamWriter, since: int):
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\n'
+                     b'Connection: close\r\n\r\n'
+                     b'retry: 5000\n\n')
+        await writer.drain()
+
+        self.subscribers += 1
+        try:
+            while True:
+                if self.log['version'] > since:
+                    delta = changes_since(self.log, since)
+                    since = delta['version']
+                    writer.write(f"id: {since}\nevent: config\ndata: {json.dumps(delta)}\n\n".encode())
+                elif not await self._wait_for_change(since, KEEPALIVE_INTERVAL):
+                    writer.write(b': keep-alive\n\n')
+                await writer.drain()
+        finally:
+            self.subscribers -= 1
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict):
+        body = json.dumps(payload).encode()
+        reason = {200: 'OK', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        writer.write(f'HTTP/1.1 {status} {reason}\r\n'
+                     f'Content-Type: application/json\r\n'
+                     f'Content-Length: {len(body)}\r\n'
+                     f'Connection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+
+
+def _int(value: str, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+if __name__ == '__main__':
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Config change notification server')
+    parser.add_argument('--env', default=os.getenv('ENV_PATH', '.env'))
+    parser.add_argument('--host', default=os.getenv('CONFIG_NOTIFY_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('CONFIG_NOTIFY_PORT') or 5001))
+    args = parser.parse_args()
+
+    notifier = ConfigNotifier(args.env, args.host, args.port, os.getenv('CONFIG_API_TOKEN', ''))
+    try:
+        asyncio.run(notifier.serve())
+    except KeyboardInterrupt:
+        pass
@@ -4,15 +4,23 @@ Flask routes for configuration management
 """
 
 import os
+import re
+import hmac
+import json
+import time
 import logging
-from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from datetime import datetime
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, g,
+                   current_app, abort, send_file)
 from functools import wraps
 from pathlib import Path
 
 from .auth import AdminAuth
-from .env_handler import EnvHandler
+from .env_handler import EnvHandler, VersionConflictError
 from .forms import LoginForm, ConfigForm
+from fbmanager.metrics import Counter, Gauge, Histogram
+from fbmanager.profiling import PROFILER
+from fbmanager.publish_queue import PublishQueue, STATUSES
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +30,87 @@ config_bp = Blueprint('config', __name__,
                      static_folder='static',
                      url_prefix='/admin')
 
-# Initialize handlers
-env_handler = EnvHandler()
-admin_auth = AdminAuth()
+
+def get_env_handler() -> EnvHandler:
+    """Return the app's EnvHandler, creating it on first use"""
+    handlers = current_app.extensions.setdefault('config_manager', {})
+    if 'env_handler' not in handlers:
+        handlers['env_handler'] = EnvHandler(current_app.config.get('ENV_PATH', '.env'))
+    return handlers['env_handler']
+
+
+def get_admin_auth() -> AdminAuth:
+    """Return the app's AdminAuth, creating it on first use"""
+    handlers = current_app.extensions.setdefault('config_manager', {})
+    if 'admin_auth' not in handlers:
+        handlers['admin_auth'] = AdminAuth(current_app.config.get('ADMIN_CREDENTIALS_PATH', '.admin_credentials'))
+    return handlers['admin_auth']
+
+
+def get_publish_queue() -> PublishQueue:
+    """Return the app's PublishQueue, creating it on first use"""
+    handlers = current_app.extensions.setdefault('config_manager', {})
+    if 'publish_queue' not in handlers:
+        handlers['publish_queue'] = PublishQueue(current_app.config.get('PUBLISH_QUEUE_DB', 'publish_queue.db'))
+    return handlers['publish_queue']
+
+# Request metrics
+REQUEST_SECONDS = Histogram('fbmanager_admin_request_seconds',
+                            'Admin request latency', ['endpoint', 'method'])
+REQUESTS_TOTAL = Counter('fbmanager_admin_requests_total',
+                         'Admin requests by status code', ['endpoint', 'method', 'status'])
+REQUESTS_IN_PROGRESS = Gauge('fbmanager_admin_requests_in_progress',
+                             'Admin requests currently being handled')
+
+
+@config_bp.before_request
+def start_request_timer():
+    """Record the start of a request for latency metrics"""
+    g.request_start = time.perf_counter()
+    REQUESTS_IN_PROGRESS.inc()
+
+
+@config_bp.after_request
+def count_request(response):
+    """Count responses by endpoint and status"""
+    REQUESTS_TOTAL.labels(endpoint=request.endpoint, method=request.method,
+                          status=response.status_code).inc()
+    return response
+
+
+@config_bp.teardown_request
+def observe_request(exc=None):
+    """Record request latency, including requests that raised"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                endpoint=request.endpoint, method=request.method)
+        REQUESTS_IN_PROGRESS.dec()
+
+
+# Downloading profiles is not profiled, so the latest profile is a real request
+PROFILE_ENDPOINTS = {'config.profiles', 'config.latest_profile', 'config.download_profile'}
+
+
+@config_bp.before_request
+def start_profile():
+    """Profile a sample of requests while profiling is enabled"""
+    if PROFILER.enabled and request.endpoint not in PROFILE_ENDPOINTS:
+        g.profile = PROFILER.start('request', request.endpoint or 'unknown')
+
+
+@config_bp.teardown_request
+def stop_profile(exc=None):
+    """Write the request's profile, if it was sampled"""
+    capture = g.pop('profile', None)
+    if capture:
+        PROFILER.stop(capture)
+
+
+# Session timeout and how often last_activity is refreshed, in seconds.
+# Refreshing at coarse granularity avoids rewriting the session on every request.
+SESSION_TIMEOUT = 30 * 60
+ACTIVITY_UPDATE_INTERVAL = 60
 
 
 def login_required(f):
@@ -36,20 +122,53 @@ def login_required(f):
             return redirect(url_for('config.login'))
         
         # Check session timeout (30 minutes)
+        now = time.time()
         last_activity = session.get('last_activity')
-        if last_activity:
-            last_time = datetime.fromisoformat(last_activity)
-            if datetime.now() - last_time > timedelta(minutes=30):
-                session.clear()
-                flash('Session expired. Please log in again.', 'warning')
-                return redirect(url_for('config.login'))
+        if isinstance(last_activity, str):
+            # Sessions created before timestamps were stored as epoch seconds
+            last_activity = datetime.fromisoformat(last_activity).timestamp()
+        if last_activity and now - last_activity > SESSION_TIMEOUT:
+            session.clear()
+            flash('Session expired. Please log in again.', 'warning')
+            return redirect(url_for('config.login'))
         
         # Update last activity
-        session['last_activity'] = datetime.now().isoformat()
+        if not last_activity or now - last_activity > ACTIVITY_UPDATE_INTERVAL:
+            session['last_activity'] = now
         return f(*args, **kwargs)
     return decorated_function
 
 
+def api_auth_required(f):
+    """
+    Decorator for JSON API routes
+    
+    Accepts a logged-in admin session or, when CONFIG_API_TOKEN is set,
+    an "Authorization: Bearer <token>" header. Unauthenticated requests
+    get a JSON 401 instead of a redirect to the login page.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = os.getenv('CONFIG_API_TOKEN', '')
+        provided = request.headers.get('Authorization', '')
+        if token and provided.startswith('Bearer '):
+            if hmac.compare_digest(provided[len('Bearer '):].encode(), token.encode()):
+                g.api_user = 'api-token'
+                return f(*args, **kwargs)
+        elif session.get('logged_in'):
+            last_activity = session.get('last_activity')
+            if isinstance(last_activity, str):
+                last_activity = datetime.fromisoformat(last_activity).timestamp()
+            if not last_activity or time.time() - last_activity <= SESSION_TIMEOUT:
+                g.api_user = session.get('username', 'unknown')
+                return f(*args, **kwargs)
+        return jsonify({
+            'success': False,
+            'error': 'Authentication required'
+        }), 401
+    return decorated_function
+
+
 def log_config_change(action: str, ip_address: str, details: str = ''):
     """Log configuration changes"""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -73,10 +192,13 @@ def login():
         password = form.password.data
         
         # Verify credentials
-        if admin_auth.verify_credentials(username, password):
+        if get_admin_auth().verify_credentials(username, password):
+            # Server-side sessions get a fresh id on login
+            if hasattr(session, 'regenerate'):
+                session.regenerate()
             session['logged_in'] = True
             session['username'] = username
-            session['last_activity'] = datetime.now().isoformat()
+            session['last_activity'] = time.time()
             
             # Log the login
             ip_address = request.remote_addr
@@ -103,6 +225,37 @@ def logout():
     return redirect(url_for('config.login'))
 
 
+@config_bp.route('/sessions/revoke', methods=['POST'])
+@login_required
+def revoke_sessions():
+    """Force logout of every session belonging to a user"""
+    username = (request.json or {}).get('username')
+    if not username:
+        return jsonify({
+            'success': False,
+            'error': 'Username is required'
+        }), 400
+    
+    store = getattr(current_app.session_interface, 'store', None)
+    if store is None:
+        return jsonify({
+            'success': False,
+            'error': 'Session revocation requires a server-side session backend'
+        }), 400
+    
+    revoked = store.revoke_user(username)
+    log_config_change('REVOKE_SESSIONS', request.remote_addr,
+                      f'User: {session.get("username", "unknown")}, Target: {username}, Sessions: {revoked}')
+    
+    # Don't let this response write the caller's own revoked session back
+    if session.get('username') == username:
+        session.clear()
+    return jsonify({
+        'success': True,
+        'revoked': revoked
+    })
+
+
 @config_bp.route('/setup', methods=['GET', 'POST'])
 @login_required
 def setup():
@@ -111,7 +264,7 @@ def setup():
     
     if request.method == 'GET':
         # Load current values from .env
-        env_vars = env_handler.read_env()
+        env_vars = get_env_handler().read_env()
         
         # Populate form with current values
         form.fb_email.data = env_vars.get('FB_EMAIL', '')
@@ -141,6 +294,8 @@ def setup():
         form.proxy_user.data = env_vars.get('PROXY_USER', '')
         if env_vars.get('PROXY_PASS'):
             form.proxy_pass.render_kw = {'placeholder': '••••••••'}
+        form.proxy_list.data = '\n'.join(
+            entry.strip() for entry in env_vars.get('PROXY_LIST', '').split(',') if entry.strip())
         
         # Browser settings
         form.headless_browser.data = env_vars.get('HEADLESS_BROWSER', 'True').lower() == 'true'
@@ -150,10 +305,24 @@ def setup():
                 form.browser_timeout.data = int(browser_timeout)
             except ValueError:
                 form.browser_timeout.data = 30
+        form.browser_lightweight.data = env_vars.get('BROWSER_LIGHTWEIGHT', 'True').lower() == 'true'
+        form.browser_block_resources.data = [
+            r.strip() for r in env_vars.get('BROWSER_BLOCK_RESOURCES', 'image,media,font').split(',') if r.strip()]
+        form.browser_block_urls.data = '\n'.join(
+            url.strip() for url in env_vars.get('BROWSER_BLOCK_URLS', '').split(',') if url.strip())
+        form.browser_page_load_strategy.data = env_vars.get('BROWSER_PAGE_LOAD_STRATEGY', 'eager')
+        
+        # Profiling
+        try:
+            form.profile_rate.data = float(env_vars.get('PROFILE_RATE') or 0)
+        except ValueError:
+            form.profile_rate.data = 0
+        form.profile_mode.data = env_vars.get('PROFILE_MODE', 'cprofile')
+        form.profile_tasks.data = env_vars.get('PROFILE_TASKS', '')
     
     if form.validate_on_submit():
         # Read current values once for reuse
-        current_vars = env_handler.read_env()
+        current_vars = get_env_handler().read_env()
         
         # Prepare environment variables
         env_vars = {}
@@ -195,13 +364,26 @@ def setup():
             env_vars['PROXY_PASS'] = form.proxy_pass.data
         else:
             env_vars['PROXY_PASS'] = current_vars.get('PROXY_PASS', '')
+        env_vars['PROXY_LIST'] = ','.join(
+            line.strip() for line in (form.proxy_list.data or '').splitlines() if line.strip())
         
         # Browser settings
         env_vars['HEADLESS_BROWSER'] = 'True' if form.headless_browser.data else 'False'
         env_vars['BROWSER_TIMEOUT'] = str(form.browser_timeout.data) if form.browser_timeout.data else '30'
+        env_vars['BROWSER_LIGHTWEIGHT'] = 'True' if form.browser_lightweight.data else 'False'
+        env_vars['BROWSER_BLOCK_RESOURCES'] = ','.join(form.browser_block_resources.data or [])
+        env_vars['BROWSER_BLOCK_URLS'] = ','.join(
+            line.strip() for line in (form.browser_block_urls.data or '').splitlines() if line.strip())
+        env_vars['BROWSER_PAGE_LOAD_STRATEGY'] = form.browser_page_load_strategy.data
+        
+        # Profiling
+        env_vars['PROFILE_RATE'] = f'{form.profile_rate.data:g}' if form.profile_rate.data else '0'
+        env_vars['PROFILE_MODE'] = form.profile_mode.data
+        env_vars['PROFILE_TASKS'] = ','.join(
+            task.strip() for task in (form.profile_tasks.data or '').split(',') if task.strip())
         
         # Validate
-        validation_errors = env_handler.validate_env(env_vars)
+        validation_errors = get_env_handler().validate_env(env_vars)
         if validation_errors:
             for field, errors in validation_errors.items():
                 for error in errors:
@@ -210,13 +392,16 @@ def setup():
         
         # Save configuration
         try:
-            env_handler.write_env(env_vars, create_backup=True)
+            get_env_handler().write_env(env_vars, create_backup=True)
             
             # Log the change
             ip_address = request.remote_addr
             username = session.get('username', 'unknown')
             log_config_change('CONFIG_UPDATE', ip_address, f'User: {username}')
             
+            # Other processes pick the new settings up through config notifications
+            PROFILER.configure_from_env(dict(current_vars, **env_vars))
+            
             flash('Configuration saved successfully! A backup has been created.', 'success')
             return redirect(url_for('config.setup'))
             
@@ -232,7 +417,7 @@ def setup():
 def backups():
     """List available backups"""
     try:
-        backup_list = env_handler.list_backups()
+        backup_list = get_env_handler().list_backups()
         return jsonify({
             'success': True,
             'backups': backup_list
@@ -258,7 +443,7 @@ def restore():
         }), 400
     
     try:
-        if env_handler.restore_backup(backup_name):
+        if get_env_handler().restore_backup(backup_name):
             # Log the restore
             ip_address = request.remote_addr
             username = session.get('username', 'unknown')
@@ -283,6 +468,43 @@ def restore():
         }), 500
 
 
+@config_bp.route('/profiles')
+@login_required
+def profiles():
+    """List stored profiles and the current profiling settings"""
+    return jsonify({
+        'success': True,
+        'enabled': PROFILER.enabled,
+        'rate': PROFILER.rate,
+        'mode': PROFILER.mode,
+        'tasks': sorted(PROFILER.tasks),
+        'profiles': PROFILER.list_profiles()
+    })
+
+
+@config_bp.route('/profiles/latest')
+@login_required
+def latest_profile():
+    """Download the newest profile"""
+    stored = PROFILER.list_profiles()
+    if not stored:
+        abort(404)
+    return download_profile(stored[0]['name'])
+
+
+@config_bp.route('/profiles/<name>')
+@login_required
+def download_profile(name):
+    """Download a stored profile"""
+    path = PROFILER.get_path(name)
+    if path is None:
+        abort(404)
+    log_config_change('DOWNLOAD_PROFILE', request.remote_addr,
+                      f'User: {session.get("username", "unknown")}, Profile: {name}')
+    return send_file(path.resolve(), as_attachment=True, download_name=name,
+                     mimetype='application/octet-stream')
+
+
 @config_bp.route('/restart-service', methods=['POST'])
 @login_required
 def restart_service():
@@ -325,3 +547,287 @@ def restart_service():
             'success': False,
             'error': str(e)
         }), 500
+
+
+# Variables whose values are never returned by the config API
+SECRET_KEYS = {'FB_PASSWORD', 'FACEBOOK_APP_SECRET', 'FACEBOOK_ACCESS_TOKEN', 'PROXY_PASS',
+               'FLASK_SECRET_KEY', 'SESSION_STORE_KEY', 'METRICS_TOKEN', 'CONFIG_API_TOKEN'}
+SECRET_MASK = '********'
+ENV_KEY_PATTERN = re.compile(r'^[A-Z_][A-Z0-9_]*$')
+
+
+def _etag(version: str) -> str:
+    return f'"{version}"'
+
+
+def _parse_etag(header: str) -> str:
+    value = header.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    return value.strip('"')
+
+
+@config_bp.route('/api/config', methods=['GET'])
+@api_auth_required
+def api_get_config():
+    """
+    Return the whole configuration as JSON
+    
+    Secret values are masked. The ETag identifies the .env version and
+    must be sent back in If-Match when patching.
+    """
+    handler = get_env_handler()
+    version = handler.file_version()
+    etag = _etag(version)
+    
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and _parse_etag(if_none_match) == version:
+        response = current_app.response_class(status=304)
+        response.headers['ETag'] = etag
+        return response
+    
+    env_vars = handler.read_env()
+    config = {key: (SECRET_MASK if key in SECRET_KEYS and value else value)
+              for key, value in env_vars.items()}
+    response = jsonify({
+        'success': True,
+        'version': version,
+        'config': config
+    })
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@config_bp.route('/api/config/changes', methods=['GET'])
+@api_auth_required
+def api_config_changes():
+    """
+    Return the config version and the changes after ?since=N
+    
+    This answers immediately. Workers that want to block until the next
+    change use the notification server in config_manager.notify instead.
+    """
+    from .notify import changes_since
+    
+    log = get_env_handler().read_changes()
+    since = request.args.get('since', log['version'], type=int)
+    return jsonify(dict(changes_since(log, since), success=True))
+
+
+@config_bp.route('/api/config', methods=['PATCH'])
+@api_auth_required
+def api_patch_config():
+    """
+    Update several variables in one atomic write
+    
+    The body is a flat JSON object of KEY: value pairs; null clears a
+    value and masked secrets are left unchanged. If-Match must carry the
+    ETag from a previous GET (or * to overwrite unconditionally); a stale
+    version is rejected with 412 so concurrent edits are never lost.
+    """
+    if_match = request.headers.get('If-Match')
+    if not if_match:
+        return jsonify({
+            'success': False,
+            'error': 'If-Match header is required'
+        }), 428
+    expected_version = None if if_match.strip() == '*' else _parse_etag(if_match)
+    
+    updates = request.get_json(silent=True)
+    if not isinstance(updates, dict) or not updates:
+        return jsonify({
+            'success': False,
+            'error': 'Body must be a non-empty JSON object'
+        }), 400
+    
+    cleaned = {}
+    errors = {}
+    for key, value in updates.items():
+        if not ENV_KEY_PATTERN.match(key):
+            errors.setdefault(key, []).append('Invalid variable name')
+            continue
+        if isinstance(value, (dict, list)):
+            errors.setdefault(key, []).append('Value must be a string, number, boolean or null')
+            continue
+        if value is None:
+            value = ''
+        elif isinstance(value, bool):
+            value = str(value).lower()
+        else:
+            value = str(value)
+        if '\n' in value or '\r' in value:
+            errors.setdefault(key, []).append('Value must be a single line')
+            continue
+        if key in SECRET_KEYS and value == SECRET_MASK:
+            continue
+        cleaned[key] = value
+    
+    if errors:
+        return jsonify({
+            'success': False,
+            'errors': errors
+        }), 400
+    
+    handler = get_env_handler()
+    try:
+        errors = handler.update_env(cleaned, expected_version)
+    except VersionConflictError as e:
+        response = jsonify({
+            'success': False,
+            'error': 'Configuration was modified by someone else; reload and retry',
+            'version': e.actual
+        })
+        response.headers['ETag'] = _etag(e.actual)
+        return response, 412
+    except Exception as e:
+        logger.error(f"Error updating configuration via API: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    if errors:
+        return jsonify({
+            'success': False,
+            'errors': errors
+        }), 400
+    
+    if any(key.startswith('PROFILE_') for key in cleaned):
+        PROFILER.configure_from_env(handler.read_env())
+    
+    version = handler.file_version()
+    log_config_change('API_CONFIG_UPDATE', request.remote_addr,
+                      f'User: {g.api_user}, Keys: {", ".join(sorted(cleaned))}')
+    response = jsonify({
+        'success': True,
+        'version': version,
+        'updated': sorted(cleaned)
+    })
+    response.headers['ETag'] = _etag(version)
+    return response
+
+
+# Largest number of posts accepted by one POST /admin/api/posts
+MAX_POSTS_PER_REQUEST = 5000
+
+
+def _parse_publish_at(value):
+    """Accept epoch seconds or an ISO 8601 timestamp (naive means local time)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError('publish_at must be a timestamp')
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+
+@config_bp.route('/api/posts', methods=['POST'])
+@api_auth_required
+def api_enqueue_posts():
+    """
+    Schedule posts for publishing
+    
+    The body is {"posts": [{"page_id": ..., "publish_at": ..., "message": ...,
+    "link": ..., "url": ...}, ...]}; every field other than page_id and
+    publish_at is sent to the Graph API as a form field; objects, arrays and
+    booleans (e.g. attached_media) are sent JSON-encoded, as the Graph API
+    expects. Posts identical to one already queued for the same page are
+    reported as duplicates.
+    """
+    body = request.get_json(silent=True)
+    posts = body.get('posts') if isinstance(body, dict) else None
+    if not isinstance(posts, list) or not posts:
+        return jsonify({
+            'success': False,
+            'error': 'Body must be {"posts": [...]} with at least one post'
+        }), 400
+    if len(posts) > MAX_POSTS_PER_REQUEST:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_POSTS_PER_REQUEST} posts per request'
+        }), 400
+    
+    items = []
+    errors = {}
+    for index, post in enumerate(posts):
+        if not isinstance(post, dict):
+            errors[index] = ['Post must be an object']
+            continue
+        payload = dict(post)
+        page_id = payload.pop('page_id', None)
+        try:
+            publish_at = _parse_publish_at(payload.pop('publish_at', None))
+        except ValueError:
+            errors.setdefault(index, []).append('Invalid publish_at')
+            publish_at = None
+        if not page_id or not isinstance(page_id, (str, int)) or isinstance(page_id, bool):
+            errors.setdefault(index, []).append('page_id is required')
+        if not payload.get('message') and not payload.get('link') and not payload.get('url'):
+            errors.setdefault(index, []).append('message, link or url is required')
+        # Form encoding would send only a list's items or a dict's keys, and True as 'True'
+        for key, value in payload.items():
+            if isinstance(value, (dict, list, bool)):
+                payload[key] = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        items.append((page_id, payload, publish_at))
+    
+    if errors:
+        return jsonify({
+            'success': False,
+            'errors': errors
+        }), 400
+    
+    try:
+        results = get_publish_queue().enqueue_many(items)
+    except Exception as e:
+        logger.error(f"Error queueing posts: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Could not queue posts'
+        }), 500
+    
+    added = sum(1 for _, created in results if created)
+    logger.info(f"User {g.api_user} queued {added} posts ({len(results) - added} duplicates)")
+    return jsonify({
+        'success': True,
+        'posts': [{'id': post_id, 'duplicate': not created} for post_id, created in results]
+    })
+
+
+@config_bp.route('/api/posts', methods=['GET'])
+@api_auth_required
+def api_list_posts():
+    """
+    Report publishing status
+    
+    ?ids=1,2,3 returns those posts; otherwise the most recently updated
+    posts, filtered by ?status= and ?page_id= and capped by ?limit=.
+    Counts per status are always included.
+    """
+    queue = get_publish_queue()
+    status = request.args.get('status')
+    if status and status not in STATUSES:
+        return jsonify({
+            'success': False,
+            'error': f'status must be one of: {", ".join(STATUSES)}'
+        }), 400
+    
+    ids = request.args.get('ids')
+    if ids:
+        try:
+            posts = queue.get([int(i) for i in ids.split(',') if i.strip()])
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'ids must be comma-separated integers'
+            }), 400
+    else:
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+        posts = queue.find(status, request.args.get('page_id'), limit)
+    
+    return jsonify({
+        'success': True,
+        'stats': queue.stats(),
+        'posts': posts
+    })
@@ -0,0 +1,251 @@
+"""
+Session Module
+Optional server-side session storage for the admin interface
+
+Only an opaque session id is kept in the cookie. Session data lives in
+memory (single process) or in SQLite (shared between workers), which
+avoids re-signing the cookie on every response and allows sessions to
+be revoked from the server.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+serializer = TaggedJSONSerializer()
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session whose data is stored on the server"""
+
+    def __init__(self, initial: Optional[Dict[str, Any]] = None, sid: Optional[str] = None,
+                 expires: float = 0.0, new: bool = False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.new = new
+        self.modified = False
+        self.regenerated = False
+
+    def regenerate(self):
+        """Issue a new session id, e.g. after login to prevent session fixation"""
+        self.regenerated = True
+        self.modified = True
+
+
+class MemorySessionStore:
+    """In-memory LRU session store with TTL, for a single process"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._sessions: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            item = self._sessions.get(sid)
+            if item is None:
+                return None
+            data, expires = item
+            if expires < time.time():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return dict(data), expires
+
+    def save(self, sid: str, data: Dict[str, Any], expires: float):
+        with self._lock:
+            self._sessions[sid] = (dict(data), expires)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def touch(self, sid: str, expires: float):
+        with self._lock:
+            item = self._sessions.get(sid)
+            if item is not None:
+                self._sessions[sid] = (item[0], expires)
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def revoke_user(self, username: str) -> int:
+        with self._lock:
+            sids = [sid for sid, (data, _) in self._sessions.items() if data.get('username') == username]
+            for sid in sids:
+                del self._sessions[sid]
+        return len(sids)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires) in self._sessions.items() if expires < now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore:
+    """SQLite session store shared by multiple worker processes"""
+
+    def __init__(self, db_path: str = '.admin_sessions.db'):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions ('
+                         'sid TEXT PRIMARY KEY, username TEXT, data TEXT NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)')
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_username ON sessions (username)')
+        os.chmod(self.db_path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        row = self._connect().execute('SELECT data, expires FROM sessions WHERE sid = ?',
+                                      (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return serializer.loads(row[0]), row[1]
+
+    def save(self, sid: str, data: Dict[str, Any], expires: float):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, username, data, expires) VALUES (?, ?, ?, ?)',
+                         (sid, data.get('username'), serializer.dumps(dict(data)), expires))
+
+    def touch(self, sid: str, expires: float):
+        with self._connect() as conn:
+            conn.execute('UPDATE sessions SET expires = ? WHERE sid = ?', (expires, sid))
+
+    def delete(self, sid: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def revoke_user(self, username: str) -> int:
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM sessions WHERE username = ?', (username,)).rowcount
+
+    def sweep(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),)).rowcount
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by a server-side store
+
+    Expiry slides with activity, but the stored expiry is only extended
+    when it is more than touch_interval seconds old, so an idle read-only
+    request costs a single lookup and no write.
+    """
+
+    def __init__(self, store, ttl: int = 1800, touch_interval: int = 60, sweep_interval: int = 300):
+        """
+        Initialize ServerSideSessionInterface
+
+        Args:
+            store: MemorySessionStore or SQLiteSessionStore
+            ttl: Seconds of inactivity before a session expires
+            touch_interval: Minimum seconds between expiry extensions
+            sweep_interval: Minimum seconds between expired-session sweeps
+        """
+        self.store = store
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+
+    def open_session(self, app, request) -> ServerSideSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            item = self.store.get(sid)
+            if item is not None:
+                return ServerSideSession(item[0], sid=sid, expires=item[1])
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session: ServerSideSession, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+
+        self._maybe_sweep(now)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+
+        if session.regenerated and not session.new:
+            self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+
+        expires = now + self.ttl
+        if session.modified or session.new:
+            self.store.save(session.sid, session, expires)
+        elif expires - session.expires > self.touch_interval:
+            # Extend expiry at coarse granularity; the cookie itself is unchanged
+            self.store.touch(session.sid, expires)
+
+        if session.new:
+            response.vary.add('Cookie')
+            response.set_cookie(cookie_name, session.sid,
+                                httponly=self.get_cookie_httponly(app),
+                                secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app),
+                                domain=domain, path=path)
+
+    def _maybe_sweep(self, now: float):
+        if now - self._last_sweep > self.sweep_interval:
+            self._last_sweep = now
+            removed = self.store.sweep()
+            if removed:
+                logger.info(f"Removed {removed} expired admin sessions")
+
+
+def init_session_backend(app):
+    """
+    Install the session backend selected by SESSION_BACKEND
+
+    'cookie' (default) keeps Flask's signed cookie sessions, 'memory'
+    suits a single process and 'sqlite' is shared by multiple workers.
+    """
+    backend = app.config.get('SESSION_BACKEND', 'cookie')
+    if backend == 'cookie':
+        return
+
+    if backend == 'memory':
+        store = MemorySessionStore()
+    elif backend == 'sqlite':
+        store = SQLiteSessionStore(app.config.get('SESSION_DB_PATH', '.admin_sessions.db'))
+    else:
+        raise ValueError(f'Unknown session backend: {backend}')
+
+    ttl = int(app.permanent_session_lifetime.total_seconds())
+    app.session_interface = ServerSideSessionInterface(store, ttl=ttl)
+    logger.info(f"Using {backend} server-side sessions")
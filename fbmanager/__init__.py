@@ -0,0 +1,6 @@
+"""
+FB Manager Package
+Core components used by the FB Manager automation process
+"""
+
+__version__ = '1.0.0'
@@ -0,0 +1,257 @@
+"""
+Browser Pool
+Reusable pool of Selenium WebDriver instances
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+import logging
+
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# URL patterns blocked for each resource type (Network.setBlockedURLs syntax)
+RESOURCE_PATTERNS = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*'],
+    'media': ['*.mp4*', '*.webm*', '*.m3u8*', '*.m4s*', '*.mp3*', '*.ogg*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'stylesheet': ['*.css*'],
+}
+
+# Third-party trackers that are never needed for automation
+DEFAULT_BLOCKED_URLS = [
+    '*doubleclick.net*',
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*googlesyndication.com*',
+]
+
+PAGE_LOAD_STRATEGIES = ('normal', 'eager', 'none')
+
+
+class BrowserProfile:
+    """Lightweight page-load profile that skips resources automation does not need"""
+
+    def __init__(self, block_resources: Optional[List[str]] = None,
+                 block_urls: Optional[List[str]] = None,
+                 page_load_strategy: str = 'eager'):
+        """
+        Initialize BrowserProfile
+
+        Args:
+            block_resources: Resource types to block (image, media, font, stylesheet)
+            block_urls: Extra URL patterns to block, '*' matches any characters
+            page_load_strategy: 'normal', 'eager' (DOM ready) or 'none'
+        """
+        self.block_resources = block_resources if block_resources is not None else ['image', 'media', 'font']
+        self.block_urls = DEFAULT_BLOCKED_URLS + list(block_urls or [])
+        self.page_load_strategy = page_load_strategy
+
+    @classmethod
+    def from_env(cls) -> Optional['BrowserProfile']:
+        """
+        Create a profile from BROWSER_* settings
+
+        Returns:
+            BrowserProfile, or None if BROWSER_LIGHTWEIGHT is disabled
+        """
+        if os.getenv('BROWSER_LIGHTWEIGHT', 'True').lower() != 'true':
+            return None
+
+        return cls(
+            block_resources=[r.strip() for r in os.getenv('BROWSER_BLOCK_RESOURCES', 'image,media,font').split(',')
+                             if r.strip()],
+            block_urls=[u.strip() for u in os.getenv('BROWSER_BLOCK_URLS', '').split(',') if u.strip()],
+            page_load_strategy=os.getenv('BROWSER_PAGE_LOAD_STRATEGY', 'eager'),
+        )
+
+    @property
+    def blocked_patterns(self) -> List[str]:
+        patterns = list(self.block_urls)
+        for resource in self.block_resources:
+            patterns.extend(RESOURCE_PATTERNS.get(resource, []))
+        return patterns
+
+    def apply(self, options):
+        """Configure ChromeOptions before the browser starts"""
+        options.page_load_strategy = self.page_load_strategy
+
+        prefs = {}
+        if 'image' in self.block_resources:
+            prefs['profile.managed_default_content_settings.images'] = 2
+            options.add_argument('--blink-settings=imagesEnabled=false')
+        if 'font' in self.block_resources:
+            options.add_argument('--disable-remote-fonts')
+        if 'media' in self.block_resources:
+            options.add_argument('--autoplay-policy=user-gesture-required')
+            options.add_argument('--mute-audio')
+        prefs['profile.default_content_setting_values.notifications'] = 2
+        prefs['profile.default_content_setting_values.geolocation'] = 2
+        options.add_experimental_option('prefs', prefs)
+
+        for argument in ('--disable-extensions', '--disable-background-networking',
+                         '--disable-component-update', '--disable-default-apps',
+                         '--disable-sync', '--no-first-run', '--metrics-recording-only'):
+            options.add_argument(argument)
+
+    def attach(self, driver):
+        """Block URL patterns on a running browser via the DevTools protocol"""
+        patterns = self.blocked_patterns
+        if not patterns:
+            return
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+        except Exception as e:
+            logger.warning(f"Could not set blocked URLs: {e}")
+
+
+class BrowserPool:
+    """Pool of Chrome WebDriver instances shared by FB Manager tasks"""
+
+    def __init__(self, size: int = 1, headless: bool = True, timeout: int = 30,
+                 on_create: Optional[Callable] = None, proxy_pool=None,
+                 account: Optional[str] = None, profile: Optional[BrowserProfile] = None):
+        """
+        Initialize BrowserPool
+
+        Args:
+            size: Maximum number of browsers
+            headless: Run browsers without a window
+            timeout: Page load and implicit wait timeout in seconds
+            on_create: Callback invoked with each new driver, e.g. to restore a session
+            proxy_pool: Optional ProxyPool each new browser draws its proxy from
+            account: Account used for sticky proxy assignment
+            profile: Optional lightweight page-load profile
+        """
+        self.size = size
+        self.headless = headless
+        self.timeout = timeout
+        self.on_create = on_create
+        self.proxy_pool = proxy_pool
+        self.account = account
+        self.profile = profile
+
+        self._idle: 'queue.LifoQueue' = queue.LifoQueue()
+        self._drivers: List = []
+        self._relays: Dict[str, 'ProxyRelay'] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'BrowserPool':
+        """Create a pool from HEADLESS_BROWSER, BROWSER_TIMEOUT and BROWSER_* profile settings"""
+        kwargs.setdefault('headless', os.getenv('HEADLESS_BROWSER', 'True').lower() == 'true')
+        kwargs.setdefault('timeout', int(os.getenv('BROWSER_TIMEOUT', '30')))
+        kwargs.setdefault('profile', BrowserProfile.from_env())
+        return cls(**kwargs)
+
+    @TRACER.traced('browser.acquire')
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Take a driver from the pool, creating one if the pool is not full
+
+        Args:
+            timeout: Seconds to wait for a free driver, None to wait forever
+
+        Returns:
+            Selenium WebDriver
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = len(self._drivers) < self.size
+            if create:
+                self._drivers.append(None)
+
+        if create:
+            try:
+                driver = self._create_driver()
+            except Exception:
+                with self._lock:
+                    self._drivers.remove(None)
+                raise
+            with self._lock:
+                self._drivers[self._drivers.index(None)] = driver
+            return driver
+
+        return self._idle.get(timeout=timeout)
+
+    def release(self, driver):
+        """Return a driver to the pool"""
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        """Context manager that acquires and releases a driver"""
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """Quit all browsers"""
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            relays, self._relays = list(self._relays.values()), {}
+        for driver in drivers:
+            if driver is None:
+                continue
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning(f"Error closing browser: {e}")
+        self._idle = queue.LifoQueue()
+        for relay in relays:
+            relay.close()
+
+    def _relay(self, proxy) -> 'ProxyRelay':
+        """Local relay for an authenticated proxy, shared by all browsers using it"""
+        from .proxy_relay import ProxyRelay
+
+        with self._lock:
+            relay = self._relays.get(proxy.url)
+            if relay is None:
+                relay = self._relays[proxy.url] = ProxyRelay(proxy).start()
+            return relay
+
+    @TRACER.traced('browser.create')
+    def _create_driver(self):
+        """Start a new Chrome WebDriver"""
+        # Raises instead of starting a browser on the host's own IP
+        proxy = self.proxy_pool.require(self.account) if self.proxy_pool else None
+
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless=new')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        if self.profile:
+            self.profile.apply(options)
+
+        if proxy:
+            # Chrome ignores credentials in --proxy-server, so authenticated
+            # proxies are reached through a local relay that adds them
+            server = self._relay(proxy).url if proxy.authenticated else proxy.server
+            options.add_argument(f'--proxy-server={server}')
+            logger.info(f"Browser using proxy {proxy.server}")
+
+        driver = webdriver.Chrome(options=options)
+        driver.set_page_load_timeout(self.timeout)
+        if self.profile:
+            self.profile.attach(driver)
+        logger.info("Started new browser instance")
+
+        if self.on_create:
+            self.on_create(driver)
+
+        return driver
@@ -0,0 +1,141 @@
+"""
+Config Watch Module
+Applies .env changes to a running process without a restart
+
+A background thread long-polls the admin app's notification server
+(config_manager.notify). When the config version increases, only the
+variables that changed are reloaded from .env into os.environ and passed
+to a callback.
+"""
+
+import os
+import threading
+from typing import Callable, List, Optional
+import logging
+
+import requests
+from dotenv import dotenv_values
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigWatcher:
+    """Long-poll subscriber for config version changes"""
+
+    def __init__(self, url: str, on_change: Callable[[List[str]], None], token: str = '',
+                 env_path: str = '.env', poll_timeout: int = 30, max_backoff: float = 60.0):
+        """
+        Initialize ConfigWatcher
+
+        Args:
+            url: Base URL of the notification server, e.g. http://127.0.0.1:5001
+            on_change: Called with the names of changed variables after they
+                have been applied to os.environ
+            token: CONFIG_API_TOKEN of the admin app
+            env_path: .env file to reload values from
+            poll_timeout: Seconds the server holds each poll open
+            max_backoff: Maximum delay between retries after errors
+        """
+        self.url = url.rstrip('/') + '/config/changes'
+        self.on_change = on_change
+        self.env_path = env_path
+        self.poll_timeout = poll_timeout
+        self.max_backoff = max_backoff
+        self.version: Optional[int] = None
+        self._session = requests.Session()
+        if token:
+            self._session.headers['Authorization'] = f'Bearer {token}'
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, on_change: Callable[[List[str]], None]) -> Optional['ConfigWatcher']:
+        """Create a watcher from CONFIG_NOTIFY_URL, or None when it is not set"""
+        url = os.getenv('CONFIG_NOTIFY_URL', '')
+        if not url:
+            return None
+        return cls(url, on_change, token=os.getenv('CONFIG_API_TOKEN', ''),
+                   env_path=os.getenv('ENV_PATH', '.env'))
+
+    def start(self):
+        """Start watching on a daemon thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='config-watch', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop watching; an in-flight poll is abandoned"""
+        self._stop.set()
+        self._session.close()
+        self._thread = None
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                backoff = 1.0
+            except (requests.RequestException, ValueError) as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"Config watch failed, retrying in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def poll(self) -> List[str]:
+        """
+        Wait for the next change and apply it
+
+        The first poll only learns the current version.
+
+        Returns:
+            Names of the variables that were applied
+        """
+        if self.version is None:
+            params = {'timeout': 0}
+        else:
+            params = {'timeout': self.poll_timeout, 'since': self.version}
+        response = self._session.get(self.url, params=params, timeout=self.poll_timeout + 10)
+        response.raise_for_status()
+        delta = response.json()
+
+        if self.version is None or delta['version'] <= self.version:
+            self.version = delta['version']
+            return []
+
+        if delta['reset']:
+            keys = None
+        else:
+            keys = sorted({key for change in delta['changes']
+                           for key in change['changed'] + change['removed']})
+        self.version = delta['version']
+        return self.apply(keys)
+
+    def apply(self, keys: Optional[List[str]] = None) -> List[str]:
+        """
+        Reload variables from .env into os.environ
+
+        Args:
+            keys: Variables to reload, or None for all of them
+
+        Returns:
+            Names of the variables that were applied
+        """
+        values = dotenv_values(self.env_path)
+        if keys is None:
+            keys = sorted(values)
+
+        for key in keys:
+            value = values.get(key)
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+        logger.info(f"Applied config version {self.version}: {', '.join(keys)}")
+        try:
+            self.on_change(keys)
+        except Exception as e:
+            logger.error(f"Error applying config change: {e}", exc_info=True)
+        return keys
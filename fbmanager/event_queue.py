@@ -0,0 +1,245 @@
+"""
+Event Queue Module
+Durable SQLite queue between the webhook receiver and FBManager
+
+The admin app appends raw webhook deliveries; FBManager claims them in
+batches, flattens them into events and acknowledges them once handled.
+Claims expire, so deliveries held by a crashed consumer are picked up
+again, and deliveries that keep failing are parked as dead after
+max_attempts.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from .metrics import Counter, Gauge
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PROCESSED = Counter('fbmanager_webhook_events_total',
+                           'Webhook events handled by FBManager', ['field', 'status'])
+QUEUE_DEPTH = Gauge('fbmanager_webhook_queue_depth', 'Webhook deliveries waiting to be processed')
+
+
+class EventQueue:
+    """SQLite-backed queue of webhook deliveries shared by processes"""
+
+    def __init__(self, db_path: str = 'webhook_events.db', max_attempts: int = 5):
+        """
+        Initialize EventQueue
+
+        Args:
+            db_path: SQLite database file
+            max_attempts: Failed deliveries are marked dead after this many attempts
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS deliveries ('
+                         'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'payload TEXT NOT NULL, '
+                         'received REAL NOT NULL, '
+                         'available_at REAL NOT NULL, '
+                         'attempts INTEGER NOT NULL DEFAULT 0, '
+                         'dead INTEGER NOT NULL DEFAULT 0, '
+                         'error TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS deliveries_ready '
+                         'ON deliveries (dead, available_at)')
+
+    @classmethod
+    def from_env(cls) -> 'EventQueue':
+        return cls(os.getenv('WEBHOOK_QUEUE_DB', 'webhook_events.db'))
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, payload: str) -> int:
+        """
+        Append a raw delivery
+
+        Returns:
+            Delivery id
+        """
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute('INSERT INTO deliveries (payload, received, available_at) VALUES (?, ?, ?)',
+                                (payload, now, now)).lastrowid
+
+    def claim(self, limit: int = 100, lease: float = 60.0) -> List[Tuple[int, str, int]]:
+        """
+        Take up to limit ready deliveries for processing
+
+        Claimed deliveries are hidden from other consumers for `lease`
+        seconds and reappear if they are neither acked nor failed by then.
+
+        Returns:
+            List of (id, payload, attempts)
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('SELECT id, payload, attempts FROM deliveries '
+                                'WHERE dead = 0 AND available_at <= ? ORDER BY id LIMIT ?',
+                                (now, limit)).fetchall()
+            if rows:
+                conn.executemany('UPDATE deliveries SET available_at = ?, attempts = attempts + 1 WHERE id = ?',
+                                 [(now + lease, row[0]) for row in rows])
+        return [(row[0], row[1], row[2] + 1) for row in rows]
+
+    def ack(self, ids: List[int]):
+        """Remove processed deliveries"""
+        if ids:
+            with self._connect() as conn:
+                conn.executemany('DELETE FROM deliveries WHERE id = ?', [(i,) for i in ids])
+
+    def fail(self, delivery_id: int, attempts: int, error: str, backoff: float = 5.0):
+        """Schedule a retry with exponential backoff, or park the delivery as dead"""
+        with self._connect() as conn:
+            if attempts >= self.max_attempts:
+                conn.execute('UPDATE deliveries SET dead = 1, error = ? WHERE id = ?', (error, delivery_id))
+                logger.error(f"Webhook delivery {delivery_id} failed {attempts} times, marked dead: {error}")
+            else:
+                retry_at = time.time() + backoff * 2 ** (attempts - 1)
+                conn.execute('UPDATE deliveries SET available_at = ?, error = ? WHERE id = ?',
+                             (retry_at, error, delivery_id))
+
+    def stats(self) -> Dict[str, int]:
+        """Count pending and dead deliveries"""
+        pending, dead = self._connect().execute(
+            'SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 1), 0) FROM deliveries').fetchone()
+        QUEUE_DEPTH.set(pending)
+        return {'pending': pending, 'dead': dead}
+
+
+def flatten(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Split a webhook delivery into one event per change or message
+
+    Returns:
+        List of {'object', 'entry_id', 'time', 'field', 'value'} dictionaries
+    """
+    events = []
+    for entry in payload.get('entry', []):
+        base = {'object': payload.get('object'), 'entry_id': entry.get('id'), 'time': entry.get('time')}
+        for change in entry.get('changes', []):
+            events.append(dict(base, field=change.get('field'), value=change.get('value')))
+        for message in entry.get('messaging', []):
+            events.append(dict(base, field='messages', value=message))
+    return events
+
+
+class EventConsumer:
+    """Background thread that drains the queue in batches"""
+
+    def __init__(self, queue: EventQueue, handler: Callable[[List[Dict[str, Any]]], None],
+                 batch_size: int = 500, poll_interval: float = 0.5):
+        """
+        Initialize EventConsumer
+
+        Args:
+            queue: Queue to drain
+            handler: Called with a list of flattened events; raising fails
+                the whole batch, which is then retried one delivery at a time
+            batch_size: Maximum deliveries claimed at once
+            poll_interval: Seconds to wait when the queue is empty
+        """
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, handler: Callable[[List[Dict[str, Any]]], None]) -> Optional['EventConsumer']:
+        """Create a consumer when webhooks are configured (WEBHOOK_VERIFY_TOKEN is set)"""
+        if not os.getenv('WEBHOOK_VERIFY_TOKEN'):
+            return None
+        return cls(EventQueue.from_env(), handler,
+                   batch_size=int(os.getenv('WEBHOOK_BATCH_SIZE', '500')))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='webhook-consumer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except sqlite3.Error as e:
+                logger.error(f"Webhook queue error: {e}")
+                processed = 0
+            if not processed:
+                self._stop.wait(self.poll_interval)
+
+    def process_batch(self) -> int:
+        """
+        Claim and handle one batch
+
+        Returns:
+            Number of deliveries claimed
+        """
+        deliveries = self.queue.claim(self.batch_size)
+        if not deliveries:
+            return 0
+
+        with TRACER.span('webhook.batch', deliveries=len(deliveries)):
+            parsed = []
+            for delivery_id, payload, attempts in deliveries:
+                try:
+                    parsed.append((delivery_id, attempts, flatten(json.loads(payload))))
+                except (ValueError, AttributeError) as e:
+                    self.queue.fail(delivery_id, self.queue.max_attempts, f'Malformed payload: {e}')
+
+            events = [event for _, _, delivery_events in parsed for event in delivery_events]
+            try:
+                self.handler(events)
+            except Exception as e:
+                logger.warning(f"Batch of {len(events)} webhook events failed, retrying singly: {e}")
+                self._process_singly(parsed)
+            else:
+                self.queue.ack([delivery_id for delivery_id, _, _ in parsed])
+                self._count(events, 'success')
+
+        return len(deliveries)
+
+    def _process_singly(self, parsed: List[Tuple[int, int, List[Dict[str, Any]]]]):
+        """Isolate the deliveries that make a batch fail"""
+        for delivery_id, attempts, events in parsed:
+            try:
+                self.handler(events)
+            except Exception as e:
+                self.queue.fail(delivery_id, attempts, str(e))
+                self._count(events, 'error')
+            else:
+                self.queue.ack([delivery_id])
+                self._count(events, 'success')
+
+    @staticmethod
+    def _count(events: List[Dict[str, Any]], status: str):
+        for event in events:
+            EVENTS_PROCESSED.labels(field=event.get('field') or 'unknown', status=status).inc()
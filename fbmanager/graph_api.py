@@ -0,0 +1,355 @@
+"""
+Graph API Client
+Facebook Graph API client with transparent request batching
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+import logging
+
+import requests
+
+from .http_cache import ResponseCache
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+class GraphAPIError(Exception):
+    """Error returned by the Graph API"""
+
+    def __init__(self, message: str, code: Optional[int] = None, status: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+class _PendingRequest:
+    """A queued read waiting to be sent in a batch"""
+
+    __slots__ = ('path', 'params', 'future', 'enqueued', 'span')
+
+    def __init__(self, path: str, params: Optional[Dict[str, Any]]):
+        self.path = path
+        self.params = params
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        # Caller's span, so the batch sent from the dispatcher is traced under it
+        self.span = TRACER.current()
+
+
+class GraphAPIClient:
+    """
+    Graph API client that coalesces reads into batch requests
+
+    Calls to get() issued within batch_window seconds of each other are
+    sent as a single batch request of up to max_batch_size operations.
+    Each caller receives a Future resolved with its own response.
+    """
+
+    BASE_URL = 'https://graph.facebook.com'
+    MAX_BATCH_SIZE = 50
+
+    def __init__(self, access_token: str, app_secret: Optional[str] = None,
+                 api_version: str = 'v19.0', batch_window: float = 0.05,
+                 max_batch_size: int = MAX_BATCH_SIZE, max_workers: int = 4,
+                 timeout: int = 30, base_url: Optional[str] = None,
+                 session: Optional[requests.Session] = None,
+                 cache: Optional[ResponseCache] = None):
+        """
+        Initialize GraphAPIClient
+
+        Args:
+            access_token: Access token used for all requests
+            app_secret: App secret used to sign requests with appsecret_proof
+            api_version: Graph API version, e.g. 'v19.0'
+            batch_window: Seconds to wait for more reads before sending a batch
+            max_batch_size: Maximum operations per batch (platform limit is 50)
+            max_workers: Number of batches that may be in flight at once
+            timeout: HTTP timeout in seconds
+            base_url: Override the Graph API host (used by local mock servers)
+            session: Optional requests session to reuse connections
+            cache: Optional response cache for reads, keyed per access token
+        """
+        self.access_token = access_token
+        self.app_secret = app_secret
+        self.api_version = api_version
+        self.batch_window = batch_window
+        self.max_batch_size = max(1, min(max_batch_size, self.MAX_BATCH_SIZE))
+        self.timeout = timeout
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.session = session or requests.Session()
+        self.cache = cache
+
+        self._pending: List[_PendingRequest] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='graph-batch')
+        self._dispatcher: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'GraphAPIClient':
+        """
+        Create a client from FACEBOOK_* environment variables
+
+        Uses FACEBOOK_ACCESS_TOKEN if set, otherwise an app access token
+        built from FACEBOOK_APP_ID and FACEBOOK_APP_SECRET. FACEBOOK_GRAPH_URL
+        overrides the API host, and reads are cached per ResponseCache.from_env().
+        """
+        kwargs.setdefault('base_url', os.getenv('FACEBOOK_GRAPH_URL') or None)
+        if 'cache' not in kwargs:
+            kwargs['cache'] = ResponseCache.from_env()
+        app_id = os.getenv('FACEBOOK_APP_ID', '')
+        app_secret = os.getenv('FACEBOOK_APP_SECRET', '')
+        access_token = os.getenv('FACEBOOK_ACCESS_TOKEN', '')
+
+        if not access_token:
+            if not app_id or not app_secret:
+                raise GraphAPIError('FACEBOOK_APP_ID and FACEBOOK_APP_SECRET are required')
+            access_token = f'{app_id}|{app_secret}'
+
+        return cls(access_token, app_secret=app_secret or None, **kwargs)
+
+    @property
+    def is_app_token(self) -> bool:
+        """True for an app access token ('app_id|app_secret'), which cannot act as a user or page"""
+        return '|' in self.access_token
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Future:
+        """
+        Queue a read of an object or edge
+
+        Args:
+            path: Object or edge path, e.g. '123456/insights'
+            params: Query parameters
+
+        Returns:
+            Future resolved with the decoded response body
+        """
+        pending = _PendingRequest(path, params)
+
+        if self.cache:
+            body = self.cache.lookup(self._url(path), params, self.access_token)
+            if body is not None:
+                pending.future.set_result(self._decode(200, body.decode('utf-8')))
+                return pending.future
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('GraphAPIClient is closed')
+            self._pending.append(pending)
+            self._ensure_dispatcher()
+            self._cond.notify()
+
+        return pending.future
+
+    def get_many(self, paths: List[str], params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Read many objects or edges and wait for all results
+
+        Args:
+            paths: Object or edge paths
+            params: Query parameters applied to every read
+
+        Returns:
+            List of response bodies in the same order as paths
+        """
+        futures = [self.get(path, params) for path in paths]
+        return [future.result() for future in futures]
+
+    @TRACER.traced('graph.call')
+    def call(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+             access_token: Optional[str] = None, use_cache: bool = True) -> Any:
+        """
+        Perform a single, unbatched API call
+
+        Args:
+            method: HTTP method
+            path: Object or edge path
+            params: Query or form parameters
+            access_token: Token for this call instead of the client's, e.g. a page token
+            use_cache: Read GETs through the response cache; disable for
+                responses that must be current or hold secrets
+
+        Returns:
+            Decoded response body
+        """
+        url = self._url(path)
+        params = dict(params or {})
+        params.update(self._auth_params(access_token))
+
+        if method.upper() == 'GET' and self.cache and use_cache:
+            response = self.cache.fetch(self.session, url, access_token or self.access_token,
+                                        params=params, timeout=self.timeout)
+        elif method.upper() == 'GET':
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        else:
+            response = self.session.request(method.upper(), url, data=params, timeout=self.timeout)
+
+        return self._decode(response.status_code, response.text)
+
+    def flush(self):
+        """Send all queued reads immediately"""
+        with self._cond:
+            batches = self._take_all()
+        for batch in batches:
+            self._executor.submit(self._dispatch, batch)
+
+    def close(self):
+        """Flush queued reads and stop the dispatcher"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._dispatcher:
+            self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _url(self, path: str) -> str:
+        """Build the absolute URL of an object or edge"""
+        return f'{self.base_url}/{self.api_version}/{path.lstrip("/")}'
+
+    def _auth_params(self, access_token: Optional[str] = None) -> Dict[str, str]:
+        """Build access_token and appsecret_proof parameters"""
+        access_token = access_token or self.access_token
+        params = {'access_token': access_token}
+        if self.app_secret:
+            params['appsecret_proof'] = hmac.new(
+                self.app_secret.encode('utf-8'),
+                access_token.encode('utf-8'),
+                hashlib.sha256
+            ).hexdigest()
+        return params
+
+    def _ensure_dispatcher(self):
+        """Start the dispatcher thread on first use (caller holds the lock)"""
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._run, name='graph-dispatcher',
+                                                daemon=True)
+            self._dispatcher.start()
+
+    def _take_all(self) -> List[List[_PendingRequest]]:
+        """Split all queued reads into batches (caller holds the lock)"""
+        pending, self._pending = self._pending, []
+        return [pending[i:i + self.max_batch_size]
+                for i in range(0, len(pending), self.max_batch_size)]
+
+    def _run(self):
+        """Dispatcher loop: collect reads for batch_window, then send them"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+
+                if not self._closed:
+                    deadline = self._pending[0].enqueued + self.batch_window
+                    while len(self._pending) < self.max_batch_size and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+
+                if self._closed:
+                    batches = self._take_all()
+                else:
+                    batches = [self._pending[:self.max_batch_size]]
+                    del self._pending[:self.max_batch_size]
+
+                closed = self._closed
+
+            for batch in batches:
+                if batch:
+                    self._executor.submit(self._dispatch, batch)
+
+            if closed:
+                return
+
+    def _dispatch(self, batch: List[_PendingRequest]):
+        """Send a batch and resolve each caller's future"""
+        with TRACER.span('graph.batch', parent=batch[0].span, size=len(batch)):
+            self._send_batch(batch)
+
+    def _send_batch(self, batch: List[_PendingRequest]):
+        if len(batch) == 1:
+            self._dispatch_single(batch[0])
+            return
+
+        operations = [{'method': 'GET', 'relative_url': self._relative_url(item)}
+                      for item in batch]
+        data = {'batch': json.dumps(operations), 'include_headers': 'false'}
+        data.update(self._auth_params())
+
+        try:
+            response = self.session.post(f'{self.base_url}/{self.api_version}/',
+                                         data=data, timeout=self.timeout)
+            results = self._decode(response.status_code, response.text)
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise GraphAPIError('Malformed batch response')
+        except Exception as e:
+            logger.warning(f"Batch of {len(batch)} requests failed, retrying individually: {e}")
+            for item in batch:
+                self._dispatch_single(item)
+            return
+
+        logger.debug(f"Sent batch of {len(batch)} requests")
+
+        for item, result in zip(batch, results):
+            # A null entry means the operation timed out; 5xx is transient
+            if result is None or result.get('code', 500) >= 500:
+                self._dispatch_single(item)
+                continue
+            if self.cache:
+                # get() found no fresh entry; this batch answered the miss
+                self.cache.record_miss()
+            body = result.get('body') or 'null'
+            try:
+                item.future.set_result(self._decode(result['code'], body))
+            except GraphAPIError as e:
+                item.future.set_exception(e)
+                continue
+            if self.cache:
+                self.cache.store(self._url(item.path), item.params, self.access_token,
+                                 body.encode('utf-8'))
+
+    def _dispatch_single(self, item: _PendingRequest):
+        """Send one read on its own"""
+        try:
+            item.future.set_result(self.call('GET', item.path, item.params))
+        except Exception as e:
+            item.future.set_exception(e)
+
+    @staticmethod
+    def _relative_url(item: _PendingRequest) -> str:
+        """Build the relative_url of a batch operation"""
+        path = item.path.lstrip('/')
+        if item.params:
+            path += '?' + urlencode(item.params)
+        return path
+
+    @staticmethod
+    def _decode(status: int, text: str) -> Any:
+        """Decode a response body, raising GraphAPIError for errors"""
+        try:
+            body = json.loads(text) if text else None
+        except ValueError:
+            raise GraphAPIError(f'Invalid JSON response (HTTP {status})', status=status)
+
+        if status >= 400:
+            error = body.get('error', {}) if isinstance(body, dict) else {}
+            raise GraphAPIError(error.get('message', f'HTTP {status}'),
+                                code=error.get('code'), status=status)
+
+        return body
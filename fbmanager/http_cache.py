@@ -0,0 +1,386 @@
+"""
+HTTP Response Cache
+Two-tier (memory + disk) cache for outbound HTTP GET requests
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+import logging
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that carry credentials and must never be part of a cache key
+IGNORED_PARAMS = frozenset({'access_token', 'appsecret_proof'})
+
+# Response headers kept with cached entries
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+
+class CacheEntry:
+    """A cached response"""
+
+    __slots__ = ('status', 'headers', 'body', 'expires_at')
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, expires_at: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def to_response(self, url: str) -> requests.Response:
+        """Build a requests.Response from the cached data"""
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.url = url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+
+class ResponseCache:
+    """
+    HTTP response cache with an in-memory LRU tier and an on-disk tier
+
+    Entries are keyed by a hash of the account namespace, the URL and the
+    query parameters, so responses fetched with one account's token are
+    never served to another account. Stale entries that carry an ETag or
+    Last-Modified header are revalidated with a conditional request.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = 'cache/http', max_memory_bytes: int = 16 * 1024 * 1024,
+                 max_disk_bytes: int = 100 * 1024 * 1024, default_ttl: int = 300,
+                 ttl_rules: Optional[List[Tuple[str, int]]] = None):
+        """
+        Initialize ResponseCache
+
+        Args:
+            cache_dir: Directory for the disk tier, or None for memory only
+            max_memory_bytes: Maximum total body size kept in memory; larger
+                entries are only kept on disk
+            max_disk_bytes: Maximum total size of the disk tier
+            default_ttl: TTL in seconds when no rule or max-age applies
+            ttl_rules: List of (url regex, ttl seconds); first match wins
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.default_ttl = default_ttl
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules or [])]
+
+        self._memory: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self.stats = {
+            # Fresh entries served without network access
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            # Stale entries sent for conditional revalidation, and those answered 304
+            'revalidations': 0,
+            'revalidated': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            os.chmod(self.cache_dir, 0o700)
+            self._disk_bytes = sum(p.stat().st_size for p in self.cache_dir.glob('*/*.cache'))
+
+    @classmethod
+    def from_env(cls) -> Optional['ResponseCache']:
+        """
+        Create a cache from HTTP_CACHE_* environment variables
+
+        HTTP_CACHE_SIZE is the memory tier in MB (0 disables caching),
+        HTTP_CACHE_DIR the disk tier directory (empty for memory only),
+        HTTP_CACHE_DISK_SIZE its limit in MB and HTTP_CACHE_TTL the default
+        TTL in seconds.
+        """
+        memory_mb = float(os.getenv('HTTP_CACHE_SIZE', '16') or 0)
+        if memory_mb <= 0:
+            return None
+        return cls(os.getenv('HTTP_CACHE_DIR', 'cache/http') or None,
+                   max_memory_bytes=int(memory_mb * 1024 * 1024),
+                   max_disk_bytes=int(float(os.getenv('HTTP_CACHE_DISK_SIZE', '100') or 0) * 1024 * 1024),
+                   default_ttl=int(os.getenv('HTTP_CACHE_TTL', '300') or 0))
+
+    @TRACER.traced('http_cache.fetch')
+    def fetch(self, session: requests.Session, url: str, namespace: str,
+              params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+              timeout: int = 30) -> requests.Response:
+        """
+        GET a URL through the cache
+
+        Args:
+            session: Session used for network requests
+            url: Request URL
+            namespace: Account identity, e.g. the access token or account email;
+                responses are only shared between requests with the same one
+            params: Query parameters (credential parameters are not part of the key)
+            headers: Extra request headers
+            timeout: HTTP timeout in seconds
+
+        Returns:
+            The cached or freshly fetched response
+        """
+        key = self.make_key(url, params, namespace)
+        entry, tier = self._get(key)
+
+        if entry and entry.fresh:
+            self._bump(f'{tier}_hits')
+            return entry.to_response(url)
+
+        request_headers = dict(headers or {})
+        # A stale entry without validators is as good as a miss
+        conditional = bool(entry and (entry.headers.get('ETag') or entry.headers.get('Last-Modified')))
+        if conditional:
+            if entry.headers.get('ETag'):
+                request_headers['If-None-Match'] = entry.headers['ETag']
+            if entry.headers.get('Last-Modified'):
+                request_headers['If-Modified-Since'] = entry.headers['Last-Modified']
+        self._bump('revalidations' if conditional else 'misses')
+
+        response = session.get(url, params=params, headers=request_headers, timeout=timeout)
+
+        if conditional and response.status_code == 304:
+            self._bump('revalidated')
+            entry.expires_at = time.time() + self._ttl_for(url, response.headers)
+            self._put(key, entry)
+            return entry.to_response(url)
+
+        if response.status_code == 200:
+            self.store(url, params, namespace, response.content, response.headers)
+
+        return response
+
+    def lookup(self, url: str, params: Optional[Dict[str, Any]], namespace: str) -> Optional[bytes]:
+        """
+        Return the body of a fresh cached entry without any network access
+
+        Only hits are counted; a miss is counted by whatever reads the URL
+        next, fetch() or record_miss() for a read answered elsewhere (e.g.
+        in a batch request), so each request is counted once.
+
+        Returns:
+            Cached body, or None if missing or stale
+        """
+        entry, tier = self._get(self.make_key(url, params, namespace))
+        if entry and entry.fresh:
+            self._bump(f'{tier}_hits')
+            return entry.body
+        return None
+
+    def record_miss(self):
+        """Count a lookup() miss that was fetched without going through fetch()"""
+        self._bump('misses')
+
+    def store(self, url: str, params: Optional[Dict[str, Any]], namespace: str,
+              body: bytes, headers: Optional[Dict[str, str]] = None):
+        """
+        Store a successful response
+
+        Responses marked no-store or resolving to a zero TTL are skipped.
+        """
+        headers = headers or {}
+        cache_control = headers.get('Cache-Control', '').lower()
+        if 'no-store' in cache_control:
+            return
+
+        ttl = self._ttl_for(url, headers)
+        if ttl <= 0:
+            return
+
+        entry = CacheEntry(200, {name: headers[name] for name in STORED_HEADERS if name in headers},
+                           body, time.time() + ttl)
+        self._put(self.make_key(url, params, namespace), entry)
+        self._bump('stores')
+
+    def clear(self):
+        """Remove all cached entries"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.cache_dir:
+                for pattern in ('*/*.cache', '*/*.tmp'):
+                    for path in self.cache_dir.glob(pattern):
+                        path.unlink(missing_ok=True)
+            self._disk_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters, the fresh hit ratio and tier sizes"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_bytes'] = self._disk_bytes
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses'] + stats['revalidations']
+        stats['hit_ratio'] = hits / lookups if lookups else 0.0
+        return stats
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]], namespace: str) -> str:
+        """Build the cache key for a request"""
+        if not namespace:
+            raise ValueError('A cache namespace (account or token) is required')
+        query = urlencode(sorted((k, str(v)) for k, v in (params or {}).items()
+                                 if k not in IGNORED_PARAMS))
+        raw = '\0'.join((hashlib.sha256(namespace.encode('utf-8')).hexdigest(), url, query))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _ttl_for(self, url: str, headers: Dict[str, str]) -> int:
+        """Resolve the TTL for a URL from rules, max-age or the default"""
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(url):
+                return ttl
+
+        match = re.search(r'max-age=(\d+)', headers.get('Cache-Control', ''))
+        if match:
+            return int(match.group(1))
+
+        return self.default_ttl
+
+    def _bump(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def _get(self, key: str) -> Tuple[Optional[CacheEntry], Optional[str]]:
+        """
+        Look up an entry in memory, then on disk
+
+        Returns:
+            (entry or None, 'memory' or 'disk'); callers count hits since
+            only fresh entries are hits
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry, 'memory'
+
+        entry = self._read_disk(key)
+        if entry is None:
+            return None, None
+
+        with self._lock:
+            self._remember(key, entry)
+        return entry, 'disk'
+
+    def _put(self, key: str, entry: CacheEntry):
+        """Write an entry to both tiers"""
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def _remember(self, key: str, entry: CacheEntry):
+        """Insert into the memory tier, evicting by total size (caller holds the lock)"""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old.size
+        if entry.size > self.max_memory_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.cache'
+
+    def _read_disk(self, key: str) -> Optional[CacheEntry]:
+        """Read an entry from the disk tier"""
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+            os.utime(path)
+            return CacheEntry(meta['status'], meta['headers'], body, meta['expires_at'])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, entry: CacheEntry):
+        """Write an entry to the disk tier and evict old entries if needed"""
+        if not self.cache_dir:
+            return
+
+        path = self._disk_path(key)
+        meta = json.dumps({'status': entry.status, 'headers': entry.headers,
+                           'expires_at': entry.expires_at}).encode('utf-8')
+
+        tmp_path = None
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # A private temporary file per writer (created 0600), so concurrent
+            # writes of the same key never interleave
+            with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'{key}.', suffix='.tmp',
+                                             delete=False) as f:
+                tmp_path = f.name
+                f.write(meta + b'\n')
+                f.write(entry.body)
+
+            with self._lock:
+                try:
+                    old_size = path.stat().st_size
+                except FileNotFoundError:
+                    old_size = 0
+                os.replace(tmp_path, path)
+                tmp_path = None
+                self._disk_bytes += len(meta) + 1 + entry.size - old_size
+                over_limit = self._disk_bytes > self.max_disk_bytes
+            if over_limit:
+                self._evict_disk()
+        except Exception as e:
+            logger.warning(f"Error writing cache entry {path}: {e}")
+            if tmp_path:
+                Path(tmp_path).unlink(missing_ok=True)
+
+    def _evict_disk(self):
+        """Remove least recently used disk entries until under the size limit"""
+        files = sorted(self.cache_dir.glob('*/*.cache'), key=lambda p: p.stat().st_mtime)
+        target = self.max_disk_bytes * 0.9
+
+        with self._lock:
+            for path in files:
+                if self._disk_bytes <= target:
+                    break
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                self._disk_bytes -= size
+                self.stats['evictions'] += 1
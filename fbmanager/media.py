@@ -0,0 +1,324 @@
+"""
+Media Module
+Process-pool preprocessing of images and videos before upload
+
+Images are auto-rotated, resized to the platform limit, re-encoded
+without EXIF metadata and get a thumbnail (Pillow). Videos are scaled,
+re-encoded to H.264/AAC without metadata and get a poster frame (the
+ffmpeg binary). The work runs in a ProcessPoolExecutor sized to the core
+count, and outputs are cached by input hash and options, so re-posting a
+file skips the processing. Results are handed to the upload stage as
+they complete, in whatever order that is.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import logging
+
+from .metrics import Counter, Histogram
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+MEDIA_PROCESSED = Counter('fbmanager_media_processed_total', 'Preprocessed media files by outcome',
+                          ['kind', 'status'])
+MEDIA_SECONDS = Histogram('fbmanager_media_seconds', 'Time from submitting a file to its processed output',
+                          ['kind'])
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff', '.heic'}
+VIDEO_SUFFIXES = {'.mp4', '.mov', '.m4v', '.avi', '.mkv', '.webm', '.3gp'}
+
+# Bump when the processing itself changes so cached outputs are rebuilt
+PIPELINE_VERSION = 1
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class MediaError(Exception):
+    """Raised when a file cannot be preprocessed"""
+
+
+class MediaOptions:
+    """Output limits; part of the cache key"""
+
+    def __init__(self, max_image_side: int = 2048, jpeg_quality: int = 85, thumbnail_side: int = 320,
+                 max_video_height: int = 1080, video_crf: int = 23, video_preset: str = 'medium',
+                 audio_bitrate: str = '128k', ffmpeg: str = 'ffmpeg'):
+        """
+        Initialize MediaOptions
+
+        Args:
+            max_image_side: Longest image side in pixels; larger images are scaled down
+            jpeg_quality: JPEG quality of re-encoded images and thumbnails
+            thumbnail_side: Longest side of thumbnails and video poster frames
+            max_video_height: Videos taller than this are scaled down
+            video_crf: x264 constant rate factor (lower is better quality)
+            video_preset: x264 preset trading encode time for file size
+            audio_bitrate: AAC bitrate of re-encoded videos
+            ffmpeg: ffmpeg executable (not part of the cache key)
+        """
+        self.max_image_side = max_image_side
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_side = thumbnail_side
+        self.max_video_height = max_video_height
+        self.video_crf = video_crf
+        self.video_preset = video_preset
+        self.audio_bitrate = audio_bitrate
+        self.ffmpeg = ffmpeg
+
+    @classmethod
+    def from_env(cls) -> 'MediaOptions':
+        return cls(max_image_side=int(os.getenv('MEDIA_MAX_IMAGE_SIDE', '2048')),
+                   max_video_height=int(os.getenv('MEDIA_MAX_VIDEO_HEIGHT', '1080')),
+                   ffmpeg=os.getenv('MEDIA_FFMPEG', 'ffmpeg'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    def cache_key(self, kind: str) -> str:
+        """Digest of the options that affect outputs of this kind"""
+        if kind == 'image':
+            relevant = [self.max_image_side, self.jpeg_quality, self.thumbnail_side]
+        else:
+            relevant = [self.max_video_height, self.video_crf, self.video_preset, self.audio_bitrate,
+                        self.thumbnail_side]
+        return hashlib.sha256(json.dumps([PIPELINE_VERSION, kind] + relevant).encode()).hexdigest()[:16]
+
+
+def media_kind(path: str) -> str:
+    """'image' or 'video', judged by the file extension"""
+    suffix = Path(path).suffix.lower()
+    if suffix in IMAGE_SUFFIXES:
+        return 'image'
+    if suffix in VIDEO_SUFFIXES:
+        return 'video'
+    raise MediaError(f'Unsupported media type: {path}')
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def preprocess_file(path: str, cache_dir: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Produce the upload-ready version of one file (runs in a worker process)
+
+    Args:
+        path: Source image or video
+        cache_dir: Root of the output cache
+        options: MediaOptions.to_dict()
+
+    Returns:
+        {'source', 'kind', 'output', 'thumbnail', 'size', 'cached'}
+    """
+    opts = MediaOptions(**options)
+    kind = media_kind(path)
+    key = f'{file_digest(path)[:32]}-{opts.cache_key(kind)}'
+    target_dir = Path(cache_dir) / key[:2]
+    output = target_dir / (f'{key}.jpg' if kind == 'image' else f'{key}.mp4')
+    thumbnail = target_dir / f'{key}.thumb.jpg'
+
+    cached = output.exists() and thumbnail.exists()
+    if not cached:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        # Write under temporary names so other processes never see partial files
+        suffix = f'.{os.getpid()}.tmp'
+        tmp_output = output.with_name(output.name + suffix)
+        tmp_thumbnail = thumbnail.with_name(thumbnail.name + suffix)
+        try:
+            if kind == 'image':
+                _process_image(path, tmp_output, tmp_thumbnail, opts)
+            else:
+                _process_video(path, tmp_output, tmp_thumbnail, opts)
+            os.replace(tmp_thumbnail, thumbnail)
+            os.replace(tmp_output, output)
+        finally:
+            tmp_output.unlink(missing_ok=True)
+            tmp_thumbnail.unlink(missing_ok=True)
+
+    return {'source': path, 'kind': kind, 'output': str(output), 'thumbnail': str(thumbnail),
+            'size': output.stat().st_size, 'cached': cached}
+
+
+def _process_image(path: str, output: Path, thumbnail: Path, opts: MediaOptions):
+    # Imported in the worker process so importing this module stays cheap
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise MediaError('Image preprocessing requires Pillow (pip install Pillow)')
+    try:
+        with Image.open(path) as image:
+            # Apply the EXIF orientation before the metadata is dropped
+            image = ImageOps.exif_transpose(image)
+            if image.mode != 'RGB':
+                # Flatten transparency onto white; JPEG has no alpha channel
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                rgba = image.convert('RGBA')
+                background.paste(rgba, mask=rgba.getchannel('A'))
+                image = background
+            image.thumbnail((opts.max_image_side, opts.max_image_side), Image.LANCZOS)
+            # Saving without exif= writes no EXIF, GPS or maker notes
+            image.save(output, 'JPEG', quality=opts.jpeg_quality, optimize=True, progressive=True)
+            image.thumbnail((opts.thumbnail_side, opts.thumbnail_side), Image.LANCZOS)
+            image.save(thumbnail, 'JPEG', quality=opts.jpeg_quality, optimize=True)
+    except OSError as e:
+        raise MediaError(f'Cannot process image {path}: {e}') from e
+
+
+def _process_video(path: str, output: Path, thumbnail: Path, opts: MediaOptions):
+    if not shutil.which(opts.ffmpeg):
+        raise MediaError(f'Video preprocessing requires ffmpeg ({opts.ffmpeg} not found)')
+    height = opts.max_video_height
+    _run_ffmpeg([opts.ffmpeg, '-y', '-v', 'error', '-i', path,
+                 '-map', '0:v:0', '-map', '0:a:0?', '-map_metadata', '-1', '-map_chapters', '-1',
+                 '-vf', f"scale=-2:'min({height},ih)'",
+                 '-c:v', 'libx264', '-preset', opts.video_preset, '-crf', str(opts.video_crf),
+                 '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', opts.audio_bitrate,
+                 '-movflags', '+faststart', '-f', 'mp4', str(output)], path)
+    side = opts.thumbnail_side
+    _run_ffmpeg([opts.ffmpeg, '-y', '-v', 'error', '-i', str(output), '-frames:v', '1',
+                 '-vf', f"thumbnail,scale='min({side},iw)':-2", '-update', '1', '-f', 'image2', str(thumbnail)], path)
+
+
+def _run_ffmpeg(command: List[str], path: str):
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise MediaError(f'ffmpeg failed on {path}: {result.stderr.strip()[-500:]}')
+
+
+class MediaPreprocessor:
+    """Runs preprocess_file in a process pool and streams the results"""
+
+    def __init__(self, cache_dir: str = 'media_cache', max_workers: Optional[int] = None,
+                 options: Optional[MediaOptions] = None):
+        """
+        Initialize MediaPreprocessor
+
+        Args:
+            cache_dir: Directory of processed outputs, keyed by input hash and options
+            max_workers: Worker processes (default: number of CPU cores)
+            options: Output limits
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.options = options or MediaOptions()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'MediaPreprocessor':
+        return cls(os.getenv('MEDIA_CACHE_DIR', 'media_cache'),
+                   max_workers=int(os.getenv('MEDIA_WORKERS', '0') or 0) or None,
+                   options=MediaOptions.from_env())
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Start the worker processes on first use"""
+        with self._lock:
+            if self._executor is None:
+                # spawn: FBManager runs threads, which fork does not copy safely
+                self._executor = ProcessPoolExecutor(self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def submit(self, path: str) -> Future:
+        """Queue one file; the future resolves to preprocess_file's result"""
+        args = (preprocess_file, str(path), self.cache_dir, self.options.to_dict())
+        try:
+            return self._pool().submit(*args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool
+            logger.warning("Media worker pool broke, restarting it")
+            with self._lock:
+                self._executor = None
+            return self._pool().submit(*args)
+
+    def process(self, paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Preprocess files in parallel, yielding results as they complete
+
+        Failures are yielded too, as {'source', 'kind', 'error'}.
+        """
+        with TRACER.span('media.preprocess'):
+            futures = {}
+            for path in paths:
+                path = str(path)
+                try:
+                    kind = media_kind(path)
+                except MediaError as e:
+                    MEDIA_PROCESSED.labels(kind='unknown', status='error').inc()
+                    yield {'source': path, 'kind': None, 'error': str(e)}
+                    continue
+                futures[self.submit(path)] = (path, kind, time.perf_counter())
+
+            for future in as_completed(futures):
+                path, kind, submitted = futures[future]
+                MEDIA_SECONDS.observe(time.perf_counter() - submitted, kind=kind)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Preprocessing {path} failed: {e}")
+                    MEDIA_PROCESSED.labels(kind=kind, status='error').inc()
+                    yield {'source': path, 'kind': kind, 'error': str(e)}
+                    continue
+                MEDIA_PROCESSED.labels(kind=kind, status='cached' if result['cached'] else 'processed').inc()
+                yield result
+
+    def pipeline(self, paths: Iterable[str], upload: Callable[[Dict[str, Any]], Any],
+                 upload_workers: int = 2) -> List[Dict[str, Any]]:
+        """
+        Preprocess files and upload each one as soon as it is ready
+
+        CPU work stays in the process pool while uploads run on threads,
+        so encoding the next file overlaps with sending the previous one.
+
+        Args:
+            paths: Source files
+            upload: Called with each successful result; its return value is
+                stored under 'upload'
+            upload_workers: Uploads running at once
+
+        Returns:
+            One result per file, with 'error' set where preprocessing or the
+            upload failed
+        """
+        results = []
+        with ThreadPoolExecutor(upload_workers, thread_name_prefix='media-upload') as uploads:
+            pending = []
+            for result in self.process(paths):
+                results.append(result)
+                if 'error' not in result:
+                    pending.append((result, uploads.submit(TRACER.wrap(upload), result)))
+
+            for result, future in pending:
+                try:
+                    result['upload'] = future.result()
+                except Exception as e:
+                    logger.warning(f"Uploading {result['source']} failed: {e}")
+                    result['error'] = str(e)
+        return results
+
+    def close(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,333 @@
+"""
+Metrics Module
+Counters, gauges and latency histograms exported in Prometheus text format
+
+Recording is lock-free: every thread writes to its own shard of each
+metric, and shards are only summed when the metrics are collected.
+Shards of exited threads are merged and released.
+"""
+
+import bisect
+import math
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Sharded:
+    """
+    Per-thread value slots that are summed on collection
+
+    Shards of threads that have exited are folded into a base total and
+    dropped, so short-lived request threads do not accumulate.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, List[float]]] = []
+        self._base = [0.0] * size
+        self._lock = threading.Lock()
+
+    def shard(self) -> List[float]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0.0] * self._size
+            with self._lock:
+                self._reap()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+            return shard
+
+    def _reap(self):
+        """Fold shards of finished threads into the base; caller holds the lock"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # A finished thread can no longer write to its shard
+                for i, value in enumerate(shard):
+                    self._base[i] += value
+        self._shards = live
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            self._reap()
+            totals = list(self._base)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, **labels):
+        """Return the child metric for a set of label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        """Child used when the metric has no labels"""
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def collect(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._collect_child(key, child))
+        return lines
+
+    def _collect_child(self, key, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    def __init__(self):
+        self._values = _Sharded(1)
+
+    def inc(self, amount: float = 1.0):
+        self._values.shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._values.totals()[0]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _collect_child(self, key, child):
+        return [f'{self.name}{self._label_text(key)} {_format(child.value)}']
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._deltas = _Sharded(1)
+
+    def set(self, value: float):
+        self._value = value - self._deltas.totals()[0]
+
+    def inc(self, amount: float = 1.0):
+        self._deltas.shard()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        self._deltas.shard()[0] -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value + self._deltas.totals()[0]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _collect_child(self, key, child):
+        return [f'{self.name}{self._label_text(key)} {_format(child.value)}']
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # Layout: one slot per bucket, +Inf, sum, count
+        self._values = _Sharded(len(buckets) + 3)
+
+    def observe(self, value: float):
+        shard = self._values.shard()
+        shard[bisect.bisect_left(self._buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        totals = self._values.totals()
+        return totals[:-2], totals[-2], totals[-1]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. latencies in seconds"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['Registry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        """Decorator and context manager that observes the elapsed time"""
+        return _Timer(self.labels(**labels))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _collect_child(self, key, child):
+        counts, total, count = child.snapshot()
+        lines = []
+        cumulative = 0.0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == math.inf else _format(bound)
+            labels = self._label_text(key, f'le="{le}"')
+            lines.append(f'{self.name}_bucket{labels} {_format(cumulative)}')
+        lines.append(f'{self.name}_sum{self._label_text(key)} {_format(total)}')
+        lines.append(f'{self.name}_count{self._label_text(key)} {_format(count)}')
+        return lines
+
+
+class _Timer:
+    """Observe elapsed wall time into a histogram child"""
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._child.observe(time.perf_counter() - self._start)
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._child.observe(time.perf_counter() - start)
+        return wrapper
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Duplicate metric: {metric.name}')
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def start_http_server(port: int, addr: str = '127.0.0.1',
+                      registry: Optional[Registry] = None) -> ThreadingHTTPServer:
+    """
+    Serve /metrics from a background thread
+
+    Used by processes that do not run the Flask app, such as main.py.
+    """
+    registry = registry or REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Serving metrics on http://{addr}:{port}/metrics")
+    return server
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if math.isfinite(value) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
@@ -0,0 +1,237 @@
+"""
+Profiling Module
+On-demand cProfile and sampling capture for admin requests and FBManager tasks
+
+Profiling is off unless PROFILE_RATE is above zero. Call sites guard with
+`if PROFILER.enabled`, so a disabled profiler costs one attribute check.
+Captures are written to a directory that keeps only the newest files:
+cProfile mode writes .pstats files (open with pstats or snakeviz), sample
+mode writes collapsed stacks (.collapsed) for flamegraph.pl or speedscope.
+"""
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+
+PROFILE_NAME_PATTERN = re.compile(r'^[\w.-]+\.(pstats|collapsed)$')
+
+
+class Capture:
+    """A profile being recorded for one request or task"""
+
+    def __init__(self, kind: str, name: str, mode: str, sample_interval: float):
+        self.kind = kind
+        self.name = name
+        self.mode = mode
+        self.started = time.time()
+        self.duration = 0.0
+        self._profile: Optional[cProfile.Profile] = None
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+        if mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            thread_id = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample, args=(thread_id, sample_interval),
+                                             name='profile-sampler', daemon=True)
+            self._sampler.start()
+
+    def _sample(self, thread_id: int, interval: float):
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self._stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.duration = time.time() - self.started
+        if self._profile:
+            self._profile.disable()
+        else:
+            self._stop.set()
+            self._sampler.join()
+
+    @property
+    def empty(self) -> bool:
+        """True when sampling finished before the first sample was taken"""
+        return self._profile is None and not self._stacks
+
+    def save(self, path: Path):
+        if self._profile:
+            self._profile.dump_stats(str(path))
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+
+
+class Profiler:
+    """Samples a percentage of requests and tasks into a rotating directory"""
+
+    def __init__(self, output_dir: str = 'profiles', rate: float = 0.0, mode: str = 'cprofile',
+                 tasks: Iterable[str] = (), max_files: int = 50, sample_interval: float = 0.005):
+        """
+        Initialize Profiler
+
+        Args:
+            output_dir: Directory profiles are written to
+            rate: Percentage (0-100) of requests and tasks to profile; 0 disables
+            mode: 'cprofile' for deterministic pstats, 'sample' for collapsed stacks
+            tasks: FBManager task names to profile; empty means all tasks
+            max_files: Number of profiles kept; older ones are deleted
+            sample_interval: Seconds between stack samples in sample mode
+        """
+        self.enabled = False
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self.configure(output_dir, rate, mode, tasks, max_files)
+
+    def configure(self, output_dir: str = 'profiles', rate: float = 0.0, mode: str = 'cprofile',
+                  tasks: Iterable[str] = (), max_files: int = 50):
+        """Apply new settings; the enabled flag is updated last"""
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        self.output_dir = Path(output_dir)
+        self.rate = max(0.0, min(100.0, float(rate)))
+        self.mode = mode
+        self.tasks = frozenset(tasks)
+        self.max_files = max_files
+        self.enabled = self.rate > 0
+        if self.enabled:
+            logger.info(f"Profiling {self.rate:g}% of requests and tasks ({mode}) into {self.output_dir}")
+
+    def configure_from_env(self, environ: Optional[Mapping[str, str]] = None):
+        """
+        Apply PROFILE_* settings
+
+        Args:
+            environ: Mapping to read from, defaults to os.environ
+        """
+        environ = os.environ if environ is None else environ
+        try:
+            self.configure(output_dir=environ.get('PROFILE_DIR') or 'profiles',
+                           rate=float(environ.get('PROFILE_RATE') or 0),
+                           mode=environ.get('PROFILE_MODE') or 'cprofile',
+                           tasks=[t.strip() for t in (environ.get('PROFILE_TASKS') or '').split(',') if t.strip()],
+                           max_files=int(environ.get('PROFILE_MAX_FILES') or 50))
+        except ValueError as e:
+            logger.error(f"Invalid profiling settings, profiling disabled: {e}")
+            self.enabled = False
+
+    def start(self, kind: str, name: str) -> Optional[Capture]:
+        """
+        Start a capture if this call is sampled
+
+        Args:
+            kind: 'request' or 'task'
+            name: Endpoint or task name
+
+        Returns:
+            Capture to pass to stop(), or None when not sampled
+        """
+        if kind == 'task' and self.tasks and name not in self.tasks:
+            return None
+        if random.random() * 100 >= self.rate:
+            return None
+        try:
+            return Capture(kind, name, self.mode, self.sample_interval)
+        except ValueError as e:
+            # cProfile refuses to start while another profiler is active
+            logger.debug(f"Skipped profiling {kind} {name}: {e}")
+            return None
+
+    def stop(self, capture: Capture) -> Optional[Path]:
+        """Finish a capture and write it to the output directory"""
+        capture.stop()
+        if capture.empty:
+            return None
+        suffix = '.pstats' if capture.mode == 'cprofile' else '.collapsed'
+        timestamp = datetime.fromtimestamp(capture.started).strftime('%Y%m%d_%H%M%S_%f')
+        safe_name = re.sub(r'[^\w.-]', '_', capture.name)
+        path = self.output_dir / f'{timestamp}_{capture.kind}_{safe_name}_{os.getpid()}{suffix}'
+
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            capture.save(path)
+            self._rotate()
+        except OSError as e:
+            logger.error(f"Error writing profile {path}: {e}")
+            return None
+
+        logger.info(f"Profiled {capture.kind} {capture.name} ({capture.duration * 1000:.0f}ms): {path}")
+        return path
+
+    @contextmanager
+    def profile(self, kind: str, name: str):
+        """Profile the enclosed block if it is sampled"""
+        capture = self.start(kind, name) if self.enabled else None
+        try:
+            yield
+        finally:
+            if capture:
+                self.stop(capture)
+
+    def _rotate(self):
+        with self._lock:
+            files = sorted(self._profile_files(), key=lambda p: p.name, reverse=True)
+            for path in files[self.max_files:]:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _profile_files(self) -> List[Path]:
+        if not self.output_dir.exists():
+            return []
+        return [p for p in self.output_dir.iterdir() if PROFILE_NAME_PATTERN.match(p.name)]
+
+    def list_profiles(self) -> List[Dict]:
+        """
+        List stored profiles, newest first
+
+        Returns:
+            List of profile information dictionaries
+        """
+        profiles = []
+        for path in sorted(self._profile_files(), key=lambda p: p.name, reverse=True):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            profiles.append({
+                'name': path.name,
+                'size': stat.st_size,
+                'modified': datetime.fromtimestamp(stat.st_mtime),
+            })
+        return profiles
+
+    def get_path(self, name: str) -> Optional[Path]:
+        """Return the path of a stored profile, or None if the name is not a profile"""
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = self.output_dir / name
+        return path if path.is_file() else None
+
+
+PROFILER = Profiler()
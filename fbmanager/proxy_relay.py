@@ -0,0 +1,206 @@
+"""
+Proxy Relay
+Local, unauthenticated HTTP proxy that forwards through an upstream proxy
+with credentials
+
+Chrome ignores credentials in --proxy-server and cannot authenticate to
+SOCKS proxies at all. A relay listens on 127.0.0.1, takes the browser's
+CONNECT and plain HTTP requests and opens each connection through the
+upstream proxy, adding Proxy-Authorization for HTTP(S) proxies or
+authenticating the SOCKS5 handshake (with PySocks).
+"""
+
+import base64
+import select
+import socket
+import socketserver
+import ssl
+import threading
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+
+from .proxy_pool import Proxy
+
+logger = logging.getLogger(__name__)
+
+# Largest request or response head accepted
+MAX_HEAD = 64 * 1024
+
+# Hop-by-hop headers replaced on forwarded plain HTTP requests
+HOP_HEADERS = (b'proxy-connection', b'connection', b'keep-alive', b'proxy-authorization')
+
+
+class RelayError(OSError):
+    """The upstream proxy refused or failed to open a connection"""
+
+
+class ProxyRelay:
+    """Forwards connections from a local port through one upstream proxy"""
+
+    def __init__(self, upstream: Proxy, host: str = '127.0.0.1', port: int = 0,
+                 timeout: float = 30.0, idle_timeout: float = 300.0):
+        """
+        Initialize ProxyRelay
+
+        Args:
+            upstream: Proxy to forward through, usually with credentials
+            host: Local interface to listen on; keep it on loopback, the
+                relay does not authenticate its clients
+            port: Local port (0 picks a free one)
+            timeout: Seconds to connect through the upstream proxy
+            idle_timeout: Seconds a tunnel may stay silent before it is closed
+        """
+        self.upstream = upstream
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self.url = f'http://{host}:{self._server.server_address[1]}'
+
+    def start(self) -> 'ProxyRelay':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='proxy-relay', daemon=True)
+            self._thread.start()
+            logger.info(f"Relaying {self.url} through {self.upstream.server}")
+        return self
+
+    def close(self):
+        if self._thread:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def open(self, host: str, port: int) -> socket.socket:
+        """Open a connection to host:port through the upstream proxy"""
+        upstream = self.upstream
+        if upstream.scheme.startswith('socks'):
+            try:
+                import socks
+            except ImportError:
+                raise RelayError('SOCKS proxies require PySocks (pip install PySocks)')
+            try:
+                return socks.create_connection(
+                    (host, port), timeout=self.timeout, proxy_type=socks.SOCKS5,
+                    proxy_addr=upstream.host, proxy_port=upstream.port, proxy_rdns=True,
+                    proxy_username=upstream.username, proxy_password=upstream.password)
+            except (socks.ProxyError, OSError) as e:
+                raise RelayError(f'SOCKS connection to {host}:{port} failed: {e}') from e
+
+        conn = socket.create_connection((upstream.host, upstream.port), timeout=self.timeout)
+        try:
+            if upstream.scheme == 'https':
+                conn = ssl.create_default_context().wrap_socket(conn, server_hostname=upstream.host)
+            target = f'{host}:{port}'
+            head = f'CONNECT {target} HTTP/1.1\r\nHost: {target}\r\n'
+            if upstream.authenticated:
+                head += f'Proxy-Authorization: {self.authorization()}\r\n'
+            conn.sendall((head + '\r\n').encode('latin-1'))
+            response, _ = _read_head(conn)
+            status = response.split(b'\r\n', 1)[0]
+            if status.split(b' ')[1:2] != [b'200']:
+                raise RelayError(f'Upstream proxy refused CONNECT {target}: {status.decode("latin-1")}')
+            conn.settimeout(None)
+            return conn
+        except BaseException:
+            conn.close()
+            raise
+
+    def authorization(self) -> str:
+        credentials = f'{self.upstream.username}:{self.upstream.password or ""}'.encode('utf-8')
+        return 'Basic ' + base64.b64encode(credentials).decode('ascii')
+
+    def forward_request(self, head: bytes) -> Tuple[socket.socket, bytes]:
+        """
+        Open a connection for a plain HTTP request and rewrite its head
+
+        HTTP upstreams receive the absolute-form request with credentials;
+        over SOCKS the request goes straight to the origin in origin-form.
+        The connection is closed after one response either way, so each
+        request carries its own credentials.
+        """
+        request_line, _, headers = head.partition(b'\r\n')
+        method, target, version = request_line.split(b' ', 2)
+        url = urlsplit(target.decode('latin-1'))
+        kept = [line for line in headers.split(b'\r\n')
+                if line and line.split(b':', 1)[0].strip().lower() not in HOP_HEADERS]
+        kept.append(b'Connection: close')
+
+        if self.upstream.scheme.startswith('socks'):
+            conn = self.open(url.hostname, url.port or 80)
+            path = url.path or '/'
+            if url.query:
+                path += '?' + url.query
+            request_line = b' '.join((method, path.encode('latin-1'), version))
+        else:
+            conn = socket.create_connection((self.upstream.host, self.upstream.port), timeout=self.timeout)
+            if self.upstream.scheme == 'https':
+                conn = ssl.create_default_context().wrap_socket(conn, server_hostname=self.upstream.host)
+            conn.settimeout(None)
+            if self.upstream.authenticated:
+                kept.append(f'Proxy-Authorization: {self.authorization()}'.encode('latin-1'))
+        return conn, b'\r\n'.join([request_line] + kept) + b'\r\n\r\n'
+
+    def _handler(self):
+        relay = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                client = self.request
+                try:
+                    head, rest = _read_head(client)
+                except (OSError, ValueError):
+                    return
+                method, _, target = head.split(b'\r\n', 1)[0].partition(b' ')
+                try:
+                    if method == b'CONNECT':
+                        host, _, port = target.split(b' ', 1)[0].decode('latin-1').rpartition(':')
+                        upstream = relay.open(host.strip('[]'), int(port))
+                        client.sendall(b'HTTP/1.1 200 Connection Established\r\n\r\n')
+                    else:
+                        upstream, head = relay.forward_request(head)
+                        upstream.sendall(head)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Proxy relay: {e}")
+                    client.sendall(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                    return
+                try:
+                    if rest:
+                        upstream.sendall(rest)
+                    _pipe(client, upstream, relay.idle_timeout)
+                finally:
+                    upstream.close()
+
+        return Handler
+
+
+def _read_head(conn: socket.socket) -> Tuple[bytes, bytes]:
+    """Read up to the blank line ending an HTTP head; returns (head, bytes after it)"""
+    data = b''
+    while b'\r\n\r\n' not in data:
+        chunk = conn.recv(4096)
+        if not chunk:
+            raise ValueError('Connection closed before the end of the HTTP head')
+        data += chunk
+        if len(data) > MAX_HEAD:
+            raise ValueError('HTTP head too large')
+    head, _, rest = data.partition(b'\r\n\r\n')
+    return head, rest
+
+
+def _pipe(a: socket.socket, b: socket.socket, idle_timeout: float):
+    """Copy bytes both ways until either side closes or the tunnel idles out"""
+    sockets = [a, b]
+    while True:
+        # TLS sockets may hold decrypted bytes that select() cannot see
+        readable = [s for s in sockets if isinstance(s, ssl.SSLSocket) and s.pending()]
+        if not readable:
+            readable, _, _ = select.select(sockets, [], [], idle_timeout)
+        if not readable:
+            return
+        for sock in readable:
+            data = sock.recv(65536)
+            if not data:
+                return
+            (b if sock is a else a).sendall(data)
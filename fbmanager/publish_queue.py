@@ -0,0 +1,249 @@
+"""
+Publish Queue Module
+SQLite queue of scheduled page posts, shared by the admin app and FBManager
+
+Posts are stored with a target time and deduplicated per page by a hash
+of their content while they wait to be published. Claims hand out at most
+one post per page at a time and respect each page's next allowed time.
+This module does not import the Graph API client, so the admin app can
+enqueue posts without loading it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from .metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_QUEUE_DEPTH = Gauge('fbmanager_publish_queue_depth', 'Posts waiting to be published')
+
+# 'unknown': the request may have reached Facebook but no answer came back
+STATUSES = ('pending', 'publishing', 'published', 'failed', 'unknown')
+
+
+def content_hash(payload: Dict[str, Any]) -> str:
+    """Hash a post's content independently of key order"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class PublishQueue:
+    """SQLite-backed queue of posts shared by the admin app and FBManager"""
+
+    def __init__(self, db_path: str = 'publish_queue.db', max_attempts: int = 5):
+        """
+        Initialize PublishQueue
+
+        Args:
+            db_path: SQLite database file
+            max_attempts: Posts are marked failed after this many attempts
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS posts ('
+                         'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'page_id TEXT NOT NULL, '
+                         'content_hash TEXT NOT NULL, '
+                         'payload TEXT NOT NULL, '
+                         'publish_at REAL NOT NULL, '
+                         'available_at REAL NOT NULL, '
+                         "status TEXT NOT NULL DEFAULT 'pending', "
+                         'attempts INTEGER NOT NULL DEFAULT 0, '
+                         'post_id TEXT, '
+                         'error TEXT, '
+                         'created REAL NOT NULL, '
+                         'updated REAL NOT NULL)')
+            # Identical content may be queued again once the earlier post is published, failed or unknown
+            conn.execute('DROP INDEX IF EXISTS posts_dedupe')
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS posts_dedupe_active ON posts (page_id, content_hash) '
+                         "WHERE status IN ('pending', 'publishing')")
+            conn.execute('CREATE INDEX IF NOT EXISTS posts_ready ON posts (available_at, id) '
+                         "WHERE status IN ('pending', 'publishing')")
+            # Earliest time each page may receive its next post
+            conn.execute('CREATE TABLE IF NOT EXISTS pages ('
+                         'page_id TEXT PRIMARY KEY, '
+                         'next_at REAL NOT NULL)')
+
+    @classmethod
+    def from_env(cls) -> 'PublishQueue':
+        return cls(os.getenv('PUBLISH_QUEUE_DB', 'publish_queue.db'),
+                   max_attempts=int(os.getenv('PUBLISH_MAX_ATTEMPTS', '5')))
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, page_id: str, payload: Dict[str, Any],
+                publish_at: Optional[float] = None) -> Tuple[int, bool]:
+        """
+        Schedule a post
+
+        Returns:
+            (post id, whether it was added); an identical post still pending
+            or publishing for the same page returns the existing id instead
+        """
+        return self.enqueue_many([(page_id, payload, publish_at)])[0]
+
+    def enqueue_many(self, posts: Iterable[Tuple[str, Dict[str, Any], Optional[float]]]) -> List[Tuple[int, bool]]:
+        """
+        Schedule many (page_id, payload, publish_at) posts in one transaction
+
+        Returns:
+            (post id, whether it was added) for each post, in order
+        """
+        now = time.time()
+        results = []
+        with self._connect() as conn:
+            for page_id, payload, publish_at in posts:
+                page_id = str(page_id)
+                digest = content_hash(payload)
+                at = publish_at or now
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO posts (page_id, content_hash, payload, publish_at, '
+                    'available_at, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (page_id, digest, json.dumps(payload, ensure_ascii=False), at, at, now, now))
+                if cursor.rowcount:
+                    results.append((cursor.lastrowid, True))
+                    continue
+
+                row = conn.execute('SELECT id FROM posts WHERE page_id = ? AND content_hash = ? '
+                                   "AND status IN ('pending', 'publishing')", (page_id, digest)).fetchone()
+                results.append((row['id'], False))
+        return results
+
+    def claim(self, limit: int, lease: float = 300.0) -> List[Dict[str, Any]]:
+        """
+        Take up to limit due posts, at most one per page
+
+        A claimed post's page is blocked for `lease` seconds; the post and
+        its page become available again if the claim is neither completed
+        nor failed by then.
+
+        Returns:
+            List of {'id', 'page_id', 'payload', 'attempts'}
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            blocked = {row[0] for row in conn.execute('SELECT page_id FROM pages WHERE next_at > ?', (now,))}
+            # Walk due posts oldest first and stop once the batch is full
+            rows = []
+            for row in conn.execute("SELECT id, page_id, payload, attempts FROM posts "
+                                    "WHERE status IN ('pending', 'publishing') AND available_at <= ? "
+                                    'ORDER BY available_at, id', (now,)):
+                if row['page_id'] in blocked:
+                    continue
+                blocked.add(row['page_id'])
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+            if rows:
+                conn.executemany("UPDATE posts SET status = 'publishing', available_at = ?, "
+                                 'attempts = attempts + 1, updated = ? WHERE id = ?',
+                                 [(now + lease, now, row['id']) for row in rows])
+                self._block_pages(conn, [(row['page_id'], now + lease) for row in rows])
+        return [{'id': row['id'], 'page_id': row['page_id'], 'payload': json.loads(row['payload']),
+                 'attempts': row['attempts'] + 1} for row in rows]
+
+    def complete(self, post_id: int, page_id: str, graph_id: Optional[str], next_at: float):
+        """Mark a post published and open its page again at next_at"""
+        with self._connect() as conn:
+            conn.execute("UPDATE posts SET status = 'published', post_id = ?, error = NULL, updated = ? "
+                         'WHERE id = ?', (graph_id, time.time(), post_id))
+            self._block_pages(conn, [(page_id, next_at)])
+
+    def fail(self, post_id: int, page_id: str, attempts: int, error: str, next_at: float,
+             retry: bool = True, backoff: float = 30.0):
+        """Schedule a retry with exponential backoff, or mark the post failed"""
+        now = time.time()
+        with self._connect() as conn:
+            if not retry or attempts >= self.max_attempts:
+                conn.execute("UPDATE posts SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                             (error, now, post_id))
+                logger.error(f"Post {post_id} for page {page_id} failed after {attempts} attempts: {error}")
+            else:
+                conn.execute("UPDATE posts SET status = 'pending', available_at = ?, error = ?, updated = ? "
+                             'WHERE id = ?', (now + backoff * 2 ** (attempts - 1), error, now, post_id))
+            self._block_pages(conn, [(page_id, next_at)])
+
+    def mark_unknown(self, post_id: int, page_id: str, error: str, next_at: float):
+        """
+        Record that a post may or may not have been published
+
+        The post is not retried; posting again could publish it twice.
+        Once someone has checked the page, the content can be queued again.
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE posts SET status = 'unknown', error = ?, updated = ? WHERE id = ?",
+                         (error, time.time(), post_id))
+            self._block_pages(conn, [(page_id, next_at)])
+        logger.error(f"Post {post_id} for page {page_id} may or may not have been published: {error}")
+
+    def throttle(self, post_id: int, page_id: str, error: str, until: float):
+        """Return a post without counting the attempt and pause its page until `until`"""
+        with self._connect() as conn:
+            conn.execute("UPDATE posts SET status = 'pending', available_at = ?, attempts = attempts - 1, "
+                         'error = ?, updated = ? WHERE id = ?', (until, error, time.time(), post_id))
+            self._block_pages(conn, [(page_id, until)])
+
+    @staticmethod
+    def _block_pages(conn: sqlite3.Connection, pages: List[Tuple[str, float]]):
+        conn.executemany('INSERT INTO pages (page_id, next_at) VALUES (?, ?) '
+                         'ON CONFLICT (page_id) DO UPDATE SET next_at = excluded.next_at', pages)
+
+    def get(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Return the posts with the given ids"""
+        if not ids:
+            return []
+        placeholders = ', '.join('?' * len(ids))
+        rows = self._connect().execute(f'SELECT * FROM posts WHERE id IN ({placeholders}) ORDER BY id',
+                                       list(ids)).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def find(self, status: Optional[str] = None, page_id: Optional[str] = None,
+             limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recently updated posts, optionally filtered"""
+        conditions, params = [], []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if page_id:
+            conditions.append('page_id = ?')
+            params.append(str(page_id))
+        where = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+        rows = self._connect().execute(f'SELECT * FROM posts {where}ORDER BY updated DESC, id DESC LIMIT ?',
+                                       params + [limit]).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Count posts by status"""
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self._connect().execute('SELECT status, COUNT(*) FROM posts GROUP BY status'):
+            counts[status] = count
+        PUBLISH_QUEUE_DEPTH.set(counts['pending'] + counts['publishing'])
+        return counts
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        post = dict(row)
+        post['payload'] = json.loads(post['payload'])
+        del post['content_hash']
+        return post
@@ -0,0 +1,317 @@
+"""
+Publishing Module
+Durable queue of scheduled page posts and the workers that publish them
+
+Posts wait in a PublishQueue (see publish_queue.py). Workers claim due
+posts in batches, at most one in flight per page and no faster than
+page_interval per page, so a slow or throttled page holds one worker
+instead of the whole queue.
+Failures are retried with exponential backoff and every post keeps its
+status, Graph API post id and last error. A post is only retried when
+Facebook certainly did not receive it (an error response, or a failure
+to connect); after a read timeout or a dropped connection it is marked
+'unknown' instead, since posting again could publish it twice.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import logging
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from .graph_api import GraphAPIClient, GraphAPIError
+from .metrics import Counter, Histogram
+from .publish_queue import PublishQueue
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+POSTS_PUBLISHED = Counter('fbmanager_posts_total', 'Publish attempts by outcome', ['status'])
+PUBLISH_SECONDS = Histogram('fbmanager_publish_seconds', 'Time to publish one post')
+
+# Graph API error codes for application, user and page level throttling
+RATE_LIMIT_CODES = {4, 17, 32, 613, 80001}
+# Graph API error codes for temporary platform problems
+TRANSIENT_CODES = {1, 2}
+
+
+class PageTokens:
+    """
+    Page access tokens resolved from the client's user token
+
+    Publishing to a page needs that page's own token. Tokens are read from
+    /me/accounts once and cached; a page missing from the cache triggers
+    at most one refresh per min_refresh seconds. When the client's token is
+    itself a page token, /me/accounts does not exist and the token is used
+    for its own page.
+    """
+
+    # Invalid or expired access token
+    INVALID_TOKEN_CODE = 190
+    # /me/accounts read with a page token
+    NONEXISTENT_FIELD_CODE = 100
+
+    def __init__(self, client: GraphAPIClient, min_refresh: float = 60.0):
+        """
+        Initialize PageTokens
+
+        Args:
+            client: Client holding a user (or page) access token
+            min_refresh: Minimum seconds between two /me/accounts reads
+        """
+        self.client = client
+        self.min_refresh = min_refresh
+        self._tokens: Dict[str, str] = {}
+        self._refreshed = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, page_id: str) -> str:
+        """Return the page's access token, raising GraphAPIError when the user cannot manage it"""
+        with self._lock:
+            token = self._tokens.get(page_id)
+            if token is None and time.monotonic() - self._refreshed >= self.min_refresh:
+                self._refresh()
+                token = self._tokens.get(page_id)
+        if token is None:
+            raise GraphAPIError(f'No page access token for page {page_id}; the user must manage the page '
+                                'and grant pages_manage_posts', code=200)
+        return token
+
+    def invalidate(self, page_id: str):
+        """Drop a rejected token so the next get() reads a fresh one"""
+        with self._lock:
+            self._tokens.pop(page_id, None)
+            self._refreshed = 0.0
+
+    def _refresh(self):
+        """Read every page token the user has (caller holds the lock)"""
+        self._refreshed = time.monotonic()
+        tokens = {}
+        params = {'fields': 'id,access_token', 'limit': 100}
+        try:
+            while True:
+                # Never cached: the response holds page tokens, and invalidate() needs fresh ones
+                result = self.client.call('GET', 'me/accounts', params, use_cache=False)
+                for page in result.get('data', []):
+                    if page.get('access_token'):
+                        tokens[str(page['id'])] = page['access_token']
+                after = (result.get('paging') or {}).get('cursors', {}).get('after')
+                if not after or not result.get('paging', {}).get('next'):
+                    break
+                params = dict(params, after=after)
+        except GraphAPIError as e:
+            if e.code != self.NONEXISTENT_FIELD_CODE:
+                raise
+            tokens = {str(self.client.call('GET', 'me', {'fields': 'id'}, use_cache=False)['id']): self.client.access_token}
+        self._tokens = tokens
+        logger.info(f"Loaded access tokens for {len(tokens)} pages")
+
+
+def graph_publisher(client: GraphAPIClient, tokens: Optional[PageTokens] = None
+                    ) -> Callable[[str, Dict[str, Any]], str]:
+    """
+    Publish through the Graph API
+
+    Payloads with a 'url' are posted as photos, others to the page feed.
+    Each page is published to with its own token from `tokens`; without
+    it the client's token is used and must be that page's token.
+    """
+    def publish(page_id: str, payload: Dict[str, Any]) -> str:
+        edge = 'photos' if 'url' in payload else 'feed'
+        token = tokens.get(page_id) if tokens else None
+        try:
+            result = client.call('POST', f'{page_id}/{edge}', payload, access_token=token)
+        except GraphAPIError as e:
+            if not tokens or e.code != PageTokens.INVALID_TOKEN_CODE:
+                raise
+            # Page tokens are revoked when the user's token changes; fetch again once
+            tokens.invalidate(page_id)
+            result = client.call('POST', f'{page_id}/{edge}', payload, access_token=tokens.get(page_id))
+        return result.get('post_id') or result['id']
+    return publish
+
+
+class Publisher:
+    """Dispatcher thread plus worker pool that drains the publish queue"""
+
+    def __init__(self, queue: PublishQueue, publish: Callable[[str, Dict[str, Any]], str],
+                 workers: int = 8, page_interval: float = 60.0, throttle_delay: float = 900.0,
+                 backoff: float = 30.0, lease: float = 300.0, poll_interval: float = 1.0,
+                 on_result: Optional[Callable[[Dict[str, Any], str, Optional[str]], None]] = None):
+        """
+        Initialize Publisher
+
+        Args:
+            queue: Queue to drain
+            publish: Called with (page_id, payload), returns the new post's id
+            workers: Posts published in parallel (each to a different page)
+            page_interval: Minimum seconds between two posts to the same page
+            throttle_delay: Seconds a page is paused after a rate limit error
+            backoff: Initial retry delay for failed posts, doubled per attempt
+            lease: Seconds before a claim held by a crashed worker expires
+            poll_interval: Seconds to wait when nothing is due
+            on_result: Called with (post, status, graph id or error) after each attempt
+        """
+        self.queue = queue
+        self.publish = publish
+        self.workers = workers
+        self.page_interval = page_interval
+        self.throttle_delay = throttle_delay
+        self.backoff = backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.on_result = on_result
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> Optional['Publisher']:
+        """
+        Create a publisher when PUBLISH_WORKERS is set and a user or page token exists
+
+        Page tokens are resolved from FACEBOOK_ACCESS_TOKEN; an app token
+        cannot publish to pages, so none is started with only app credentials.
+        """
+        workers = int(os.getenv('PUBLISH_WORKERS', '0') or 0)
+        if workers <= 0:
+            return None
+        try:
+            client = GraphAPIClient.from_env()
+        except GraphAPIError as e:
+            logger.warning(f"Publishing disabled: {e}")
+            return None
+        if client.is_app_token:
+            logger.warning("Publishing disabled: FACEBOOK_ACCESS_TOKEN must be a user or page token "
+                           "with pages_manage_posts; an app token cannot publish to pages")
+            client.close()
+            return None
+        kwargs.setdefault('page_interval', float(os.getenv('PUBLISH_PAGE_INTERVAL', '60')))
+        return cls(PublishQueue.from_env(), graph_publisher(client, PageTokens(client)), workers=workers, **kwargs)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='publish')
+            self._thread = threading.Thread(target=self._run, name='publish-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop claiming posts and wait for the ones in flight"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                # Claim in batches: wait for half the workers unless all are idle
+                while (0 < self._in_flight and self.workers - self._in_flight < max(1, self.workers // 2)
+                       and not self._stop.is_set()):
+                    if not self._cond.wait(self.poll_interval):
+                        break
+                free = self.workers - self._in_flight
+            try:
+                posts = self.queue.claim(free, self.lease) if free else []
+            except sqlite3.Error as e:
+                logger.error(f"Publish queue error: {e}")
+                posts = []
+
+            for post in posts:
+                with self._cond:
+                    self._in_flight += 1
+                self._executor.submit(self._publish_one, post)
+
+            # Sleep until a worker frees up or the next poll
+            with self._cond:
+                if self._stop.is_set():
+                    break
+                if not posts or self._in_flight >= self.workers:
+                    self._cond.wait(self.poll_interval)
+
+    def process_batch(self) -> int:
+        """
+        Claim and publish one batch synchronously
+
+        Returns:
+            Number of posts claimed
+        """
+        posts = self.queue.claim(self.workers, self.lease)
+        for post in posts:
+            self._publish_one(post, track=False)
+        return len(posts)
+
+    def _publish_one(self, post: Dict[str, Any], track: bool = True):
+        try:
+            self._attempt(post)
+        except Exception as e:
+            logger.error(f"Error recording result of post {post['id']}: {e}")
+        finally:
+            if track:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _attempt(self, post: Dict[str, Any]):
+        page_id = post['page_id']
+        try:
+            with PUBLISH_SECONDS.time(), TRACER.span('publish', page=page_id):
+                graph_id = self.publish(page_id, post['payload'])
+        except GraphAPIError as e:
+            if e.code in RATE_LIMIT_CODES:
+                logger.warning(f"Page {page_id} is rate limited, pausing it for {self.throttle_delay:.0f}s: {e}")
+                self.queue.throttle(post['id'], page_id, str(e), time.time() + self.throttle_delay)
+                self._report(post, 'throttled', str(e))
+                return
+            retry = e.code in TRANSIENT_CODES or (e.status or 500) >= 500
+            self._fail(post, str(e), retry)
+            return
+        except Exception as e:
+            if not _not_sent(e):
+                self._unknown(post, str(e))
+                return
+            self._fail(post, str(e), retry=True)
+            return
+
+        self.queue.complete(post['id'], page_id, graph_id, time.time() + self.page_interval)
+        logger.info(f"Published post {post['id']} to page {page_id} as {graph_id}")
+        self._report(post, 'published', graph_id)
+
+    def _fail(self, post: Dict[str, Any], error: str, retry: bool):
+        logger.warning(f"Publishing post {post['id']} to page {post['page_id']} failed: {error}")
+        self.queue.fail(post['id'], post['page_id'], post['attempts'], error,
+                        time.time() + self.page_interval, retry=retry, backoff=self.backoff)
+        self._report(post, 'error', error)
+
+    def _unknown(self, post: Dict[str, Any], error: str):
+        self.queue.mark_unknown(post['id'], post['page_id'], error, time.time() + self.page_interval)
+        self._report(post, 'unknown', error)
+
+    def _report(self, post: Dict[str, Any], status: str, detail: Optional[str]):
+        POSTS_PUBLISHED.labels(status=status).inc()
+        if self.on_result:
+            self.on_result(post, status, detail)
+
+
+def _not_sent(error: Exception) -> bool:
+    """True for errors raised before the request was sent, which are safe to retry"""
+    # ProxyError covers a refused CONNECT and NoHealthyProxyError
+    if isinstance(error, (requests.exceptions.ConnectTimeout, requests.exceptions.ProxyError)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        # Refused or unresolvable connections; a dropped connection is a ProtocolError instead
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
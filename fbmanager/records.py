@@ -0,0 +1,282 @@
+"""
+Records Module
+Compact in-memory representation of collected posts, comments and metrics
+
+A dict per record repeats every key and boxes every number, which costs
+several hundred bytes per comment. Records here come in two forms:
+
+* Record subclasses (Comment, Post, PageMetric) use __slots__, for code
+  that handles a few records at a time.
+* ColumnBatch subclasses (CommentBatch, PostBatch, MetricBatch) store one
+  typed array per numeric field, text as UTF-8 in one buffer per field,
+  and intern page, post and author ids into shared tables, for holding
+  large collections between parse and store. to_frame() turns a batch
+  into a pandas DataFrame, sharing the numeric buffers.
+
+Batches are not thread-safe; use one per collecting thread.
+"""
+
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# Column kinds: interned id, signed 64-bit int, unsigned 32-bit count, float, text
+ID = 'id'
+INT = 'q'
+COUNT = 'I'
+FLOAT = 'd'
+TEXT = 'text'
+
+# numpy dtypes of the array-backed kinds (and of interned id codes)
+NUMPY_DTYPES = {ID: 'int32', INT: 'int64', COUNT: 'uint32', FLOAT: 'float64'}
+
+GRAPH_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S%z'
+
+
+class InternTable:
+    """Maps repeated strings to small integer codes and back"""
+
+    __slots__ = ('_codes', 'values')
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class TextColumn:
+    """Strings stored as concatenated UTF-8 plus an array of end offsets"""
+
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+
+    def append(self, value: str):
+        self.data += value.encode('utf-8')
+        self.offsets.append(len(self.data))
+
+    def pop(self):
+        self.offsets.pop()
+        del self.data[self.offsets[-1]:]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        data, offsets = self.data, self.offsets
+        for index in range(len(offsets) - 1):
+            yield data[offsets[index]:offsets[index + 1]].decode('utf-8')
+
+
+class Record:
+    """Base for __slots__ records; fields are set positionally in slot order"""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class Comment(Record):
+    __slots__ = ('id', 'post_id', 'page_id', 'author_id', 'created', 'likes', 'replies', 'message')
+
+
+class Post(Record):
+    __slots__ = ('id', 'page_id', 'created', 'likes', 'comments', 'shares', 'message')
+
+
+class PageMetric(Record):
+    __slots__ = ('page_id', 'name', 'end_time', 'value')
+
+
+class ColumnBatch:
+    """
+    Columnar collection of records of one type
+
+    Subclasses set `record` to a Record class and `kinds` to one column
+    kind per slot. Id columns share InternTables by field name, so
+    batches created with the same `ids` mapping use the same codes.
+    """
+
+    record = Record
+    kinds: Tuple[str, ...] = ()
+
+    def __init__(self, ids: Optional[Dict[str, InternTable]] = None):
+        """
+        Initialize ColumnBatch
+
+        Args:
+            ids: Intern tables by field name, shared with other batches;
+                missing tables are added to it
+        """
+        self.ids = ids if ids is not None else {}
+        self.fields = self.record.__slots__
+        self._columns: List[Union[array, TextColumn]] = []
+        self._encoders = []
+        for name, kind in zip(self.fields, self.kinds):
+            if kind == ID:
+                self._columns.append(array('i'))
+                self._encoders.append(self.ids.setdefault(name, InternTable()).code)
+            elif kind == TEXT:
+                self._columns.append(TextColumn())
+                self._encoders.append(None)
+            else:
+                self._columns.append(array(kind))
+                self._encoders.append(None)
+
+    def append(self, *values):
+        """Add one record given its field values in slot order"""
+        if len(values) != len(self.fields):
+            raise TypeError(f'{type(self).__name__} records have {len(self.fields)} fields, got {len(values)}')
+        done = 0
+        try:
+            for column, encode, value in zip(self._columns, self._encoders, values):
+                column.append(encode(value) if encode else value)
+                done += 1
+        except BaseException:
+            # Keep the columns the same length when a value is rejected
+            for column in self._columns[:done]:
+                column.pop()
+            raise
+
+    def add(self, record: Record):
+        self.append(*(getattr(record, name) for name in self.fields))
+
+    def extend(self, rows: List[Union[Record, Dict[str, Any]]]):
+        """Add records or dicts keyed by field name"""
+        for row in rows:
+            if isinstance(row, Record):
+                self.add(row)
+            else:
+                self.append(*(row[name] for name in self.fields))
+
+    def column(self, name: str) -> Union[array, TextColumn]:
+        """The raw column; id columns hold codes into self.ids[name]"""
+        return self._columns[self.fields.index(name)]
+
+    def values(self, name: str) -> List[Any]:
+        """A column with ids decoded"""
+        column = self.column(name)
+        if self.kinds[self.fields.index(name)] == ID:
+            values = self.ids[name].values
+            return [values[code] for code in column]
+        return list(column)
+
+    def __len__(self) -> int:
+        return len(self._columns[0]) if self._columns else 0
+
+    def __getitem__(self, index: int) -> Record:
+        values = []
+        for name, kind, column in zip(self.fields, self.kinds, self._columns):
+            value = column[index]
+            values.append(self.ids[name].values[value] if kind == ID else value)
+        return self.record(*values)
+
+    def __iter__(self) -> Iterator[Record]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self]
+
+    def to_frame(self, copy: bool = False):
+        """
+        Build a pandas DataFrame of the batch
+
+        Numeric columns are numpy views of the arrays and id columns become
+        Categoricals over the intern tables, so without copy the frame adds
+        little memory; text columns are decoded into new strings. While
+        such a frame is alive the batch cannot grow (appending raises
+        BufferError); pass copy=True to detach it.
+        """
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for name, kind, column in zip(self.fields, self.kinds, self._columns):
+            if kind == TEXT:
+                data[name] = list(column)
+                continue
+            values = np.frombuffer(column, dtype=NUMPY_DTYPES[kind]) if len(column) else \
+                np.empty(0, dtype=NUMPY_DTYPES[kind])
+            if copy:
+                values = values.copy()
+            if kind == ID:
+                values = pd.Categorical.from_codes(values, categories=self.ids[name].values)
+            data[name] = values
+        return pd.DataFrame(data, copy=copy)
+
+
+class CommentBatch(ColumnBatch):
+    record = Comment
+    kinds = (TEXT, ID, ID, ID, INT, COUNT, COUNT, TEXT)
+
+    def add_graph(self, obj: Dict[str, Any], post_id: str, page_id: str):
+        """Add a Graph API comment object (id, from, message, created_time, like_count, comment_count)"""
+        self.append(obj['id'], post_id, page_id, (obj.get('from') or {}).get('id', ''),
+                    parse_graph_time(obj.get('created_time')), obj.get('like_count', 0),
+                    obj.get('comment_count', 0), obj.get('message', ''))
+
+
+class PostBatch(ColumnBatch):
+    record = Post
+    kinds = (TEXT, ID, INT, COUNT, COUNT, COUNT, TEXT)
+
+    def add_graph(self, obj: Dict[str, Any], page_id: str):
+        """Add a Graph API post object, reading counts from summary=true edges when present"""
+        self.append(obj['id'], page_id, parse_graph_time(obj.get('created_time')),
+                    _summary_count(obj, 'reactions') or _summary_count(obj, 'likes'),
+                    _summary_count(obj, 'comments'), (obj.get('shares') or {}).get('count', 0),
+                    obj.get('message', ''))
+
+
+class MetricBatch(ColumnBatch):
+    record = PageMetric
+    kinds = (ID, ID, INT, FLOAT)
+
+    def add_graph(self, obj: Dict[str, Any], page_id: str):
+        """Add every value of a Graph API insights metric ({'name', 'values': [...]})"""
+        for point in obj.get('values', []):
+            value = point.get('value')
+            if isinstance(value, (int, float)):
+                self.append(page_id, obj['name'], parse_graph_time(point.get('end_time')), float(value))
+
+
+def parse_graph_time(value: Optional[Union[str, int]]) -> int:
+    """Graph API timestamp (ISO 8601 or epoch seconds) to epoch seconds; 0 when missing"""
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.strptime(value, GRAPH_TIME_FORMAT).timestamp())
+
+
+def _summary_count(obj: Dict[str, Any], edge: str) -> int:
+    return ((obj.get(edge) or {}).get('summary') or {}).get('total_count', 0)
@@ -0,0 +1,213 @@
+"""
+Session Store
+Encrypted per-account persistence of login cookies and local storage
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Cookies that must be present for a Facebook session to be usable
+AUTH_COOKIES = ('c_user', 'xs')
+
+
+class SessionData:
+    """Saved login state for one account"""
+
+    def __init__(self, account: str, cookies: List[Dict[str, Any]],
+                 local_storage: Optional[Dict[str, str]] = None,
+                 saved_at: Optional[float] = None):
+        self.account = account
+        self.cookies = cookies
+        self.local_storage = local_storage or {}
+        self.saved_at = saved_at or time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'account': self.account,
+            'cookies': self.cookies,
+            'local_storage': self.local_storage,
+            'saved_at': self.saved_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SessionData':
+        return cls(data['account'], data.get('cookies', []),
+                   data.get('local_storage', {}), data.get('saved_at'))
+
+
+class SessionStore:
+    """Stores login sessions on disk, encrypted with Fernet"""
+
+    def __init__(self, store_dir: str = 'sessions', key: Optional[str] = None,
+                 key_path: str = '.session_key', max_age: int = 7 * 24 * 3600):
+        """
+        Initialize SessionStore
+
+        Args:
+            store_dir: Directory holding one encrypted file per account
+            key: Fernet key; defaults to SESSION_STORE_KEY or the key file
+            key_path: Key file created on first use when no key is configured
+            max_age: Maximum age in seconds before a saved session is discarded
+        """
+        self.store_dir = Path(store_dir)
+        self.key_path = Path(key_path)
+        self.max_age = max_age
+        self._fernet = Fernet(key or os.getenv('SESSION_STORE_KEY') or self._load_or_create_key())
+
+    @TRACER.traced('session_store.save')
+    def save(self, data: SessionData) -> bool:
+        """
+        Encrypt and save a session
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            os.chmod(self.store_dir, 0o700)
+
+            path = self._path(data.account)
+            tmp_path = path.with_suffix('.tmp')
+            token = self._fernet.encrypt(json.dumps(data.to_dict()).encode('utf-8'))
+            with open(tmp_path, 'wb') as f:
+                f.write(token)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, path)
+
+            logger.info(f"Saved session for {data.account} ({len(data.cookies)} cookies)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error saving session for {data.account}: {e}")
+            return False
+
+    @TRACER.traced('session_store.load')
+    def load(self, account: str) -> Optional[SessionData]:
+        """
+        Load a saved session
+
+        Returns:
+            SessionData if a readable, unexpired session exists, None otherwise
+        """
+        path = self._path(account)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                data = SessionData.from_dict(json.loads(self._fernet.decrypt(f.read())))
+        except (InvalidToken, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable session for {account}: {e}")
+            self.delete(account)
+            return None
+
+        if not self.is_valid(data):
+            logger.info(f"Saved session for {account} has expired")
+            self.delete(account)
+            return None
+
+        return data
+
+    def delete(self, account: str):
+        """Remove a saved session"""
+        self._path(account).unlink(missing_ok=True)
+
+    def is_valid(self, data: SessionData) -> bool:
+        """
+        Cheap local validity check, no network access
+
+        A session is valid when it is younger than max_age and all
+        authentication cookies are present and not expired.
+        """
+        now = time.time()
+        if now - data.saved_at > self.max_age:
+            return False
+
+        cookies = {cookie['name']: cookie for cookie in data.cookies}
+        for name in AUTH_COOKIES:
+            cookie = cookies.get(name)
+            if not cookie:
+                return False
+            expiry = cookie.get('expiry')
+            if expiry and expiry <= now:
+                return False
+
+        return True
+
+    @staticmethod
+    def capture(driver, account: str) -> SessionData:
+        """
+        Capture cookies and local storage from a WebDriver
+
+        Args:
+            driver: Selenium WebDriver currently on the site
+            account: Account the session belongs to
+        """
+        cookies = driver.get_cookies()
+        local_storage = driver.execute_script(
+            'var items = {};'
+            'for (var i = 0; i < localStorage.length; i++) {'
+            '  var k = localStorage.key(i); items[k] = localStorage.getItem(k);'
+            '}'
+            'return items;'
+        ) or {}
+        return SessionData(account, cookies, local_storage)
+
+    @staticmethod
+    def apply_to_driver(driver, data: SessionData, base_url: str):
+        """
+        Load a saved session into a WebDriver
+
+        The driver is navigated to base_url first since cookies and local
+        storage can only be set for the current origin.
+        """
+        driver.get(base_url)
+        for cookie in data.cookies:
+            cookie = dict(cookie)
+            if cookie.get('sameSite') not in (None, 'Strict', 'Lax', 'None'):
+                cookie.pop('sameSite')
+            try:
+                driver.add_cookie(cookie)
+            except Exception as e:
+                logger.debug(f"Skipping cookie {cookie.get('name')}: {e}")
+
+        for key, value in data.local_storage.items():
+            driver.execute_script('localStorage.setItem(arguments[0], arguments[1]);', key, value)
+
+        driver.refresh()
+
+    @staticmethod
+    def apply_to_requests(session, data: SessionData):
+        """Load saved cookies into a requests session"""
+        for cookie in data.cookies:
+            session.cookies.set(cookie['name'], cookie['value'],
+                                domain=cookie.get('domain', ''),
+                                path=cookie.get('path', '/'))
+
+    def _path(self, account: str) -> Path:
+        """Session file path; the account name is hashed so it is not exposed"""
+        digest = hashlib.sha256(account.lower().encode('utf-8')).hexdigest()[:32]
+        return self.store_dir / f'{digest}.session'
+
+    def _load_or_create_key(self) -> bytes:
+        """Read the key file, generating it with secure permissions if missing"""
+        if self.key_path.exists():
+            return self.key_path.read_bytes().strip()
+
+        key = Fernet.generate_key()
+        with open(self.key_path, 'wb') as f:
+            f.write(key)
+        os.chmod(self.key_path, 0o600)
+        logger.info(f"Generated session store key: {self.key_path}")
+        return key
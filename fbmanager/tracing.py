@@ -0,0 +1,491 @@
+"""
+Tracing Module
+Lightweight spans with per-stage latency percentiles and JSON/OTLP export
+
+The current span lives in a context variable, so nesting follows the
+call stack, asyncio tasks inherit it automatically and thread pools
+inherit it through Tracer.wrap(). Every finished span is recorded in a
+per-stage, per-account aggregate (p50/p95/p99) and, when exporters are
+configured, queued for a background thread that writes JSON lines or
+posts OTLP/HTTP JSON to a collector.
+
+Usage:
+    python -m fbmanager.tracing summary traces.jsonl
+    python -m fbmanager.tracing collect [--port 4318] [--output traces.jsonl]
+"""
+
+import asyncio
+import contextvars
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+# Sentinel meaning "use the current span as parent"
+_INHERIT = object()
+
+NO_ACCOUNT = '-'
+
+
+class Span:
+    """A timed stage of work"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'start_ns', 'end_ns', 'error')
+
+    def __init__(self, name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f'{random.getrandbits(128):032x}'
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent_id = parent.span_id if parent else None
+        if parent and 'account' not in attributes and 'account' in parent.attributes:
+            attributes['account'] = parent.attributes['account']
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class StageStats:
+    """Latency samples for one stage and account"""
+
+    __slots__ = ('count', 'total', 'max', 'errors', 'samples')
+
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+
+    def add(self, duration: float, error: bool):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.errors += error
+        self.samples.append(duration)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': _percentile(ordered, 50) * 1000,
+            'p95_ms': _percentile(ordered, 95) * 1000,
+            'p99_ms': _percentile(ordered, 99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class JSONFileExporter:
+    """Append finished spans to a JSON lines file"""
+
+    def __init__(self, path: str = 'traces.jsonl'):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+
+class OTLPExporter:
+    """Post finished spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint: str = 'http://127.0.0.1:4318/v1/traces', service_name: str = 'fbmanager',
+                 headers: Optional[Dict[str, str]] = None, timeout: float = 10):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        # Imported here so processes that only record spans skip loading requests
+        import requests
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+    def export(self, spans: List[Span]):
+        response = self.session.post(self.endpoint, json=self.encode(spans), timeout=self.timeout)
+        response.raise_for_status()
+
+    def encode(self, spans: List[Span]) -> Dict[str, Any]:
+        """Build an ExportTraceServiceRequest"""
+        return {'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': self.service_name})},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [{
+                    'traceId': span.trace_id,
+                    'spanId': span.span_id,
+                    'parentSpanId': span.parent_id or '',
+                    'name': span.name,
+                    'kind': 1,
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': _otlp_attributes(span.attributes),
+                    'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+                } for span in spans],
+            }],
+        }]}
+
+
+class Tracer:
+    """Creates spans, aggregates stage timings and feeds exporters"""
+
+    def __init__(self, exporters: Iterable = (), max_samples: int = 2048,
+                 batch_size: int = 256, flush_interval: float = 2.0, max_queue: int = 10000):
+        """
+        Initialize Tracer
+
+        Args:
+            exporters: Objects with an export(spans) method
+            max_samples: Latency samples kept per stage and account for percentiles
+            batch_size: Spans handed to exporters at once
+            flush_interval: Maximum seconds a finished span waits for export
+            max_queue: Finished spans buffered before new ones are dropped
+        """
+        self.exporters = list(exporters)
+        self.max_samples = max_samples
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._stats: Dict[Tuple[str, str], StageStats] = {}
+        self._stats_lock = threading.Lock()
+        # Holds spans, Events from flush() and None from shutdown()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def configure_from_env(self):
+        """Set exporters from TRACE_EXPORTER (comma-separated: json, otlp)"""
+        exporters = []
+        for name in os.getenv('TRACE_EXPORTER', '').split(','):
+            name = name.strip().lower()
+            if name == 'json':
+                exporters.append(JSONFileExporter(os.getenv('TRACE_FILE', 'traces.jsonl')))
+            elif name == 'otlp':
+                exporters.append(OTLPExporter(
+                    os.getenv('TRACE_OTLP_ENDPOINT', 'http://127.0.0.1:4318/v1/traces')))
+            elif name and name != 'none':
+                logger.warning(f"Unknown trace exporter: {name}")
+        self.exporters = exporters
+
+    def current(self) -> Optional[Span]:
+        """Return the active span of the calling context"""
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, parent: Any = _INHERIT, **attributes):
+        """
+        Time the enclosed block as a stage
+
+        Args:
+            name: Stage name, e.g. 'login' or 'graph.batch'
+            parent: Parent span; defaults to the current span. Pass a span
+                captured in another thread to link work done on its behalf.
+            **attributes: Span attributes; 'account' is inherited from the parent
+
+        Yields:
+            The new Span
+        """
+        if parent is _INHERIT:
+            parent = _current_span.get()
+        span = Span(name, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def traced(self, name: Optional[str] = None, **attributes) -> Callable:
+        """Decorator that runs a function (sync or async) in a span"""
+        def decorator(func):
+            stage = name or func.__qualname__
+
+            if asyncio.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(stage, **attributes):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, **attributes):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def wrap(func: Callable) -> Callable:
+        """Bind func to the caller's context so spans it opens on another thread nest correctly"""
+        context = contextvars.copy_context()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return context.copy().run(func, *args, **kwargs)
+        return wrapper
+
+    def _finish(self, span: Span):
+        key = (span.name, str(span.attributes.get('account') or NO_ACCOUNT))
+        with self._stats_lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StageStats(self.max_samples)
+            stats.add(span.duration, span.error is not None)
+
+        if self.exporters:
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Stage timing aggregates
+
+        Returns:
+            {stage: {account: {count, errors, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}}
+        """
+        with self._stats_lock:
+            items = list(self._stats.items())
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (stage, account), stats in sorted(items):
+            with self._stats_lock:
+                summary = stats.summary()
+            result.setdefault(stage, {})[account] = summary
+        return result
+
+    def format_stats(self) -> str:
+        """Render stats() as a table, slowest p95 first"""
+        return format_table(self.stats())
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+    def flush(self, timeout: float = 10.0):
+        """Wait until queued spans have been exported"""
+        if self._worker:
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait(timeout)
+
+    def shutdown(self):
+        """Export remaining spans and stop the export thread"""
+        if self._worker:
+            self._queue.put(None)
+            self._worker.join(timeout=10)
+            self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._export_loop, name='trace-export', daemon=True)
+                    self._worker.start()
+
+    def _export_loop(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = False
+
+            if isinstance(item, Span):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+            if batch:
+                self._export(batch)
+                batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _export(self, batch: List[Span]):
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                logger.warning(f"Failed to export {len(batch)} spans with {type(exporter).__name__}: {e}")
+
+
+TRACER = Tracer()
+
+
+def format_table(stats: Dict[str, Dict[str, Dict[str, float]]]) -> str:
+    rows = [(stage, account, s) for stage, accounts in stats.items() for account, s in accounts.items()]
+    rows.sort(key=lambda row: -row[2]['p95_ms'])
+    lines = [f"{'stage':<28} {'account':<24} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}"]
+    for stage, account, s in rows:
+        lines.append(f"{stage:<28} {account[:24]:<24} {s['count']:>7} {s['p50_ms']:>7.1f}ms "
+                     f"{s['p95_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {s['errors']:>7}")
+    return '\n'.join(lines)
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not ordered:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {'boolValue': value}
+        elif isinstance(value, int):
+            typed = {'intValue': str(value)}
+        elif isinstance(value, float):
+            typed = {'doubleValue': value}
+        else:
+            typed = {'stringValue': str(value)}
+        encoded.append({'key': key, 'value': typed})
+    return encoded
+
+
+def _from_otlp(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten an OTLP/JSON request into the JSON lines span format"""
+    spans = []
+    for resource_spans in payload.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for span in scope_spans.get('spans', []):
+                start, end = int(span['startTimeUnixNano']), int(span['endTimeUnixNano'])
+                attributes = {a['key']: next(iter(a['value'].values())) for a in span.get('attributes', [])}
+                status = span.get('status', {})
+                spans.append({
+                    'name': span['name'],
+                    'trace_id': span['traceId'],
+                    'span_id': span['spanId'],
+                    'parent_id': span.get('parentSpanId') or None,
+                    'start_ns': start,
+                    'end_ns': end,
+                    'duration_ms': (end - start) / 1e6,
+                    'attributes': attributes,
+                    'error': status.get('message') if status.get('code') == 2 else None,
+                })
+    return spans
+
+
+def summarize_file(path: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Compute stage percentiles from a JSON lines trace file"""
+    stats: Dict[Tuple[str, str], StageStats] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            key = (span['name'], str(span['attributes'].get('account') or NO_ACCOUNT))
+            stats.setdefault(key, StageStats(1_000_000)).add(span['duration_ms'] / 1000, bool(span['error']))
+
+    result: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for (stage, account), stage_stats in sorted(stats.items()):
+        result.setdefault(stage, {})[account] = stage_stats.summary()
+    return result
+
+
+def serve_collector(port: int = 4318, output: str = 'traces.jsonl', addr: str = '127.0.0.1'):
+    """
+    Minimal stand-in for an OTLP/HTTP collector
+
+    Accepts JSON-encoded POST /v1/traces and appends the spans to output
+    in the same JSON lines format as JSONFileExporter.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    lock = threading.Lock()
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/v1/traces':
+                self.send_error(404)
+                return
+            try:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                spans = _from_otlp(json.loads(body))
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+            with lock, open(output, 'a', encoding='utf-8') as f:
+                for span in spans:
+                    f.write(json.dumps(span) + '\n')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), CollectorHandler)
+    print(f"Collecting spans on http://{addr}:{port}/v1/traces into {output}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Trace tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+    summary_parser = sub.add_parser('summary', help='Stage percentiles from a trace file')
+    summary_parser.add_argument('path', nargs='?', default='traces.jsonl')
+    collect_parser = sub.add_parser('collect', help='Run a local OTLP/HTTP collector stand-in')
+    collect_parser.add_argument('--port', type=int, default=4318)
+    collect_parser.add_argument('--output', default='traces.jsonl')
+    args = parser.parse_args()
+
+    if args.command == 'summary':
+        print(format_table(summarize_file(args.path)))
+    else:
+        serve_collector(args.port, args.output)
@@ -0,0 +1,376 @@
+"""
+Uploads Module
+Chunked, resumable, parallel uploads of large media files
+
+Files are memory-mapped and sent in fixed-size chunks by a pool of
+workers sharing one pooled HTTP session. Progress is saved after every
+chunk, so an interrupted upload resumes with the chunks that are still
+missing. Each chunk carries its SHA-256 and the upload is finished with
+a checksum over all chunk digests, which the server checks before
+accepting the file.
+"""
+
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import Counter, Histogram
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SECONDS = Histogram('fbmanager_upload_chunk_seconds', 'Time to send one upload chunk')
+UPLOADED_BYTES = Counter('fbmanager_upload_bytes_total', 'Bytes sent by the upload pipeline')
+CHUNK_RETRIES = Counter('fbmanager_upload_chunk_retries_total', 'Upload chunks that were retried')
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised when an upload cannot be completed"""
+
+
+class UploadState:
+    """Progress of one upload, persisted as JSON between attempts"""
+
+    def __init__(self, path: str, size: int, mtime_ns: int, chunk_size: int, target: str,
+                 upload_id: Optional[str] = None, digests: Optional[Dict[str, str]] = None,
+                 handle: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.chunk_size = chunk_size
+        self.target = target
+        self.upload_id = upload_id
+        # Chunk index (as a string, for JSON) -> SHA-256 of chunks the server confirmed
+        self.digests = digests or {}
+        # File handle returned by protocols that publish by handle
+        self.handle = handle
+
+    @property
+    def chunk_count(self) -> int:
+        return max(1, -(-self.size // self.chunk_size))
+
+    def missing(self) -> List[int]:
+        return [i for i in range(self.chunk_count) if str(i) not in self.digests]
+
+    def checksum(self) -> str:
+        """SHA-256 over the concatenated chunk digests, in chunk order"""
+        combined = hashlib.sha256()
+        for i in range(self.chunk_count):
+            combined.update(bytes.fromhex(self.digests[str(i)]))
+        return combined.hexdigest()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UploadState':
+        return cls(**data)
+
+
+class ChunkedHTTPProtocol:
+    """
+    Generic parallel chunk protocol
+
+        POST {base}/uploads                      start, returns {"upload_id"}
+        GET  {base}/uploads/{id}                 {"received": {index: sha256}}
+        PUT  {base}/uploads/{id}/chunks/{index}  body is the chunk, X-Chunk-SHA256
+        POST {base}/uploads/{id}/complete        {"sha256": checksum}, returns the result
+    """
+
+    parallel = True
+
+    def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 120):
+        self.base_url = base_url.rstrip('/')
+        self.headers = headers or {}
+        self.timeout = timeout
+
+    def start(self, session: requests.Session, state: UploadState) -> str:
+        response = session.post(f'{self.base_url}/uploads', headers=self.headers, timeout=self.timeout, json={
+            'file_name': Path(state.path).name,
+            'size': state.size,
+            'chunk_size': state.chunk_size,
+            'chunks': state.chunk_count,
+        })
+        response.raise_for_status()
+        return response.json()['upload_id']
+
+    def received(self, session: requests.Session, state: UploadState) -> Optional[Dict[str, str]]:
+        """Chunks the server holds, or None if it no longer knows the upload"""
+        response = session.get(f'{self.base_url}/uploads/{state.upload_id}', headers=self.headers,
+                               timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return {str(i): digest for i, digest in response.json()['received'].items()}
+
+    def send_chunk(self, session: requests.Session, state: UploadState, index: int, offset: int,
+                   data: bytes, digest: str):
+        response = session.put(f'{self.base_url}/uploads/{state.upload_id}/chunks/{index}',
+                               data=data, timeout=self.timeout,
+                               headers=dict(self.headers, **{
+                                   'Content-Type': 'application/octet-stream',
+                                   'X-Chunk-Offset': str(offset),
+                                   'X-Chunk-SHA256': digest,
+                               }))
+        response.raise_for_status()
+        if response.json().get('sha256') != digest:
+            raise UploadError(f'Server checksum mismatch for chunk {index}')
+
+    def finish(self, session: requests.Session, state: UploadState) -> Dict[str, Any]:
+        checksum = state.checksum()
+        response = session.post(f'{self.base_url}/uploads/{state.upload_id}/complete',
+                                headers=self.headers, timeout=self.timeout, json={'sha256': checksum})
+        response.raise_for_status()
+        result = response.json()
+        if result.get('sha256') != checksum:
+            raise UploadError('Server checksum mismatch for the whole file')
+        return result
+
+
+class FacebookResumableProtocol:
+    """
+    Graph API Resumable Upload API (returns a file handle for publishing)
+
+    The API accepts bytes strictly in order, so chunks are sent one at a
+    time; resuming asks the server for its current file_offset.
+    """
+
+    parallel = False
+
+    def __init__(self, app_id: str, access_token: str, api_version: str = 'v19.0',
+                 base_url: str = 'https://graph.facebook.com', timeout: float = 120):
+        self.app_id = app_id
+        self.access_token = access_token
+        self.base_url = f'{base_url.rstrip("/")}/{api_version}'
+        self.timeout = timeout
+
+    def start(self, session: requests.Session, state: UploadState) -> str:
+        response = session.post(f'{self.base_url}/{self.app_id}/uploads', timeout=self.timeout, params={
+            'file_name': Path(state.path).name,
+            'file_length': state.size,
+            'file_type': _mime_type(state.path),
+            'access_token': self.access_token,
+        })
+        response.raise_for_status()
+        return response.json()['id']
+
+    def received(self, session: requests.Session, state: UploadState) -> Optional[Dict[str, str]]:
+        response = session.get(f'{self.base_url}/{state.upload_id}', timeout=self.timeout,
+                               headers={'Authorization': f'OAuth {self.access_token}'})
+        if response.status_code in (400, 404):
+            return None
+        response.raise_for_status()
+        offset = int(response.json().get('file_offset', 0))
+        # Keep local digests for the chunks below the server's offset
+        return {key: digest for key, digest in state.digests.items()
+                if (int(key) + 1) * state.chunk_size <= offset or offset >= state.size}
+
+    def send_chunk(self, session: requests.Session, state: UploadState, index: int, offset: int,
+                   data: bytes, digest: str):
+        response = session.post(f'{self.base_url}/{state.upload_id}', data=data, timeout=self.timeout,
+                                headers={'Authorization': f'OAuth {self.access_token}',
+                                         'file_offset': str(offset)})
+        response.raise_for_status()
+        handle = response.json().get('h')
+        if handle:
+            state.handle = handle
+
+    def finish(self, session: requests.Session, state: UploadState) -> Dict[str, Any]:
+        if not state.handle:
+            raise UploadError('Upload finished without a file handle')
+        return {'h': state.handle, 'sha256': state.checksum()}
+
+
+class ChunkedUploader:
+    """Uploads files in parallel chunks and resumes interrupted uploads"""
+
+    def __init__(self, session: Optional[requests.Session] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_workers: int = 4, state_dir: str = 'uploads', max_retries: int = 5,
+                 backoff: float = 1.0):
+        """
+        Initialize ChunkedUploader
+
+        Args:
+            session: HTTP session to send chunks with, used as is; give it a
+                connection pool of at least max_workers. By default a
+                dedicated session with such a pool is created
+            chunk_size: Bytes per chunk
+            max_workers: Chunks sent in parallel
+            state_dir: Directory for progress files of unfinished uploads
+            max_retries: Attempts per chunk before the upload fails
+            backoff: Initial delay between chunk retries, doubled per attempt
+        """
+        if session is None:
+            # Only our own session gets an adapter; a caller's keeps its retry and pool settings
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.state_dir = Path(state_dir)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'ChunkedUploader':
+        kwargs.setdefault('chunk_size', int(os.getenv('UPLOAD_CHUNK_MB', '8')) * 1024 * 1024)
+        kwargs.setdefault('max_workers', int(os.getenv('UPLOAD_WORKERS', '4')))
+        kwargs.setdefault('state_dir', os.getenv('UPLOAD_STATE_DIR', 'uploads'))
+        return cls(**kwargs)
+
+    def upload(self, path: str, protocol, target: Optional[str] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Upload a file, resuming earlier progress for the same file and target
+
+        Args:
+            path: File to upload
+            protocol: ChunkedHTTPProtocol, FacebookResumableProtocol or compatible
+            target: Identifies the destination in the progress file; defaults
+                to the protocol's base URL
+            on_progress: Called with (bytes confirmed, total bytes) after each chunk
+
+        Returns:
+            The protocol's result for the finished upload
+
+        Raises:
+            UploadError: If a chunk keeps failing or checksums do not match
+        """
+        target = target or getattr(protocol, 'base_url', type(protocol).__name__)
+        with TRACER.span('upload', file=Path(path).name):
+            state = self._load_state(path, target)
+            size = state.size
+
+            with open(path, 'rb') as f, (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                                          if size else _EmptyMap()) as data:
+                if state.upload_id:
+                    received = protocol.received(self.session, state)
+                    if received is None:
+                        logger.info(f"Upload session for {path} expired, starting over")
+                        state.upload_id = None
+                        state.digests = {}
+                    else:
+                        state.digests = {k: v for k, v in state.digests.items() if received.get(k) == v}
+
+                if not state.upload_id:
+                    state.upload_id = protocol.start(self.session, state)
+                    self._save_state(state)
+                else:
+                    logger.info(f"Resuming upload of {path}: "
+                                f"{state.chunk_count - len(state.missing())}/{state.chunk_count} chunks done")
+
+                self._send_missing(state, protocol, data, on_progress)
+
+            with TRACER.span('upload.finish'):
+                result = protocol.finish(self.session, state)
+            self._state_path(state.path, target).unlink(missing_ok=True)
+            logger.info(f"Uploaded {path} ({size} bytes in {state.chunk_count} chunks)")
+            return result
+
+    def _send_missing(self, state: UploadState, protocol, data, on_progress):
+        missing = state.missing()
+        workers = self.max_workers if protocol.parallel else 1
+        done_bytes = [state.size - sum(self._chunk_length(state, i) for i in missing)]
+
+        def send(index: int):
+            offset = index * state.chunk_size
+            chunk = data[offset:offset + state.chunk_size]
+            digest = hashlib.sha256(chunk).hexdigest()
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    with CHUNK_SECONDS.time():
+                        protocol.send_chunk(self.session, state, index, offset, chunk, digest)
+                    break
+                except (requests.RequestException, UploadError) as e:
+                    if attempt == self.max_retries:
+                        raise UploadError(f'Chunk {index} failed after {attempt} attempts: {e}') from e
+                    CHUNK_RETRIES.inc()
+                    logger.warning(f"Chunk {index} of {state.path} failed, retrying: {e}")
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            UPLOADED_BYTES.inc(len(chunk))
+            with self._lock:
+                state.digests[str(index)] = digest
+                done_bytes[0] += len(chunk)
+                self._save_state(state)
+                progress = done_bytes[0]
+            if on_progress:
+                on_progress(progress, state.size)
+
+        if workers == 1:
+            for index in missing:
+                send(index)
+            return
+
+        with ThreadPoolExecutor(workers, thread_name_prefix='upload') as executor:
+            futures = [executor.submit(TRACER.wrap(send), index) for index in missing]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    @staticmethod
+    def _chunk_length(state: UploadState, index: int) -> int:
+        return min(state.chunk_size, state.size - index * state.chunk_size)
+
+    def _state_path(self, path: str, target: str) -> Path:
+        key = hashlib.sha256(f'{os.path.abspath(path)}\0{target}'.encode('utf-8')).hexdigest()[:24]
+        return self.state_dir / f'{key}.json'
+
+    def _load_state(self, path: str, target: str) -> UploadState:
+        """Load saved progress if it belongs to the same, unchanged file"""
+        stat = os.stat(path)
+        state_path = self._state_path(path, target)
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = UploadState.from_dict(json.load(f))
+            if (state.size, state.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                return state
+            logger.info(f"{path} changed since the last attempt, starting over")
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable upload state {state_path}: {e}")
+        return UploadState(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, self.chunk_size, target)
+
+    def _save_state(self, state: UploadState):
+        """Write progress atomically (caller holds the lock when workers run)"""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        state_path = self._state_path(state.path, state.target)
+        tmp_path = state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp_path, state_path)
+
+
+class _EmptyMap(bytes):
+    """Stand-in for mmap of an empty file, which mmap refuses to map"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _mime_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
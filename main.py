@@ -8,30 +8,34 @@ import os
 import sys
 import logging
 from pathlib import Path
+from urllib.parse import urljoin
+import requests
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from fbmanager.browser import BrowserPool
+from fbmanager.config_watch import ConfigWatcher
+from fbmanager.event_queue import EventConsumer
+from fbmanager.media import MediaPreprocessor
+from fbmanager.metrics import Counter, Gauge, Histogram, start_http_server
+from fbmanager.profiling import PROFILER
+from fbmanager.publishing import Publisher
+from fbmanager.tracing import TRACER
+from fbmanager.proxy_pool import NoHealthyProxyError, ProxyPool
+from fbmanager.session_store import SessionStore
+from fbmanager.uploads import ChunkedUploader
 
-# Configure logging
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-LOG_FILE = os.getenv('LOG_FILE', '/var/log/fbmanager/app.log')
+logger = logging.getLogger(__name__)
 
-# Create logs directory if it doesn't exist
-log_dir = Path(LOG_FILE).parent
-log_dir.mkdir(parents=True, exist_ok=True)
+TASK_SECONDS = Histogram('fbmanager_task_seconds', 'FB Manager task duration', ['task'])
+TASKS_TOTAL = Counter('fbmanager_tasks_total', 'FB Manager tasks by outcome', ['task', 'status'])
+TASKS_IN_PROGRESS = Gauge('fbmanager_tasks_in_progress', 'FB Manager tasks currently running')
 
-# Setup logging
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Defaults for FACEBOOK_URL and FACEBOOK_MOBILE_URL (overridden for load tests)
+FACEBOOK_URL = 'https://www.facebook.com/'
+FACEBOOK_MOBILE_URL = 'https://m.facebook.com/'
 
-logger = logging.getLogger(__name__)
+# Settings read once when their component starts; changes need a restart
+RESTART_PREFIXES = ('PROXY_', 'BROWSER_', 'SESSION_', 'METRICS_', 'CONFIG_NOTIFY_')
 
 
 class FBManager:
@@ -41,9 +45,164 @@ class FBManager:
         self.fb_email = os.getenv('FB_EMAIL')
         self.fb_password = os.getenv('FB_PASSWORD')
         self.debug = os.getenv('DEBUG', 'False').lower() == 'true'
+        self.facebook_url = os.getenv('FACEBOOK_URL') or FACEBOOK_URL
+        self.login_url = urljoin(self.facebook_url, 'login/')
+        # Redirects to the login page when the session is no longer valid
+        self.session_check_url = urljoin(os.getenv('FACEBOOK_MOBILE_URL') or FACEBOOK_MOBILE_URL, 'home.php')
         
         if not self.fb_email or not self.fb_password:
             logger.warning("Facebook credentials not configured in .env file")
+        
+        self.http = requests.Session()
+        self.session_store = SessionStore(os.getenv('SESSION_DIR', 'sessions'))
+        self.session_data = None
+        
+        # Both the HTTP session and the browsers draw from the proxy pool;
+        # the session re-selects per request and reports every outcome
+        self.proxy_pool = ProxyPool.from_env()
+        if self.proxy_pool:
+            self.proxy_pool.apply_to_session(self.http, self.fb_email)
+        
+        # Large media goes up in parallel, resumable chunks over a dedicated
+        # session, routed through the account's proxy like the rest
+        self.uploader = ChunkedUploader.from_env()
+        if self.proxy_pool:
+            self.proxy_pool.apply_to_session(self.uploader.session, self.fb_email,
+                                             pool_connections=self.uploader.max_workers,
+                                             pool_maxsize=self.uploader.max_workers)
+        # Resizing and re-encoding run in worker processes, started on first use
+        self.media = MediaPreprocessor.from_env()
+        
+        self.browser_pool = BrowserPool.from_env(on_create=self._restore_browser_session,
+                                                 proxy_pool=self.proxy_pool,
+                                                 account=self.fb_email)
+        
+        self.config_watcher = ConfigWatcher.from_env(self.on_config_change)
+        
+        # Realtime updates pushed to the admin app's webhook receiver
+        self.webhook_consumer = EventConsumer.from_env(self.handle_webhook_events)
+        
+        # Scheduled posts queued through the admin API
+        self.publisher = Publisher.from_env()
+    
+    def handle_webhook_events(self, events):
+        """Process a batch of webhook events (comments, messages, ...)"""
+        by_field = {}
+        for event in events:
+            by_field.setdefault(event['field'], []).append(event)
+        
+        for field, field_events in by_field.items():
+            logger.info(f"Received {len(field_events)} '{field}' webhook events")
+            # Your handling per field here, e.g. reply to new comments
+    
+    def upload_media(self, paths, protocol):
+        """Preprocess media files and upload each one as soon as it is ready"""
+        results = self.run_task('upload_media', self.media.pipeline, paths,
+                                lambda item: self.uploader.upload(item['output'], protocol))
+        failed = [item for item in results if 'error' in item]
+        for item in failed:
+            logger.error(f"Could not upload {item['source']}: {item['error']}")
+        logger.info(f"Uploaded {len(results) - len(failed)}/{len(results)} media files")
+        return results
+    
+    def on_config_change(self, keys):
+        """Pick up changed settings that can be applied while running"""
+        if 'FB_EMAIL' in keys or 'FB_PASSWORD' in keys:
+            self.fb_email = os.getenv('FB_EMAIL')
+            self.fb_password = os.getenv('FB_PASSWORD')
+            logger.info("Facebook credentials updated")
+        if 'DEBUG' in keys:
+            self.debug = os.getenv('DEBUG', 'False').lower() == 'true'
+        if 'LOG_LEVEL' in keys:
+            logging.getLogger().setLevel(getattr(logging, os.getenv('LOG_LEVEL', 'INFO')))
+        if any(key.startswith('PROFILE_') for key in keys):
+            PROFILER.configure_from_env()
+        
+        pending = [key for key in keys if key.startswith(RESTART_PREFIXES)]
+        if pending:
+            logger.warning(f"Restart FB Manager to apply: {', '.join(pending)}")
+    
+    def run_task(self, name: str, func, *args, **kwargs):
+        """Run a task, recording its duration and outcome"""
+        TASKS_IN_PROGRESS.inc()
+        capture = PROFILER.start('task', name) if PROFILER.enabled else None
+        try:
+            with TASK_SECONDS.time(task=name), TRACER.span(name, account=self.fb_email or ''):
+                result = func(*args, **kwargs)
+        except Exception:
+            TASKS_TOTAL.labels(task=name, status='error').inc()
+            raise
+        finally:
+            TASKS_IN_PROGRESS.dec()
+            if capture:
+                PROFILER.stop(capture)
+        
+        TASKS_TOTAL.labels(task=name, status='success' if result is not False else 'failed').inc()
+        return result
+    
+    def login(self) -> bool:
+        """Restore the saved session, falling back to a full browser login"""
+        with TRACER.span('login.restore'):
+            data = self.session_store.load(self.fb_email)
+            live = False
+            if data:
+                SessionStore.apply_to_requests(self.http, data)
+                live = self._session_is_live()
+        
+        if data:
+            if live:
+                self.session_data = data
+                logger.info("Restored saved session, skipping login")
+                return True
+            
+            logger.info("Saved session rejected by server, logging in again")
+            self.session_store.delete(self.fb_email)
+            self.http.cookies.clear()
+        
+        return self._full_login()
+    
+    @TRACER.traced('login.check_session')
+    def _session_is_live(self) -> bool:
+        """Check the session with a single lightweight request"""
+        try:
+            response = self.http.get(self.session_check_url, allow_redirects=False, timeout=10)
+        except NoHealthyProxyError:
+            # Says nothing about the session; keep it and let the caller retry later
+            raise
+        except requests.RequestException as e:
+            logger.warning(f"Session check failed: {e}")
+            return False
+        return response.status_code == 200
+    
+    @TRACER.traced('login.browser')
+    def _full_login(self) -> bool:
+        """Log in through the browser and persist the resulting session"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        try:
+            with self.browser_pool.driver() as driver:
+                driver.get(self.login_url)
+                driver.find_element(By.NAME, 'email').send_keys(self.fb_email)
+                driver.find_element(By.NAME, 'pass').send_keys(self.fb_password)
+                driver.find_element(By.NAME, 'login').click()
+                WebDriverWait(driver, self.browser_pool.timeout).until(
+                    lambda d: d.get_cookie('c_user'))
+                data = SessionStore.capture(driver, self.fb_email)
+        except Exception as e:
+            logger.error(f"Login failed: {e}")
+            return False
+        
+        self.session_store.save(data)
+        SessionStore.apply_to_requests(self.http, data)
+        self.session_data = data
+        logger.info("Logged in successfully")
+        return True
+    
+    def _restore_browser_session(self, driver):
+        """Load the current session into a newly started browser"""
+        if self.session_data:
+            SessionStore.apply_to_driver(driver, self.session_data, self.facebook_url)
     
     def run(self):
         """Main application logic"""
@@ -54,6 +213,18 @@ class FBManager:
             # Your main application logic here
             logger.info("FB Manager is running...")
             
+            if self.proxy_pool:
+                self.proxy_pool.start()
+            if self.config_watcher:
+                self.config_watcher.start()
+            if self.webhook_consumer:
+                self.webhook_consumer.start()
+            if self.publisher:
+                self.publisher.start()
+            
+            if self.fb_email and self.fb_password:
+                self.run_task('login', self.login)
+            
             # Example: Keep the application running
             # while True:
             #     # Your automation tasks
@@ -66,20 +237,67 @@ class FBManager:
         except Exception as e:
             logger.error(f"Error in FB Manager: {e}", exc_info=True)
             raise
+        finally:
+            if self.config_watcher:
+                self.config_watcher.stop()
+            if self.webhook_consumer:
+                self.webhook_consumer.stop()
+            if self.publisher:
+                self.publisher.stop()
+            self.browser_pool.close()
+            self.media.close()
+            if self.proxy_pool:
+                self.proxy_pool.stop()
+
+
+def setup_logging():
+    """Configure file and console logging from LOG_LEVEL and LOG_FILE"""
+    log_level = os.getenv('LOG_LEVEL', 'INFO')
+    log_file = os.getenv('LOG_FILE', '/var/log/fbmanager/app.log')
+    
+    # Create logs directory if it doesn't exist
+    log_dir = Path(log_file).parent
+    log_dir.mkdir(parents=True, exist_ok=True)
+    
+    logging.basicConfig(
+        level=getattr(logging, log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
 
 
 def main():
     """Entry point"""
+    # Load environment variables and configure logging only when run, not on import
+    load_dotenv()
+    setup_logging()
+    
     logger.info("=" * 50)
     logger.info("FB Manager - Facebook Management Tool")
     logger.info("=" * 50)
     
+    PROFILER.configure_from_env()
+    TRACER.configure_from_env()
+    
+    metrics_port = os.getenv('METRICS_PORT', '')
+    if metrics_port:
+        start_http_server(int(metrics_port))
+    
     try:
-        manager = FBManager()
-        manager.run()
+        with TRACER.span('main'):
+            with TRACER.span('init'):
+                manager = FBManager()
+            manager.run()
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        TRACER.shutdown()
+        if TRACER.stats():
+            logger.info(f"Stage timings:\n{TRACER.format_stats()}")
 
 
 if __name__ == '__main__':
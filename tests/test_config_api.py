@@ -0,0 +1,71 @@
+"""
+Config API Tests
+PATCH /admin/api/config requires If-Match and rejects stale versions
+"""
+
+import pytest
+
+import app as app_module
+
+TOKEN = 'test-api-token'
+AUTH = {'Authorization': f'Bearer {TOKEN}'}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    env_path = tmp_path / '.env'
+    env_path.write_text('FB_EMAIL=user@example.com\nFB_PASSWORD=secret\nHEADLESS=true\n')
+    monkeypatch.setenv('CONFIG_API_TOKEN', TOKEN)
+    monkeypatch.setenv('ENV_PATH', str(env_path))
+    monkeypatch.setenv('ADMIN_CREDENTIALS_PATH', str(tmp_path / '.admin_credentials'))
+    monkeypatch.setenv('PUBLISH_QUEUE_DB', str(tmp_path / 'publish_queue.db'))
+    monkeypatch.setenv('WEBHOOK_QUEUE_DB', str(tmp_path / 'webhook_events.db'))
+    monkeypatch.delenv('CONFIG_NOTIFY_PORT', raising=False)
+    monkeypatch.delenv('CONFIG_NOTIFY_URL', raising=False)
+    return app_module.create_app().test_client()
+
+
+def test_patch_without_if_match_is_428(client):
+    response = client.patch('/admin/api/config', json={'HEADLESS': False}, headers=AUTH)
+
+    assert response.status_code == 428
+    assert response.json['success'] is False
+
+
+def test_patch_with_current_etag_updates(client):
+    etag = client.get('/admin/api/config', headers=AUTH).headers['ETag']
+
+    response = client.patch('/admin/api/config', json={'HEADLESS': False},
+                            headers={**AUTH, 'If-Match': etag})
+
+    assert response.status_code == 200
+    assert response.json['updated'] == ['HEADLESS']
+    assert response.headers['ETag'] != etag
+    assert client.get('/admin/api/config', headers=AUTH).json['config']['HEADLESS'] == 'false'
+
+
+def test_patch_with_stale_etag_is_412_with_current_etag(client):
+    stale = client.get('/admin/api/config', headers=AUTH).headers['ETag']
+    current = client.patch('/admin/api/config', json={'HEADLESS': False},
+                           headers={**AUTH, 'If-Match': stale}).headers['ETag']
+
+    response = client.patch('/admin/api/config', json={'HEADLESS': True},
+                            headers={**AUTH, 'If-Match': stale})
+
+    assert response.status_code == 412
+    assert response.headers['ETag'] == current
+    assert client.get('/admin/api/config', headers=AUTH).json['config']['HEADLESS'] == 'false'
+
+
+def test_patch_with_wildcard_overwrites(client):
+    response = client.patch('/admin/api/config', json={'HEADLESS': False},
+                            headers={**AUTH, 'If-Match': '*'})
+
+    assert response.status_code == 200
+    assert client.get('/admin/api/config', headers=AUTH).json['config']['HEADLESS'] == 'false'
+
+
+def test_non_ascii_token_is_401(client):
+    response = client.get('/admin/api/config', headers={'Authorization': 'Bearer tést'})
+
+    assert response.status_code == 401
@@ -0,0 +1,105 @@
+"""
+Graph API Client Tests
+Batched reads are demultiplexed to their callers, and timed-out or 5xx
+operations are retried on their own
+"""
+
+import json
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from fbmanager.graph_api import GraphAPIClient, GraphAPIError
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+
+class FakeSession:
+    """Answers batch POSTs per operation and records individual GETs"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.batches = []
+        self.gets = []
+
+    def post(self, url, data=None, timeout=None):
+        operations = json.loads(data['batch'])
+        self.batches.append([op['relative_url'] for op in operations])
+        return FakeResponse(200, [self.answer(op['relative_url']) for op in operations])
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        path = urlsplit(url).path.split('/', 2)[2]
+        self.gets.append(path)
+        return FakeResponse(200, {'id': path, 'single': True})
+
+
+def ok(relative_url):
+    path, _, query = relative_url.partition('?')
+    return {'code': 200, 'body': json.dumps({'id': path, 'query': dict(parse_qsl(query))})}
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(answer=ok):
+        session = FakeSession(answer)
+        client = GraphAPIClient('token', session=session, batch_window=0.5, max_batch_size=10)
+        clients.append(client)
+        return client, session
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_batch_results_reach_their_callers(make_client):
+    client, session = make_client()
+
+    futures = [client.get(f'{i}/insights', {'metric': f'm{i}'}) for i in range(25)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [r['id'] for r in results] == [f'{i}/insights' for i in range(25)]
+    assert [r['query'] for r in results] == [{'metric': f'm{i}'} for i in range(25)]
+    assert [len(batch) for batch in session.batches] == [10, 10, 5]
+    assert session.gets == []
+
+
+def test_error_result_fails_only_its_caller(make_client):
+    def answer(relative_url):
+        if relative_url.startswith('bad'):
+            return {'code': 400, 'body': json.dumps({'error': {'message': 'Unsupported get request', 'code': 100}})}
+        return ok(relative_url)
+
+    client, _ = make_client(answer)
+
+    futures = [client.get(path) for path in ('a', 'bad', 'b')]
+    client.flush()
+
+    assert futures[0].result(timeout=5)['id'] == 'a'
+    with pytest.raises(GraphAPIError) as excinfo:
+        futures[1].result(timeout=5)
+    assert excinfo.value.code == 100
+    assert futures[2].result(timeout=5)['id'] == 'b'
+
+
+def test_null_and_5xx_results_are_retried_individually(make_client):
+    def answer(relative_url):
+        if relative_url == 'timed-out':
+            return None
+        if relative_url == 'server-error':
+            return {'code': 500, 'body': json.dumps({'error': {'message': 'Internal error', 'code': 1}})}
+        return ok(relative_url)
+
+    client, session = make_client(answer)
+
+    results = client.get_many(['a', 'timed-out', 'b', 'server-error'])
+
+    assert [r['id'] for r in results] == ['a', 'timed-out', 'b', 'server-error']
+    assert results[1]['single'] and results[3]['single']
+    assert 'single' not in results[0]
+    assert sorted(session.gets) == ['server-error', 'timed-out']
@@ -0,0 +1,39 @@
+"""
+Metrics Tests
+Per-thread shards stay bounded when many short-lived threads record
+"""
+
+import threading
+
+from fbmanager.metrics import Counter, Histogram, Registry
+
+
+def _run_threads(target, count: int):
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+
+def test_counter_shards_bounded_and_totals_kept():
+    counter = Counter('test_requests_total', 'Requests', ['route'], registry=Registry())
+    child = counter.labels(route='/')
+
+    _run_threads(lambda: child.inc(2), 2000)
+
+    assert child.value == 4000
+    assert len(child._values) <= 1
+    assert 'test_requests_total{route="/"} 4000' in counter.collect()
+
+
+def test_histogram_shards_bounded_and_totals_kept():
+    histogram = Histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1.0), registry=Registry())
+    child = histogram.labels()
+
+    _run_threads(lambda: child.observe(0.5), 500)
+
+    counts, total, count = child.snapshot()
+    assert counts == [0, 500, 0]
+    assert total == 250
+    assert count == 500
+    assert len(child._values) <= 1
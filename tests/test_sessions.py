@@ -0,0 +1,125 @@
+"""
+Session Tests
+Server-side sessions get a new id on login, can be revoked per user and
+expire after ttl seconds without activity
+"""
+
+import time
+
+import pytest
+from flask import Flask, jsonify, session
+
+from config_manager import sessions
+from config_manager.routes import config_bp
+from config_manager.sessions import ServerSideSessionInterface, init_session_backend
+
+COOKIE = 'session'
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def app(request, tmp_path, clock):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.config['SESSION_BACKEND'] = request.param
+    app.config['SESSION_DB_PATH'] = str(tmp_path / 'sessions.db')
+    app.config['PERMANENT_SESSION_LIFETIME'] = 100
+    init_session_backend(app)
+    app.session_interface.touch_interval = 10
+    app.register_blueprint(config_bp)
+
+    @app.route('/visit')
+    def visit():
+        session['visits'] = session.get('visits', 0) + 1
+        return ''
+
+    @app.route('/login/<username>')
+    def login(username):
+        session.regenerate()
+        session['logged_in'] = True
+        session['username'] = username
+        session['last_activity'] = clock.now
+        return ''
+
+    @app.route('/whoami')
+    def whoami():
+        return jsonify(username=session.get('username'))
+
+    return app
+
+
+def whoami(client):
+    return client.get('/whoami').json['username']
+
+
+def test_login_regenerates_session_id(app):
+    client = app.test_client()
+    client.get('/visit')
+    before = client.get_cookie(COOKIE).value
+
+    client.get('/login/alice')
+    after = client.get_cookie(COOKIE).value
+
+    assert after != before
+    assert app.session_interface.store.get(before) is None
+    assert app.session_interface.store.get(after)[0]['visits'] == 1
+    assert whoami(client) == 'alice'
+
+
+def test_revoke_user_logs_out_only_that_user(app):
+    alice, alice_phone, bob = app.test_client(), app.test_client(), app.test_client()
+    alice.get('/login/alice')
+    alice_phone.get('/login/alice')
+    bob.get('/login/bob')
+
+    response = bob.post('/admin/sessions/revoke', json={'username': 'alice'})
+
+    assert response.json == {'success': True, 'revoked': 2}
+    assert whoami(alice) is None
+    assert whoami(alice_phone) is None
+    assert whoami(bob) == 'bob'
+
+
+def test_expiry_slides_with_activity(app, clock):
+    store = app.session_interface.store
+    client = app.test_client()
+    client.get('/login/alice')
+    sid = client.get_cookie(COOKIE).value
+    expires = store.get(sid)[1]
+
+    # Within touch_interval the stored expiry is left alone
+    clock.now += 5
+    assert whoami(client) == 'alice'
+    assert store.get(sid)[1] == expires
+
+    clock.now += 45
+    assert whoami(client) == 'alice'
+    assert store.get(sid)[1] == pytest.approx(clock.now + 100)
+
+    # Past the original expiry, but within ttl of the last activity
+    clock.now += 90
+    assert whoami(client) == 'alice'
+
+    clock.now += 101
+    assert whoami(client) is None
+
+
+def test_cookie_backend_is_default():
+    app = Flask(__name__)
+    init_session_backend(app)
+
+    assert not isinstance(app.session_interface, ServerSideSessionInterface)
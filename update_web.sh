@@ -118,6 +118,7 @@ install_dependencies() {
     
     pip install --upgrade pip --quiet
     pip install -r requirements.txt --quiet
+    python -m config_manager.assets
     
     deactivate
     print_success "Dependencies installed"